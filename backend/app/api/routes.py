@@ -1,23 +1,172 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
-from fastapi.responses import JSONResponse
-from typing import Dict, Optional
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+from datetime import datetime, timezone
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+import json
 import os
+import sqlite3
+import tempfile
+import time
 import uuid
+import weakref
+from app.services import metrics
+from app.services.anomalies import AnomalyEngine
+from app.services.export import EXPORT_FORMATS, ExportUnavailable, export_log, to_table, write_table
+from app.services.fleet import MAX_RESULTS, FleetIndex
+from app.services.ingestion import IngestionPool, IngestionQueueFull
+from app.services.intervals import gps_issue_samples
+from app.services.jobs import PRIORITIES, Job, JobQueue, JobQueueFull
+from app.services.downsample import lttb, minmax
 from app.services.log_parser import LogParser
+from app.services.mavgraph import ExpressionError, GraphEngine, load_graphs
+from app.services.parse_cache import ParseCache
+from app.services.parsed_log import ParsedLog
+from app.services.series import DOWNSAMPLE_METHODS, SeriesIndex, series_index
+from app.services.store import LogStore, SharedLogStore
+from app.services.upload import UploadTooLarge, iter_upload, save_stream
 from app.services.chatbot import Chatbot
 from app.core.config import settings
 
 router = APIRouter()
-chatbot = Chatbot()
+fleet_index = FleetIndex(settings.FLEET_INDEX_PATH)
+chatbot = Chatbot(fleet=fleet_index)
+# Built at import so a bad ANOMALY_DETECTORS setting fails at startup
+anomaly_engine = AnomalyEngine(settings.ANOMALY_DETECTORS)
+summary_anomalies = anomaly_engine.for_summary()
+ingestion_pool = IngestionPool(
+    settings.PARSE_WORKERS,
+    settings.PARSE_QUEUE_SIZE,
+    settings.PARSE_DECODE_WORKERS,
+    settings.ANOMALY_DETECTORS
+)
+parse_cache = ParseCache(
+    settings.PARSE_CACHE_DIR,
+    settings.PARSE_CACHE_MAX_BYTES,
+    anomaly_engine.fingerprint
+)
 
-# Store flight data in memory (in production, use a proper database)
-flight_data_store: Dict[str, Dict] = {}
+# Parsed logs kept in memory up to a byte budget.  The shared store lets
+# every worker process serve every log; the local one spills to disk.
+if settings.LOG_STORE_SHARED:
+    flight_data_store = SharedLogStore(
+        settings.LOG_STORE_MAX_BYTES,
+        settings.LOG_STORE_TTL_SECONDS,
+        settings.LOG_STORE_DIR,
+        parse_cache
+    )
+else:
+    flight_data_store = LogStore(
+        settings.LOG_STORE_MAX_BYTES,
+        settings.LOG_STORE_TTL_SECONDS,
+        settings.LOG_SPILL_DIR
+    )
 
-@router.post("/upload")
-async def upload_log(file: UploadFile = File(...)) -> Dict:
-    """Upload and parse a MAVLink log file."""
-    if not file.filename.endswith('.bin'):
+# Store and cache sizes, read when /metrics is scraped
+metrics.registry.collect('uav_parse_cache', 'Parsed-log cache', parse_cache.stats,
+                         ('hits', 'misses', 'evictions'))
+metrics.registry.collect('uav_log_store', 'Parsed-log store', flight_data_store.stats,
+                         ('evictions', 'expirations', 'reloads'))
+metrics.registry.collect('uav_conversations', 'Conversation store', chatbot.conversations.stats,
+                         ('evictions', 'expirations'))
+metrics.registry.collect('uav_response_cache', 'Chat response cache', chatbot.responses.stats,
+                         ('evictions', 'expirations', 'hits', 'misses'))
+metrics.registry.collect('uav_llm', 'LLM client', chatbot.llm.stats,
+                         ('requests', 'retries', 'failures'))
+metrics.registry.collect('uav_ingestion', 'Ingestion pool',
+                         lambda: {'pending': ingestion_pool.pending})
+metrics.registry.collect('uav_fleet', 'Fleet index', fleet_index.stats)
+
+# Graph results per parsed log, built on first query and dropped with the log
+_graph_engines: "weakref.WeakKeyDictionary[ParsedLog, GraphEngine]" = weakref.WeakKeyDictionary()
+
+def _graph_engine(flight_data: ParsedLog) -> GraphEngine:
+    engine = _graph_engines.get(flight_data)
+    if engine is None:
+        engine = GraphEngine(series_index(flight_data))
+        _graph_engines[flight_data] = engine
+    return engine
+
+def _store_parsed(log_id: str, flight_data: ParsedLog, content_hash: str, cached: bool,
+                  filename: Optional[str] = None):
+    """Cache a parsed log by content hash, serve it under ``log_id`` and index it."""
+    flight_data.content_hash = content_hash
+    if not cached:
+        parse_cache.put(content_hash, flight_data)
+    flight_data_store[log_id] = flight_data
+    try:
+        fleet_index.add(log_id, content_hash, flight_data.summary, flight_data.data, filename)
+    except sqlite3.Error as e:
+        # the log is still served; it is only missing from fleet queries
+        print(f"Warning: could not index log {log_id} in the fleet index: {str(e)}")
+
+def _run_job(job: Job) -> Dict:
+    """Job worker: decode a saved upload in the ingestion pool, which reports progress."""
+    try:
+        # Re-uploads of a known log skip parsing entirely
+        flight_data = parse_cache.get(job.content_hash)
+        cached = flight_data is not None
+        if not cached:
+            # an in-memory job store is not visible to the parse workers
+            store_path = None if job_queue.jobs.path == ':memory:' else job_queue.jobs.path
+            flight_data, messages = ingestion_pool.parse_job(
+                job.file_path, job.id, store_path, settings.UPLOAD_CHUNK_SIZE)
+            job.progress(job.bytes_total, messages)
+        _store_parsed(job.log_id, flight_data, job.content_hash, cached, job.filename)
+        return {"log_id": job.log_id, "summary": flight_data.summary, "cached": cached}
+    finally:
+        if os.path.exists(job.file_path):
+            os.remove(job.file_path)
+
+job_queue = JobQueue(
+    settings.JOB_WORKERS,
+    settings.JOB_QUEUE_SIZE,
+    _run_job,
+    settings.JOB_HISTORY,
+    settings.JOB_TTL_SECONDS,
+    settings.JOB_STORE_PATH
+)
+metrics.registry.collect('uav_jobs', 'Background ingestion jobs', job_queue.stats,
+                         ('completed', 'failed'))
+
+async def _save_upload(chunks: AsyncIterator[bytes], file_path: str,
+                       on_chunk: Optional[Callable[[bytes], Awaitable[None]]] = None) -> Tuple[int, str]:
+    """Save an upload (see ``save_stream``), recording its size and read time."""
+    started = time.perf_counter()
+    size, content_hash = await save_stream(chunks, file_path, settings.MAX_UPLOAD_SIZE, on_chunk=on_chunk)
+    metrics.upload_read_seconds.observe(time.perf_counter() - started)
+    metrics.upload_bytes.inc(size)
+    return size, content_hash
+
+def _queue_job(file_path: str, filename: str, priority: str, size: int,
+               content_hash: str, log_id: str) -> Dict:
+    try:
+        job = job_queue.submit(Job(file_path, filename, priority, size, content_hash, log_id))
+    except JobQueueFull:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many logs are queued, please retry later",
+            headers={"Retry-After": "30"}
+        )
+    return {
+        "job_id": job.id,
+        "log_id": log_id,
+        "status": job.status,
+        "status_url": f"/api/jobs/{job.id}"
+    }
+
+async def _ingest_upload(chunks: AsyncIterator[bytes], filename: str,
+                         background: bool = False, priority: str = "interactive"):
+    """Stream an upload to disk, parse it and store the result.
+
+    With ``background`` the saved upload is queued as a job instead and
+    a 202 response with its id is returned at once.
+    """
+    if not filename or not filename.endswith('.bin'):
         raise HTTPException(status_code=400, detail="Only .bin files are supported")
+    if background and priority not in PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"priority must be one of {', '.join(PRIORITIES)}")
     
     # Generate unique ID for this log
     log_id = str(uuid.uuid4())
@@ -25,16 +174,49 @@ async def upload_log(file: UploadFile = File(...)) -> Dict:
     # Save file temporarily
     file_path = os.path.join(settings.UPLOAD_DIR, f"{log_id}.bin")
     try:
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
-        
-        # Parse the log file
-        parser = LogParser(file_path)
-        flight_data = parser.parse()
+        if settings.INCREMENTAL_PARSE and not background:
+            # Decode each chunk as it lands so parsing ends with the upload
+            parser = LogParser(file_path, anomalies=anomaly_engine)
+            _, content_hash = await _save_upload(
+                chunks, file_path,
+                on_chunk=lambda chunk: run_in_threadpool(parser.feed, chunk)
+            )
+            # The hash is only known once the whole upload is decoded; on a
+            # hit drop the decoded columns before mapping the cached copy
+            # (if the entry is evicted meanwhile, finish re-parses the file)
+            if content_hash in parse_cache:
+                parser.discard()
+            flight_data = parse_cache.get(content_hash)
+            cached = flight_data is not None
+            if not cached:
+                summary = await run_in_threadpool(parser.finish)
+                flight_data = ParsedLog(summary, parser.data)
+                metrics.observe_parse(parser.timings, parser.messages)
+        else:
+            size, content_hash = await _save_upload(chunks, file_path)
+            if background:
+                # The job worker parses the file and removes it
+                return JSONResponse(
+                    status_code=202,
+                    content=_queue_job(file_path, filename, priority, size, content_hash, log_id)
+                )
+            
+            # Re-uploads of a known log skip parsing entirely
+            flight_data = parse_cache.get(content_hash)
+            cached = flight_data is not None
+            if not cached:
+                # Parse the log file in the ingestion pool
+                try:
+                    flight_data = await ingestion_pool.parse(file_path)
+                except IngestionQueueFull:
+                    raise HTTPException(
+                        status_code=503,
+                        detail="Too many logs are being parsed, please retry shortly",
+                        headers={"Retry-After": "5"}
+                    )
         
         # Store the parsed data
-        flight_data_store[log_id] = flight_data
+        await run_in_threadpool(_store_parsed, log_id, flight_data, content_hash, cached, filename)
         
         # Clean up the temporary file
         os.remove(file_path)
@@ -42,14 +224,468 @@ async def upload_log(file: UploadFile = File(...)) -> Dict:
         return {
             "log_id": log_id,
             "message": "Log file uploaded and parsed successfully",
-            "summary": flight_data
+            "summary": flight_data.summary,
+            "cached": cached
         }
         
+    except UploadTooLarge as e:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise HTTPException(status_code=413, detail=str(e))
+    except HTTPException:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
     except Exception as e:
         if os.path.exists(file_path):
             os.remove(file_path)
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/upload")
+async def upload_log(
+    file: UploadFile = File(...),
+    background: bool = False,
+    priority: str = "interactive"
+):
+    """Upload and parse a MAVLink log file.
+
+    With ``background=true`` the response is 202 with a job id as soon
+    as the upload is saved; poll ``/jobs/{job_id}`` for progress.
+    """
+    return await _ingest_upload(
+        iter_upload(file, settings.UPLOAD_CHUNK_SIZE),
+        file.filename,
+        background,
+        priority
+    )
+
+@router.post("/upload/stream")
+async def upload_log_stream(
+    request: Request,
+    filename: str,
+    background: bool = False,
+    priority: str = "interactive"
+):
+    """Upload a log as the raw request body, parsing it as it arrives."""
+    return await _ingest_upload(request.stream(), filename, background, priority)
+
+@router.post("/upload/batch", status_code=202)
+async def upload_batch(files: List[UploadFile] = File(...), priority: str = "bulk") -> Dict:
+    """Queue several logs for background ingestion, one job per file.
+
+    Bulk priority by default, so interactive uploads overtake the batch.
+    A file that cannot be queued gets an ``error`` instead of a job.
+    """
+    if priority not in PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"priority must be one of {', '.join(PRIORITIES)}")
+    if any(not file.filename or not file.filename.endswith('.bin') for file in files):
+        raise HTTPException(status_code=400, detail="Only .bin files are supported")
+    
+    jobs = []
+    for file in files:
+        log_id = str(uuid.uuid4())
+        file_path = os.path.join(settings.UPLOAD_DIR, f"{log_id}.bin")
+        try:
+            size, content_hash = await _save_upload(iter_upload(file, settings.UPLOAD_CHUNK_SIZE), file_path)
+            jobs.append({
+                "filename": file.filename,
+                **_queue_job(file_path, file.filename, priority, size, content_hash, log_id)
+            })
+        except (UploadTooLarge, HTTPException) as e:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            jobs.append({"filename": file.filename, "error": getattr(e, "detail", str(e))})
+    return {"jobs": jobs}
+
+@router.get("/jobs/{job_id}")
+async def job_status(job_id: str) -> Dict:
+    """Report a background job: bytes decoded, message rate, ETA and result."""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@router.post("/summary")
+async def summarize_log(file: UploadFile = File(...)) -> Dict:
+    """Compute only the summary of a log, without storing it.
+
+    For bulk ingestion: the log is decoded in constant memory and no
+    ``log_id`` is issued, so it cannot be charted or chatted about.
+    """
+    if not file.filename or not file.filename.endswith('.bin'):
+        raise HTTPException(status_code=400, detail="Only .bin files are supported")
+    file_path = os.path.join(settings.UPLOAD_DIR, f"{uuid.uuid4()}.bin")
+    try:
+        _, content_hash = await _save_upload(iter_upload(file, settings.UPLOAD_CHUNK_SIZE), file_path)
+        cached = parse_cache.get(content_hash)
+        if cached is not None:
+            # a full parse also ran the full-rate detectors a summary-only
+            # parse leaves out; answer as a miss would
+            summary = dict(cached.summary, anomalies=summary_anomalies.select(
+                cached.summary.get('anomalies', [])))
+        else:
+            summary = await ingestion_pool.summarize(file_path)
+        return {"summary": summary, "cached": cached is not None}
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except IngestionQueueFull:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many logs are being parsed, please retry shortly",
+            headers={"Retry-After": "5"}
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+@router.get("/stats")
+async def stats() -> Dict:
+    """Report cache and store statistics."""
+    return {
+        "parse_cache": parse_cache.stats(),
+        "log_store": flight_data_store.stats(),
+        "conversations": chatbot.conversations.stats(),
+        "llm": chatbot.llm.stats(),
+        "response_cache": chatbot.responses.stats(),
+        "ingestion": {"pending": ingestion_pool.pending},
+        "jobs": job_queue.stats(),
+        "fleet": fleet_index.stats()
+    }
+
+def _fleet_filters(
+    days: Optional[float], since: Optional[str], until: Optional[str], **filters
+) -> Dict:
+    """Fleet query filters, with the date range turned into UTC timestamps."""
+    if days is not None:
+        filters["since"] = time.time() - days * 86400
+    for name, value in (("since", since), ("until", until)):
+        if value is None:
+            continue
+        try:
+            moment = datetime.fromisoformat(value)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"{name} must be an ISO 8601 date")
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        filters[name] = moment.timestamp()
+    return filters
+
+@router.get("/fleet/flights")
+async def fleet_flights(
+    min_battery_below: Optional[float] = None,
+    min_battery_above: Optional[float] = None,
+    max_altitude_above: Optional[float] = None,
+    max_altitude_below: Optional[float] = None,
+    flight_time_above: Optional[float] = None,
+    flight_time_below: Optional[float] = None,
+    vehicle: Optional[str] = None,
+    has_gps_issues: Optional[bool] = None,
+    has_critical_errors: Optional[bool] = None,
+    mode: Optional[int] = None,
+    days: Optional[float] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    order_by: str = "flight_date",
+    descending: bool = True,
+    limit: int = 100,
+    offset: int = 0
+) -> Dict:
+    """Search the summaries of every ingested log.
+
+    Filters combine with AND.  ``days`` keeps flights of the last that
+    many days; ``since`` and ``until`` take ISO 8601 dates (UTC unless
+    they carry an offset).  A flight's date is that of its first GPS fix,
+    else its upload time.
+    """
+    if offset < 0 or not 0 < limit <= MAX_RESULTS:
+        raise HTTPException(status_code=400, detail=f"offset must be >= 0 and limit within 1..{MAX_RESULTS}")
+    filters = _fleet_filters(
+        days, since, until,
+        min_battery_below=min_battery_below, min_battery_above=min_battery_above,
+        max_altitude_above=max_altitude_above, max_altitude_below=max_altitude_below,
+        flight_time_above=flight_time_above, flight_time_below=flight_time_below,
+        vehicle=vehicle, has_gps_issues=has_gps_issues,
+        has_critical_errors=has_critical_errors, mode=mode
+    )
+    try:
+        result = await run_in_threadpool(
+            fleet_index.query, order_by, descending, limit, offset, **filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"offset": offset, "limit": limit, **result}
+
+@router.get("/fleet/stats")
+async def fleet_stats(
+    vehicle: Optional[str] = None,
+    has_gps_issues: Optional[bool] = None,
+    has_critical_errors: Optional[bool] = None,
+    mode: Optional[int] = None,
+    days: Optional[float] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None
+) -> Dict:
+    """Totals and extremes over the indexed flights (filtered as for /fleet/flights)."""
+    filters = _fleet_filters(
+        days, since, until, vehicle=vehicle, has_gps_issues=has_gps_issues,
+        has_critical_errors=has_critical_errors, mode=mode
+    )
+    return await run_in_threadpool(fleet_index.aggregate, **filters)
+
+@router.get("/logs/{log_id}/gps_issues")
+async def gps_issues(log_id: str, offset: int = 0, limit: int = 100) -> Dict:
+    """Page through the individual GPS samples without a 3D fix.
+
+    The summary only holds the intervals; this returns the samples behind
+    them, in time order.
+    """
+    flight_data = flight_data_store.get(log_id)
+    if flight_data is None:
+        raise HTTPException(status_code=404, detail="Log file not found")
+    if offset < 0 or not 0 < limit <= 1000:
+        raise HTTPException(status_code=400, detail="offset must be >= 0 and limit within 1..1000")
+    
+    gps = flight_data.data.get('GPS', {})
+    if 'Status' not in gps:
+        return {"total": 0, "offset": offset, "limit": limit, "items": []}
+    index = series_index(flight_data)
+    return gps_issue_samples(
+        index.times('GPS'),
+        index.column('GPS', 'Status'),
+        index.column('GPS', 'NSats') if 'NSats' in gps else None,
+        offset,
+        limit
+    )
+
+@router.get("/logs/{log_id}/series/{msg_type}/{field}")
+async def series(
+    log_id: str,
+    msg_type: str,
+    field: str,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    points: Optional[int] = None,
+    method: str = "lttb",
+    format: str = "json"
+):
+    """Samples of one field between ``start`` and ``end`` (seconds since boot).
+
+    Without ``points`` every sample in the range is returned.  With it
+    the range is decimated to at most ``points`` samples by ``method``
+    (``lttb`` or ``minmax``), read from a cached multi-resolution pyramid,
+    so a plot fetches only what its viewport can show; ``total`` is the
+    number of samples in the range.
+
+    ``format=json`` returns times in seconds and the values as lists;
+    ``format=binary`` returns the raw time column (microseconds) followed
+    by the values, with their dtypes and counts in ``X-Series-*``
+    headers, and is far cheaper for long undecimated ranges.
+    """
+    flight_data = flight_data_store.get(log_id)
+    if flight_data is None:
+        raise HTTPException(status_code=404, detail="Log file not found")
+    if field not in flight_data.data.get(msg_type, {}):
+        raise HTTPException(status_code=404, detail=f"{msg_type}.{field} is not in this log")
+    if format not in ("json", "binary"):
+        raise HTTPException(status_code=400, detail="format must be json or binary")
+    if start is not None and end is not None and start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    if points is not None and not 3 <= points <= settings.SERIES_MAX_SAMPLES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"points must be within 3..{settings.SERIES_MAX_SAMPLES}"
+        )
+    if method not in DOWNSAMPLE_METHODS:
+        raise HTTPException(status_code=400, detail="method must be lttb or minmax")
+    column = flight_data.data[msg_type][field]
+    if column.ndim != 1 or column.dtype.kind not in 'biuf':
+        raise HTTPException(status_code=400, detail=f"{msg_type}.{field} is not a numeric series")
+    
+    start_us = None if start is None else start * 1e6
+    end_us = None if end is None else end * 1e6
+    # sorting the times on first access, the pyramid and the
+    # serialisation are all CPU-bound
+    try:
+        return await run_in_threadpool(
+            _series_response, series_index(flight_data), msg_type, field,
+            start_us, end_us, points, method, format)
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=str(e.args[0]))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _series_response(index: SeriesIndex, msg_type: str, field: str, start_us: Optional[float],
+                     end_us: Optional[float], points: Optional[int], method: str, format: str) -> Response:
+    """Look up, decimate and serialise a series (CPU-bound: run off the event loop).
+
+    Raises KeyError when the message type has no timestamps and
+    ValueError when an undecimated range is too large to return.
+    """
+    lo, hi = index.bounds(msg_type, start_us, end_us)
+    if points is not None:
+        times, values = index.downsample(msg_type, field, start_us, end_us, points, method)
+    elif hi - lo > settings.SERIES_MAX_SAMPLES:
+        raise ValueError(f"Range holds {hi - lo} samples (at most {settings.SERIES_MAX_SAMPLES}); "
+                         "narrow it or set points")
+    else:
+        times, values = index.window(msg_type, field, start_us, end_us)
+
+    if format == "binary":
+        return Response(
+            content=times.tobytes() + values.tobytes(),
+            media_type="application/octet-stream",
+            headers={
+                "X-Series-Count": str(len(values)),
+                "X-Series-Total": str(hi - lo),
+                "X-Series-Time-Dtype": times.dtype.str,
+                "X-Series-Value-Dtype": values.dtype.str
+            }
+        )
+    return JSONResponse({
+        "msg_type": msg_type,
+        "field": field,
+        "count": len(values),
+        "total": hi - lo,
+        "time": (times / 1e6).tolist(),
+        "values": values.tolist()
+    })
+
+def _export_file(write: Callable, suffix: str) -> str:
+    """Run ``write(file)`` into a temporary file and return its path."""
+    handle, path = tempfile.mkstemp(suffix=suffix, dir=settings.UPLOAD_DIR)
+    try:
+        with os.fdopen(handle, 'wb') as f:
+            write(f)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+@router.get("/logs/{log_id}/export")
+async def export_log_archive(log_id: str, format: str = "parquet", types: Optional[str] = None):
+    """Download a parsed log as a zip of one Arrow or Parquet table per message type.
+
+    ``types`` is an optional comma-separated list of message types to
+    include.  The archive also holds the summary as ``summary.json``.
+    """
+    flight_data = flight_data_store.get(log_id)
+    if flight_data is None:
+        raise HTTPException(status_code=404, detail="Log file not found")
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    selected = [name for name in types.split(',') if name] if types else None
+    try:
+        path = await run_in_threadpool(
+            _export_file,
+            lambda f: export_log(flight_data.summary, flight_data.data, format, f, selected),
+            '.zip'
+        )
+    except ExportUnavailable as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    return FileResponse(
+        path,
+        media_type="application/zip",
+        filename=f"{log_id}-{format}.zip",
+        background=BackgroundTask(os.remove, path)
+    )
+
+@router.get("/logs/{log_id}/export/{msg_type}")
+async def export_message_type(log_id: str, msg_type: str, format: str = "parquet"):
+    """Download one message type of a parsed log as an Arrow IPC or Parquet file."""
+    flight_data = flight_data_store.get(log_id)
+    if flight_data is None:
+        raise HTTPException(status_code=404, detail="Log file not found")
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    columns = flight_data.data.get(msg_type)
+    if not columns:
+        raise HTTPException(status_code=404, detail=f"No {msg_type} messages in this log")
+    media_type, extension = EXPORT_FORMATS[format]
+    try:
+        path = await run_in_threadpool(
+            _export_file,
+            lambda f: write_table(to_table(msg_type, columns), format, f),
+            f'.{extension}'
+        )
+    except ExportUnavailable as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    return FileResponse(
+        path,
+        media_type=media_type,
+        filename=f"{log_id}-{msg_type}.{extension}",
+        background=BackgroundTask(os.remove, path)
+    )
+
+@router.get("/graphs")
+async def list_graphs() -> Dict:
+    """List the preset graphs and their alternative expressions."""
+    return {"graphs": [graph.to_dict() for graph in load_graphs().values()]}
+
+@router.get("/logs/{log_id}/graphs")
+async def log_graphs(log_id: str) -> Dict:
+    """List the preset graphs that can be drawn from a log."""
+    flight_data = flight_data_store.get(log_id)
+    if flight_data is None:
+        raise HTTPException(status_code=404, detail="Log file not found")
+    return {"graphs": _graph_engine(flight_data).available()}
+
+def _graph_series(fields: List[Dict], points: Optional[int], method: str) -> List[Dict]:
+    """Decimate and serialise the series of a graph (CPU-bound: run off the event loop)."""
+    series = []
+    for field in fields:
+        times, values = field["time"], field["values"]
+        if points is not None:
+            rows = lttb(times, values, points) if method == "lttb" else minmax(values, points)
+            times, values = times[rows], values[rows]
+        elif len(values) > settings.SERIES_MAX_SAMPLES:
+            raise ValueError(f"{field['expression']} has {len(values)} samples; set points")
+        series.append({
+            "expression": field["expression"],
+            "axis": field["axis"],
+            "total": len(field["values"]),
+            "time": (times / 1e6).tolist(),
+            "values": values.tolist()
+        })
+    return series
+
+@router.get("/logs/{log_id}/graphs/{name:path}")
+async def log_graph(
+    log_id: str,
+    name: str,
+    points: Optional[int] = None,
+    method: str = "lttb"
+) -> Dict:
+    """Evaluate a preset graph over a log.
+
+    Returns the expression used and one series per plotted field, with
+    times in seconds.  Results are cached per log and graph; ``points``
+    decimates each series as for ``/series``.
+    """
+    flight_data = flight_data_store.get(log_id)
+    if flight_data is None:
+        raise HTTPException(status_code=404, detail="Log file not found")
+    if points is not None and not 3 <= points <= settings.GRAPH_MAX_POINTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"points must be within 3..{settings.GRAPH_MAX_POINTS}"
+        )
+    if method not in DOWNSAMPLE_METHODS:
+        raise HTTPException(status_code=400, detail="method must be lttb or minmax")
+    
+    try:
+        expression, fields = await run_in_threadpool(_graph_engine(flight_data).evaluate, name)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except ExpressionError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    
+    try:
+        series = await run_in_threadpool(_graph_series, fields, points, method)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"name": name, "expression": expression, "series": series}
+
 @router.post("/chat/{log_id}")
 async def chat(
     log_id: str,
@@ -57,17 +693,18 @@ async def chat(
     conversation_id: Optional[str] = None
 ) -> Dict:
     """Process a chat message and return a response."""
-    if log_id not in flight_data_store:
+    flight_data = flight_data_store.get(log_id)
+    if flight_data is None:
         raise HTTPException(status_code=404, detail="Log file not found")
     
     if not conversation_id:
         conversation_id = str(uuid.uuid4())
     
     try:
-        response = chatbot.process_message(
+        response = await chatbot.process_message(
             message["message"],
             conversation_id,
-            flight_data_store[log_id]
+            flight_data
         )
         
         return {
@@ -78,6 +715,48 @@ async def chat(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _sse(event: str, data: Dict) -> str:
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/chat/{log_id}/stream")
+async def chat_stream(
+    log_id: str,
+    message: Dict[str, str],
+    conversation_id: Optional[str] = None
+) -> StreamingResponse:
+    """Stream the answer to a chat message as Server-Sent Events.
+
+    Events: ``start`` (with the conversation id), one ``token`` per chunk
+    of the answer, then ``done``, or ``error`` if generation fails.
+    """
+    flight_data = flight_data_store.get(log_id)
+    if flight_data is None:
+        raise HTTPException(status_code=404, detail="Log file not found")
+    
+    if not conversation_id:
+        conversation_id = str(uuid.uuid4())
+    
+    async def events() -> AsyncIterator[str]:
+        yield _sse("start", {"conversation_id": conversation_id})
+        try:
+            async for token in chatbot.stream_message(
+                message["message"],
+                conversation_id,
+                flight_data
+            ):
+                yield _sse("token", {"text": token})
+        except Exception as e:
+            yield _sse("error", {"detail": str(e)})
+            return
+        yield _sse("done", {})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.delete("/chat/{log_id}")
 async def clear_chat(log_id: str, conversation_id: str) -> Dict:
     """Clear chat history for a specific conversation."""
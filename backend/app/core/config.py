@@ -1,17 +1,94 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Any, Dict, Optional
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
 class Settings(BaseSettings):
-    GEMINI_API_KEY: str
+    # Only needed once a chat reaches Gemini, so the API starts without it
+    GEMINI_API_KEY: Optional[str] = None
     GEMINI_MODEL: str = "gemini-pro"
 
+    # LLM client ("gemini", or "stub" for a local stand-in in tests/benchmarks)
+    LLM_BACKEND: str = "gemini"
+    LLM_MAX_CONCURRENCY: int = 8  # requests in flight per process
+    LLM_TIMEOUT: float = 60.0  # seconds per attempt
+    LLM_MAX_RETRIES: int = 2
+    LLM_RETRY_BACKOFF: float = 0.5  # base of the jittered exponential backoff
+    LLM_STUB_LATENCY: float = 0.0
+
     # File Upload
     MAX_UPLOAD_SIZE: int = 100 * 1024 * 1024  # 100MB
     UPLOAD_DIR: str = "uploads"
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # bytes read per chunk while streaming
+    # Decode uploads chunk by chunk while they arrive (in a thread of the
+    # API process) instead of parsing the saved file in the ingestion pool.
+    # The content hash is only known at the end of the upload, so this
+    # mode decodes re-uploads of cached logs too (the result is discarded)
+    INCREMENTAL_PARSE: bool = False
+
+    # Log ingestion (parsing runs in a process pool; 0 workers = thread)
+    PARSE_WORKERS: int = min(4, os.cpu_count() or 1)
+    PARSE_QUEUE_SIZE: int = 16
+    # Processes decoding each large (64MB+) log in parallel; 1 decodes in
+    # the parse worker itself.  Up to PARSE_WORKERS * PARSE_DECODE_WORKERS
+    # extra processes run at once.
+    PARSE_DECODE_WORKERS: int = 1
+
+    # Background ingestion jobs (upload with background=true, or a batch):
+    # worker threads decode queued uploads, interactive ones first
+    JOB_WORKERS: int = 2
+    JOB_QUEUE_SIZE: int = 1000
+    JOB_HISTORY: int = 10000  # finished jobs kept queryable
+    JOB_TTL_SECONDS: int = 24 * 60 * 60
+    # Job states, shared by every API worker process so any may answer a poll
+    JOB_STORE_PATH: str = "cache/jobs.sqlite"
+
+    # Parsed-log cache keyed by upload hash (0 bytes disables it)
+    PARSE_CACHE_DIR: str = "cache/parsed"
+    PARSE_CACHE_MAX_BYTES: int = 2 * 1024 * 1024 * 1024  # 2GB
+
+    # Anomaly detector parameters, overriding the defaults of
+    # app.services.anomalies, e.g. {"vibration": {"threshold": 45},
+    # "rc_gap": {"enabled": false}} (JSON in the environment).  Summary-only
+    # parses skip the IMU detector (accel_saturation) unless it is given
+    # {"summary": true}, which costs them about half again in decode time.
+    ANOMALY_DETECTORS: Dict[str, Dict[str, Any]] = {}
+
+    # Most samples one series query may return
+    SERIES_MAX_SAMPLES: int = 1_000_000
+    # Most points a preset graph may be decimated to (a plot cannot show more)
+    GRAPH_MAX_POINTS: int = 10_000
+
+    # In-memory stores (LRU by bytes; idle entries expire after the TTL)
+    LOG_STORE_MAX_BYTES: int = 1024 * 1024 * 1024  # 1GB
+    LOG_STORE_TTL_SECONDS: int = 24 * 60 * 60
+    LOG_SPILL_DIR: str = "cache/spill"
+    # Share parsed logs between API worker processes through LOG_STORE_DIR
+    # (a SQLite index plus memory-mapped packs) so any worker can serve any log
+    LOG_STORE_SHARED: bool = True
+    LOG_STORE_DIR: str = "cache/logs"
+    # Summaries of every ingested log, for queries across flights (kept
+    # after the logs themselves expire from the store)
+    FLEET_INDEX_PATH: str = "cache/fleet.sqlite"
+    CONVERSATION_STORE_MAX_BYTES: int = 64 * 1024 * 1024  # 64MB
+    CONVERSATION_TTL_SECONDS: int = 24 * 60 * 60
+    # Conversation history sent to the model: recent messages verbatim,
+    # older ones compacted into a summary of at most CHAT_SUMMARY_TOKENS
+    CHAT_CONTEXT_TOKENS: int = 4000
+    CHAT_SUMMARY_TOKENS: int = 600
+    # Answers to standalone questions per log (0 bytes disables the cache)
+    RESPONSE_CACHE_MAX_BYTES: int = 16 * 1024 * 1024  # 16MB
+    RESPONSE_CACHE_TTL_SECONDS: int = 6 * 60 * 60
+
+    # Opt-in profiling: with this on, a request sent with the header
+    # "X-Profile: cpu" (cProfile) or "X-Profile: memory" (tracemalloc)
+    # writes a profile to PROFILE_DIR, named in the X-Profile-File header.
+    # It profiles the API process (not the parse workers), so a request is
+    # only profiled when no other request is in flight
+    PROFILE_REQUESTS: bool = False
+    PROFILE_DIR: str = "profiles"
     
     class Config:
         case_sensitive = True
@@ -1,12 +1,28 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+import sys
+import time
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.routes import router as api_router
+from fastapi.responses import JSONResponse, Response
+from app.api.routes import router as api_router, ingestion_pool, job_queue
 from app.core.config import settings
+from app.services import metrics, parallel_decode
+from app.services.profiling import PROFILE_KINDS, RequestProfiler
+
+profiler = RequestProfiler(settings.PROFILE_DIR)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    ingestion_pool.shutdown()
+    job_queue.shutdown()
+    parallel_decode.shutdown()
 
 app = FastAPI(
     title="UAV Log Viewer API",
     description="Backend API for UAV Log Viewer with AI-powered analysis",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -21,9 +37,59 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def instrument(request: Request, call_next):
+    """Time every request by route and run opt-in request profiles."""
+    started = time.perf_counter()
+    kind = request.headers.get("X-Profile") if settings.PROFILE_REQUESTS else None
+    if kind and kind not in PROFILE_KINDS:
+        return JSONResponse(
+            status_code=400,
+            content={"detail": f"X-Profile must be one of {', '.join(PROFILE_KINDS)}"}
+        )
+    with profiler.in_flight():
+        if kind:
+            with profiler.profile(kind) as path:
+                response = await call_next(request)
+            if path:
+                response.headers["X-Profile-File"] = path
+        else:
+            response = await call_next(request)
+    # Streaming responses are timed to their first byte
+    route = request.scope.get("route")
+    metrics.http_seconds.observe(
+        time.perf_counter() - started,
+        method=request.method,
+        route=getattr(route, "path", "unmatched"),
+        status=str(response.status_code)
+    )
+    return response
+
 # Include API routes
 app.include_router(api_router, prefix="/api")
 
+@app.get("/ready")
+async def ready():
+    """Readiness probe: answers as soon as the app can take requests.
+
+    Heavy subsystems (pymavlink, pandas, the Gemini SDK, the parse
+    workers) load on first use, so they are reported but not waited for.
+    """
+    return {
+        "status": "ok",
+        "loaded": {
+            "pymavlink": "pymavlink.mavutil" in sys.modules,
+            "pandas": "pandas" in sys.modules,
+            "gemini": "google.generativeai" in sys.modules,
+            "parse_workers": ingestion_pool.started
+        }
+    }
+
+@app.get("/metrics")
+async def prometheus_metrics() -> Response:
+    """Metrics of this process in the Prometheus text format."""
+    return Response(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to UAV Log Viewer API"} 
\ No newline at end of file
@@ -0,0 +1,391 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import hashlib
+import json
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Parameters every detector takes: runs of anomalous samples closer than
+# merge_gap seconds form one interval, and intervals with fewer than
+# min_samples anomalous samples are dropped
+COMMON_PARAMS = {'enabled': True, 'merge_gap': 1.0, 'min_samples': 1}
+
+# (anomalous mask, value per sample, start time per sample or None)
+Flags = Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]
+
+
+def _rolling(values: np.ndarray, window: int, reduce: Callable) -> np.ndarray:
+    """Reduce each sample's trailing window of ``window`` samples.
+
+    The first samples of a series see a window padded with the first
+    value, so a series gives the same result whole or in chunks (see
+    ``Detector.context``).
+    """
+    window = int(window)
+    if window <= 1 or not len(values):
+        return values
+    padded = np.concatenate((np.full(window - 1, values[0], dtype=values.dtype), values))
+    return reduce(sliding_window_view(padded, window), axis=1)
+
+
+def _rate(times: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Change per second from each sample to the next (0 for the first sample)."""
+    rate = np.zeros(len(values), dtype=np.float64)
+    if len(values) > 1:
+        seconds = np.diff(times.astype(np.int64)) / 1e6
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rate[1:] = np.where(seconds > 0, np.diff(values.astype(np.float64)) / seconds, 0.0)
+    return rate
+
+
+def _vibration(times, columns, params) -> Flags:
+    level = np.maximum(np.maximum(columns['VibeX'], columns['VibeY']), columns['VibeZ'])
+    mean = _rolling(level, params['window'], np.mean)
+    return mean > params['threshold'], mean, None
+
+
+def _clipping(times, columns, params) -> Flags:
+    clips = sum(values.astype(np.int64) for values in columns.values())
+    increase = np.zeros(len(times), dtype=np.int64)
+    increase[1:] = np.diff(clips)
+    return increase >= params['min_increase'], increase, None
+
+
+def _accel_saturation(times, columns, params) -> Flags:
+    peak = np.maximum(np.maximum(np.abs(columns['AccX']), np.abs(columns['AccY'])),
+                      np.abs(columns['AccZ']))
+    return peak >= params['limit'], peak, None
+
+
+def _battery_sag(times, columns, params) -> Flags:
+    volts = columns['Volt']
+    sag = _rolling(volts, params['window'], np.max) - volts
+    return (sag > params['max_sag']) & (columns['Curr'] > params['min_current']), sag, None
+
+
+def _ekf_variance(times, columns, params) -> Flags:
+    variance = np.maximum(np.maximum(columns['SV'], columns['SP']), columns['SH'])
+    return variance > params['threshold'], variance, None
+
+
+def _altitude_jump(times, columns, params) -> Flags:
+    climb = np.abs(_rate(times, columns['Alt']))
+    return climb > params['max_climb_rate'], climb, None
+
+
+def _rc_failsafe(times, columns, params) -> Flags:
+    throttle = next(iter(columns.values()))
+    return throttle < params['min_pwm'], throttle, None
+
+
+def _rc_gap(times, columns, params) -> Flags:
+    gaps = np.zeros(len(times), dtype=np.float64)
+    gaps[1:] = np.diff(times.astype(np.int64)) / 1e6
+    # a gap runs from the sample before it
+    starts = np.concatenate((times[:1], times[:-1]))
+    return gaps > params['max_gap'], gaps, starts
+
+
+def _gps_fixed(columns: Dict[str, np.ndarray]) -> Optional[np.ndarray]:
+    status = columns.get('Status')
+    return None if status is None else status >= 3
+
+
+class Detector:
+    """A vectorized test over the samples of a message type.
+
+    ``fields`` names the columns the test reads: a name may refer to a
+    parameter (``C{channel}``) or end in ``*`` to take every field with
+    that prefix.  ``test(times, columns, params)`` returns which samples
+    are anomalous, a value per sample (the interval ``peak`` is its
+    maximum, or minimum with ``lowest``) and, optionally, when each
+    anomaly started.  Each instance (IMU, battery, EKF core...) is tested
+    as its own series; ``where`` keeps only the samples worth testing.
+    ``context`` is the number of earlier samples the test looks back
+    over, which the engine prepends when a series arrives in chunks.
+    ``full_rate`` detectors read a message type logged at sensor rate;
+    summary-only parses leave them out unless their ``summary``
+    parameter is set, as decoding it would outweigh the summary itself.
+    """
+
+    def __init__(self, name: str, description: str, msg_types: Tuple[str, ...], fields: Tuple[str, ...],
+                 test: Callable[..., Flags], defaults: Dict[str, Any], context: Callable[[Dict], int],
+                 instance: Optional[str] = None, lowest: bool = False,
+                 where: Optional[Callable[[Dict[str, np.ndarray]], Optional[np.ndarray]]] = None,
+                 full_rate: bool = False):
+        self.name = name
+        self.description = description
+        self.msg_types = msg_types
+        self.fields = fields
+        self.test = test
+        self.defaults = defaults
+        self.context = context
+        self.instance = instance
+        self.lowest = lowest
+        self.where = where
+        self.full_rate = full_rate
+
+    def columns(self, columns: Dict[str, np.ndarray], params: Dict[str, Any]) -> Optional[Dict[str, np.ndarray]]:
+        """The columns the test reads, or None if the message lacks any of them."""
+        selected = {}
+        for pattern in self.fields:
+            name = pattern.format(**params)
+            if name.endswith('*'):
+                matches = [field for field in columns if field.startswith(name[:-1])]
+            else:
+                matches = [name] if name in columns else []
+            if not matches:
+                return None
+            selected.update((field, columns[field]) for field in matches)
+        return selected
+
+
+def _no_context(params: Dict) -> int:
+    return 0
+
+
+def _one_back(params: Dict) -> int:
+    return 1
+
+
+def _window_back(params: Dict) -> int:
+    return max(int(params['window']) - 1, 0)
+
+
+DETECTORS: Dict[str, Detector] = {detector.name: detector for detector in (
+    Detector('vibration', 'Rolling mean of the worst VIBE axis above threshold (m/s/s)',
+             ('VIBE',), ('VibeX', 'VibeY', 'VibeZ'), _vibration,
+             {'threshold': 30.0, 'window': 10}, _window_back, instance='IMU'),
+    Detector('clipping', 'Accelerometer clip counters of VIBE increasing (clips per sample)',
+             ('VIBE',), ('Clip*',), _clipping, {'min_increase': 1}, _one_back, instance='IMU'),
+    Detector('accel_saturation', 'IMU acceleration at the sensor limit (m/s/s)',
+             ('IMU',), ('AccX', 'AccY', 'AccZ'), _accel_saturation,
+             {'limit': 150.0}, _no_context, instance='I', full_rate=True),
+    Detector('battery_sag', 'Voltage below its rolling maximum while drawing current (V)',
+             ('BAT',), ('Volt', 'Curr'), _battery_sag,
+             {'max_sag': 1.0, 'min_current': 5.0, 'window': 50}, _window_back, instance='Inst'),
+    Detector('ekf_variance', 'EKF velocity, position or height test ratio above threshold',
+             ('XKF4', 'NKF4'), ('SV', 'SP', 'SH'), _ekf_variance,
+             {'threshold': 0.8}, _no_context, instance='C'),
+    Detector('altitude_jump', 'GPS altitude changing faster than max_climb_rate (m/s)',
+             ('GPS',), ('Alt',), _altitude_jump,
+             {'max_climb_rate': 30.0}, _one_back, instance='I', where=_gps_fixed),
+    Detector('rc_failsafe', 'Throttle channel below the failsafe PWM (lowest PWM)',
+             ('RCIN',), ('C{channel}',), _rc_failsafe,
+             {'channel': 3, 'min_pwm': 975}, _no_context, lowest=True),
+    Detector('rc_gap', 'RC input not logged for more than max_gap seconds (s)',
+             ('RCIN',), (), _rc_gap, {'max_gap': 1.0}, _one_back),
+)}
+
+
+def detector_params(config: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Dict[str, Any]]:
+    """The parameters of every enabled detector, with ``config`` overriding the defaults.
+
+    ``config`` maps detector names to parameter overrides, e.g.
+    ``{"vibration": {"threshold": 45}, "rc_gap": {"enabled": False}}``.
+    ``summary`` says whether summary-only parses run the detector too;
+    it defaults to true except for ``full_rate`` detectors.
+    """
+    config = config or {}
+    unknown = set(config) - set(DETECTORS)
+    if unknown:
+        raise ValueError(f"Unknown anomaly detector: {', '.join(sorted(unknown))}")
+    resolved = {}
+    for name, detector in DETECTORS.items():
+        params = {**COMMON_PARAMS, 'summary': not detector.full_rate, **detector.defaults}
+        overrides = config.get(name) or {}
+        invalid = set(overrides) - set(params)
+        if invalid:
+            raise ValueError(f"{name} takes no parameter {', '.join(sorted(invalid))}")
+        params.update(overrides)
+        if params.pop('enabled'):
+            resolved[name] = params
+    return resolved
+
+
+class _Series:
+    """Detection state of one detector over one message type and instance."""
+
+    def __init__(self, detector: Detector, params: Dict[str, Any], msg_type: str,
+                 instance: Optional[int]):
+        self.detector = detector
+        self.params = params
+        self.msg_type = msg_type
+        self.instance = instance
+        self.context = detector.context(params)
+        self.gap = params['merge_gap'] * 1e6
+        self.intervals: List[Dict] = []
+        self.seen = 0
+        self._tail: Optional[Dict[str, np.ndarray]] = None
+        # position and time of the last anomalous sample
+        self._last: Optional[Tuple[int, float]] = None
+
+    def feed(self, times: np.ndarray, columns: Dict[str, np.ndarray]):
+        count = len(times)
+        if not count:
+            return
+        kept = 0
+        if self._tail is not None:
+            kept = len(self._tail['TimeUS'])
+            times = np.concatenate((self._tail['TimeUS'], times))
+            columns = {field: np.concatenate((self._tail[field], values)) for field, values in columns.items()}
+        if self.context:
+            # copied: chunk columns may be views of the decoder's buffers
+            self._tail = {field: values[-self.context:].copy() for field, values in columns.items()}
+            self._tail['TimeUS'] = times[-self.context:].copy()
+        mask, values, starts = self.detector.test(times, columns, self.params)
+        rows = np.flatnonzero(mask[kept:]) + kept
+        if rows.size:
+            self._add(rows, times, values, starts if starts is not None else times, self.seen - kept)
+        self.seen += count
+
+    def _add(self, rows: np.ndarray, times: np.ndarray, values: np.ndarray, starts: np.ndarray,
+             base: int):
+        """Group anomalous rows into intervals, continuing the last one if close enough."""
+        flagged = times[rows].astype(np.float64)
+        breaks = np.flatnonzero((np.diff(rows) > 1) & (np.diff(flagged) > self.gap)) + 1
+        first = np.concatenate(([0], breaks))
+        last = np.concatenate((breaks, [len(rows)])) - 1
+        reduce = np.minimum if self.detector.lowest else np.maximum
+        peaks = reduce.reduceat(values[rows], first)
+        found = [
+            {'detector': self.detector.name, 'source': self.msg_type, 'instance': self.instance,
+             'start': start, 'end': end, 'samples': samples, 'peak': round(float(peak), 4)}
+            for start, end, samples, peak in zip(
+                starts[rows[first]].tolist(), times[rows[last]].tolist(),
+                (last - first + 1).tolist(), peaks.tolist())
+        ]
+        if self._last is not None:
+            position, time = self._last
+            if base + rows[0] - position == 1 or flagged[0] - time <= self.gap:
+                merged, head = self.intervals[-1], found.pop(0)
+                merged.update(
+                    end=head['end'],
+                    samples=merged['samples'] + head['samples'],
+                    peak=reduce(merged['peak'], head['peak']).item())
+        self.intervals.extend(found)
+        self._last = (base + int(rows[-1]), float(flagged[-1]))
+
+
+class AnomalyStream:
+    """Runs the detectors over a log delivered in chunks of columns.
+
+    ``extend`` takes the decoded columns of one message type at a time;
+    every series keeps the few samples its windows look back over, so the
+    intervals match a pass over the whole log.
+    """
+
+    def __init__(self, params: Dict[str, Dict[str, Any]]):
+        self._by_type: Dict[str, List[Tuple[Detector, Dict[str, Any]]]] = {}
+        for name, detector_params in params.items():
+            for msg_type in DETECTORS[name].msg_types:
+                self._by_type.setdefault(msg_type, []).append((DETECTORS[name], detector_params))
+        self._series: Dict[Tuple[str, str, Optional[int]], _Series] = {}
+
+    def extend(self, msg_type: str, columns: Dict[str, np.ndarray]):
+        times = columns.get('TimeUS')
+        if times is None or not len(times):
+            return
+        for detector, params in self._by_type.get(msg_type, ()):
+            selected = detector.columns(columns, params)
+            if selected is None:
+                continue
+            instances = columns.get(detector.instance) if detector.instance else None
+            keep = detector.where(columns) if detector.where else None
+            if keep is not None:
+                rows = np.flatnonzero(keep)
+                times_kept = times[rows]
+                selected = {field: values[rows] for field, values in selected.items()}
+                instances = None if instances is None else instances[rows]
+            else:
+                times_kept = times
+            self._feed(detector, params, msg_type, times_kept, selected, instances)
+
+    def _feed(self, detector: Detector, params: Dict[str, Any], msg_type: str, times: np.ndarray,
+              columns: Dict[str, np.ndarray], instances: Optional[np.ndarray]):
+        if instances is None or instances.ndim != 1 or not len(instances):
+            self._get(detector, params, msg_type, None).feed(times, columns)
+            return
+        if instances.dtype.kind == 'u':
+            # counting is linear where unique would sort a full-rate column
+            present = np.flatnonzero(np.bincount(instances))
+        else:
+            present = np.unique(instances)
+        if len(present) == 1:
+            self._get(detector, params, msg_type, int(present[0])).feed(times, columns)
+            return
+        for instance in present.tolist():
+            rows = np.flatnonzero(instances == instance)
+            self._get(detector, params, msg_type, instance).feed(
+                times[rows], {field: values[rows] for field, values in columns.items()})
+
+    def _get(self, detector: Detector, params: Dict[str, Any], msg_type: str,
+             instance: Optional[int]) -> _Series:
+        key = (detector.name, msg_type, instance)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = _Series(detector, params, msg_type, instance)
+        return series
+
+    def intervals(self) -> List[Dict]:
+        """Every anomaly interval found so far, in time order."""
+        found = [
+            dict(interval)
+            for series in self._series.values()
+            for interval in series.intervals
+            if interval['samples'] >= series.params['min_samples']
+        ]
+        found.sort(key=lambda interval: (interval['start'], interval['detector']))
+        return found
+
+
+class AnomalyEngine:
+    """Vectorized anomaly detectors over the columns of a parsed log.
+
+    ``config`` overrides the detector parameters (see ``detector_params``).
+    Anomalies are reported as compact intervals: the detector, the source
+    message type and instance, the first and last anomalous sample time
+    (microseconds, like the other summary intervals), the number of
+    anomalous samples and the peak value.  ``summary=True`` keeps only
+    the detectors that run in summary-only parses.
+    """
+
+    def __init__(self, config: Optional[Dict[str, Dict[str, Any]]] = None, summary: bool = False):
+        self.config = config
+        self.params = detector_params(config)
+        if summary:
+            self.params = {name: params for name, params in self.params.items() if params['summary']}
+
+    def for_summary(self) -> 'AnomalyEngine':
+        """The engine of summary-only parses under the same configuration."""
+        return AnomalyEngine(self.config, summary=True)
+
+    @property
+    def message_types(self) -> Tuple[str, ...]:
+        """The message types the enabled detectors read."""
+        return tuple(dict.fromkeys(
+            msg_type for name in self.params for msg_type in DETECTORS[name].msg_types))
+
+    @property
+    def fingerprint(self) -> str:
+        """Short hash of the parameters, to tell results of other settings apart."""
+        encoded = json.dumps(self.params, sort_keys=True).encode()
+        return hashlib.sha256(encoded).hexdigest()[:12]
+
+    def select(self, anomalies: List[Dict]) -> List[Dict]:
+        """The intervals of ``anomalies`` found by this engine's detectors.
+
+        Gives the summary-only view of a full parse's anomalies.
+        """
+        return [interval for interval in anomalies if interval['detector'] in self.params]
+
+    def stream(self) -> AnomalyStream:
+        return AnomalyStream(self.params)
+
+    def detect(self, data: Dict[str, Dict[str, np.ndarray]]) -> List[Dict]:
+        """The anomaly intervals of a whole parsed log."""
+        stream = self.stream()
+        for msg_type in self.message_types:
+            if msg_type in data:
+                stream.extend(msg_type, data[msg_type])
+        return stream.intervals()
+
@@ -1,42 +1,61 @@
 from typing import Dict, List, Optional
-import google.generativeai as genai
 from app.core.config import settings
+from app.services.context import ConversationContext
+from app.services.llm import GeminiBackend, LLMClient, create_client
+from app.services.store import BoundedStore, conversation_size
 import json
 
 class ChatService:
-    def __init__(self, api_key: str = None, model: str = None):
-        genai.configure(api_key=api_key or settings.GEMINI_API_KEY)
-        self.model = genai.GenerativeModel(model or settings.GEMINI_MODEL)
-        self.conversations: Dict[str, List[Dict]] = {}
+    def __init__(self, api_key: str = None, model: str = None, llm: Optional[LLMClient] = None):
+        if llm is None:
+            backend = None
+            if settings.LLM_BACKEND == 'gemini':
+                backend = GeminiBackend(
+                    api_key or settings.GEMINI_API_KEY,
+                    model or settings.GEMINI_MODEL
+                )
+            llm = create_client(settings, backend)
+        self.llm = llm
+        self.conversations = BoundedStore(
+            settings.CONVERSATION_STORE_MAX_BYTES,
+            settings.CONVERSATION_TTL_SECONDS,
+            conversation_size
+        )
+        self.context = ConversationContext(
+            settings.CHAT_CONTEXT_TOKENS,
+            settings.CHAT_SUMMARY_TOKENS,
+            settings.CONVERSATION_STORE_MAX_BYTES // 4,
+            settings.CONVERSATION_TTL_SECONDS
+        )
         
-    def process_message(self, log_id: str, message: str, log_summary: Dict) -> str:
+    async def process_message(self, log_id: str, message: str, log_summary: Dict) -> str:
         """Process a user message and generate a response."""
         try:
             # Get or create conversation history
-            if log_id not in self.conversations:
-                self.conversations[log_id] = []
+            history = self.conversations.get(log_id, [])
                 
             # Add system message with log summary
-            if not self.conversations[log_id]:
-                self.conversations[log_id].append({
+            if not history:
+                history.append({
                     "role": "system",
                     "content": f"You are a helpful assistant analyzing UAV flight logs. Here is the summary of the current log:\n{json.dumps(log_summary, indent=2)}"
                 })
             
-            # Add user message
-            self.conversations[log_id].append({
+            # Compose the prompt: the system message, then as much of the
+            # conversation as fits the context budget
+            turns = self.context.build(log_id, history[1:], history[0]["content"], message)
+            reply = await self.llm.complete(turns)
+            assistant_message = reply.text
+            history.append({
                 "role": "user",
                 "content": message
             })
-            
-            # Compose the prompt for Gemini
-            prompt = self.conversations[log_id][0]["content"] + "\n" + message
-            response = self.model.generate_content(prompt)
-            assistant_message = response.text
-            self.conversations[log_id].append({
+            history.append({
                 "role": "assistant",
                 "content": assistant_message
             })
+            # Store it back so the size budget sees the new turns
+            self.conversations[log_id] = history
             
             return assistant_message
             
@@ -45,6 +64,7 @@ class ChatService:
     
     def clear_conversation(self, log_id: str) -> bool:
         """Clear the conversation history for a specific log."""
+        self.context.forget(log_id)
         if log_id in self.conversations:
             del self.conversations[log_id]
             return True
@@ -1,19 +1,73 @@
-from typing import List, Dict, Optional
-import google.generativeai as genai
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 from app.core.config import settings
+from app.services import metrics
+from app.services.context import ConversationContext, estimate_tokens
+from app.services.fleet import FleetIndex
+from app.services.flight_tools import FLEET_TOOLS, TOOL_DECLARATIONS, FlightTools
+from app.services.llm import LLMClient, ToolCall, create_client, model_turn, tool_turn
+from app.services.parsed_log import ParsedLog
+from app.services.response_cache import ResponseCache
+from app.services.store import BoundedStore, conversation_size
+import asyncio
 import json
+import time
+import weakref
+
+# Model round-trips that may request tools before an answer is required
+MAX_TOOL_ROUNDS = 4
+# Bump when the prompt or the tools change so cached answers are not reused
+PROMPT_VERSION = 5
+
+def _overview(summary: Dict) -> Dict:
+    """The summary with its event lists reduced to counts.
+
+    The lists can hold thousands of entries; the model fetches the parts
+    it needs through the tools instead.
+    """
+    return {
+        (f"{key}_count" if isinstance(value, list) and key != 'message_types' else key):
+        (len(value) if isinstance(value, list) and key != 'message_types' else value)
+        for key, value in summary.items()
+    }
+
+def _record_tokens(turns: List[Dict], answer: str, usage: Optional[Dict[str, int]] = None):
+    """Count the tokens of one LLM call, estimating them unless reported."""
+    if usage is None:
+        prompt = sum(
+            estimate_tokens(turn.get("text") or json.dumps(turn.get("result"), default=str))
+            for turn in turns
+        )
+        usage = {"prompt": prompt, "response": estimate_tokens(answer)}
+    metrics.llm_tokens.inc(usage["prompt"], kind="prompt")
+    metrics.llm_tokens.inc(usage["response"], kind="response")
 
 class Chatbot:
-    def __init__(self):
-        self.conversations = {}
-        genai.configure(api_key=settings.GEMINI_API_KEY)
-        self.model = genai.GenerativeModel(settings.GEMINI_MODEL)
+    def __init__(self, llm: Optional[LLMClient] = None, fleet: Optional[FleetIndex] = None):
+        self.conversations = BoundedStore(
+            settings.CONVERSATION_STORE_MAX_BYTES,
+            settings.CONVERSATION_TTL_SECONDS,
+            conversation_size
+        )
+        self.llm = llm or create_client(settings)
+        self.fleet = fleet
+        self.context = ConversationContext(
+            settings.CHAT_CONTEXT_TOKENS,
+            settings.CHAT_SUMMARY_TOKENS,
+            settings.CONVERSATION_STORE_MAX_BYTES // 4,
+            settings.CONVERSATION_TTL_SECONDS
+        )
+        self.responses = ResponseCache(
+            settings.RESPONSE_CACHE_MAX_BYTES,
+            settings.RESPONSE_CACHE_TTL_SECONDS
+        )
+        self._tools: "weakref.WeakKeyDictionary[ParsedLog, FlightTools]" = weakref.WeakKeyDictionary()
         self.system_prompt = """You are an expert drone flight analyst assistant. Your role is to help users understand their flight logs by analyzing MAVLink telemetry data.
         You have access to flight data including:
         - Flight statistics (altitude, battery, etc.)
         - Events and errors
         - GPS data
         - Mode changes
+        - Anomalies flagged by vectorized detectors over the full-rate data
         
         When answering questions:
         1. Be precise and technical but explain in clear terms
@@ -25,9 +79,14 @@ class Chatbot:
         You can use these functions to access flight data:
         - get_max_altitude(): Returns the maximum altitude reached
         - get_flight_time(): Returns total flight duration
-        - get_gps_issues(): Returns list of GPS signal issues
+        - get_gps_issues(): Returns the intervals with GPS signal issues
         - get_critical_errors(): Returns list of critical errors
-        - get_mode_changes(): Returns list of flight mode changes"""
+        - get_mode_changes(): Returns list of flight mode changes
+        - get_min_battery(): Returns the minimum battery voltage
+        - get_anomalies(): Returns the intervals flagged by the anomaly detectors (vibration, battery sag, EKF variance...)
+        - list_message_types(): Returns the logged message types and fields
+        - get_series(): Returns statistics and samples of any logged field over a time range
+        - query_fleet(): Searches the summaries of every uploaded log, for questions across flights"""
         
     def _get_conversation_history(self, conversation_id: str) -> List[Dict]:
         """Get conversation history for a specific ID."""
@@ -37,8 +96,30 @@ class Chatbot:
         """Update conversation history for a specific ID."""
         self.conversations[conversation_id] = messages
     
-    def process_message(self, message: str, conversation_id: str, flight_data: Dict) -> str:
-        messages = self._get_conversation_history(conversation_id)
+    def _cache_key(self, message: str, conversation_id: str, flight_data: ParsedLog) -> Optional[str]:
+        """Response cache key, or None when the answer must not be cached.
+
+        Follow-up questions depend on the conversation so far and bypass
+        the cache.
+        """
+        if not self.responses.enabled or not flight_data.content_hash:
+            return None
+        if self._get_conversation_history(conversation_id):
+            return None
+        return self.responses.key(flight_data.content_hash, PROMPT_VERSION, message)
+
+    def _tools_for(self, flight_data: ParsedLog) -> FlightTools:
+        """Tools over a parsed log, built once per log."""
+        tools = self._tools.get(flight_data)
+        if tools is None:
+            tools = FlightTools(flight_data, self.fleet)
+            self._tools[flight_data] = tools
+        return tools
+
+    def _start_turn(self, message: str, conversation_id: str, flight_data: ParsedLog) -> Tuple[List[Dict], List[Dict]]:
+        """Add the user message to a copy of the history and build the model turns."""
+        history = self._get_conversation_history(conversation_id)
+        messages = list(history)
         if not messages:
             messages.append({
                 "role": "system",
@@ -48,21 +129,108 @@ class Chatbot:
             "role": "user",
             "content": message
         })
-        # Compose the prompt for Gemini
-        prompt = self.system_prompt + "\n" + json.dumps(flight_data) + "\n" + message
+        # Compose the prompt for the LLM; details come from tool calls and
+        # the conversation so far is fitted into the context budget
+        prefix = self.system_prompt + "\nFlight overview: " + json.dumps(_overview(flight_data.summary))
+        return messages, self.context.build(conversation_id, history, prefix, message)
+
+    @staticmethod
+    async def _run_tools(turns: List[Dict], tools: FlightTools, text: str, calls: List[ToolCall]) -> bool:
+        """Append the model's tool calls and their results to the turns.
+
+        Tools run in a thread: a series query may sort a column or build
+        its pyramid, and fleet queries hit SQLite.  Returns whether a
+        result came from other logs (the fleet), which makes the answer
+        unfit for the per-log response cache.
+        """
+        turns.append(model_turn(text, calls))
+        for call in calls:
+            result = await asyncio.to_thread(tools.call, call.name, call.args)
+            turns.append(tool_turn(call.name, result))
+        return any(call.name in FLEET_TOOLS for call in calls)
+
+    def _finish_turn(self, conversation_id: str, messages: List[Dict], answer: str):
+        """Record a completed answer in the conversation history."""
+        messages.append({
+            "role": "assistant",
+            "content": answer
+        })
+        self._update_conversation_history(conversation_id, messages)
+    
+    async def process_message(self, message: str, conversation_id: str, flight_data: ParsedLog) -> str:
+        started = time.perf_counter()
+        messages, turns = self._start_turn(message, conversation_id, flight_data)
+        key = self._cache_key(message, conversation_id, flight_data)
+        if key is not None:
+            cached = self.responses.get(key)
+            if cached is not None:
+                self._finish_turn(conversation_id, messages, cached)
+                metrics.chat_seconds.observe(time.perf_counter() - started, mode="complete", cached="true")
+                return cached
+        tools = self._tools_for(flight_data)
         try:
-            response = self.model.generate_content(prompt)
-            answer = response.text
-            messages.append({
-                "role": "assistant",
-                "content": answer
-            })
-            self._update_conversation_history(conversation_id, messages)
+            for tool_round in range(MAX_TOOL_ROUNDS + 1):
+                offered = TOOL_DECLARATIONS if tool_round < MAX_TOOL_ROUNDS else None
+                with metrics.llm_seconds.time(mode="complete"):
+                    reply = await self.llm.complete(turns, offered)
+                _record_tokens(turns, reply.text, reply.usage)
+                if not reply.tool_calls:
+                    break
+                if await self._run_tools(turns, tools, reply.text, reply.tool_calls):
+                    key = None
+            answer = reply.text
+            if key is not None:
+                self.responses.put(key, answer, time.perf_counter() - started)
+            self._finish_turn(conversation_id, messages, answer)
+            metrics.chat_seconds.observe(time.perf_counter() - started, mode="complete", cached="false")
             return answer
         except Exception as e:
             return f"Error processing message: {str(e)}"
+
+    async def stream_message(self, message: str, conversation_id: str, flight_data: ParsedLog) -> AsyncIterator[str]:
+        """Stream the answer as it is generated.
+
+        Tool calls are run between model rounds.  The conversation history
+        is only updated once the whole answer has been received; errors
+        propagate to the caller.
+        """
+        started = time.perf_counter()
+        messages, turns = self._start_turn(message, conversation_id, flight_data)
+        key = self._cache_key(message, conversation_id, flight_data)
+        if key is not None:
+            cached = self.responses.get(key)
+            if cached is not None:
+                yield cached
+                self._finish_turn(conversation_id, messages, cached)
+                metrics.chat_seconds.observe(time.perf_counter() - started, mode="stream", cached="true")
+                return
+        tools = self._tools_for(flight_data)
+        answer = []
+        for tool_round in range(MAX_TOOL_ROUNDS + 1):
+            offered = TOOL_DECLARATIONS if tool_round < MAX_TOOL_ROUNDS else None
+            calls, parts = [], []
+            # timed to the last chunk, including the time the caller takes to consume them
+            called = time.perf_counter()
+            async for chunk in self.llm.stream(turns, offered):
+                if isinstance(chunk, ToolCall):
+                    calls.append(chunk)
+                else:
+                    parts.append(chunk)
+                    yield chunk
+            metrics.llm_seconds.observe(time.perf_counter() - called, mode="stream")
+            _record_tokens(turns, "".join(parts))
+            answer.extend(parts)
+            if not calls:
+                break
+            if await self._run_tools(turns, tools, "".join(parts), calls):
+                key = None
+        if key is not None:
+            self.responses.put(key, "".join(answer), time.perf_counter() - started)
+        self._finish_turn(conversation_id, messages, "".join(answer))
+        metrics.chat_seconds.observe(time.perf_counter() - started, mode="stream", cached="false")
     
     def clear_conversation(self, conversation_id: str):
         """Clear conversation history for a specific ID."""
         if conversation_id in self.conversations:
-            del self.conversations[conversation_id] 
\ No newline at end of file
+            del self.conversations[conversation_id]
+        self.context.forget(conversation_id) 
\ No newline at end of file
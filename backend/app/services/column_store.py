@@ -0,0 +1,138 @@
+from typing import Dict, List, Optional, Sequence
+import array
+import numpy as np
+
+# DataFlash format characters: (struct code, numpy dtype, multiplier).
+# Multipliers match what pymavlink applies when reading .bin logs.
+DF_FORMATS = {
+    'a': ('64s', np.dtype('<i2'), None),
+    'b': ('b', np.dtype('i1'), None),
+    'B': ('B', np.dtype('u1'), None),
+    'h': ('h', np.dtype('<i2'), None),
+    'H': ('H', np.dtype('<u2'), None),
+    'i': ('i', np.dtype('<i4'), None),
+    'I': ('I', np.dtype('<u4'), None),
+    'f': ('f', np.dtype('<f4'), None),
+    'n': ('4s', np.dtype('S4'), None),
+    'N': ('16s', np.dtype('S16'), None),
+    'Z': ('64s', np.dtype('S64'), None),
+    'c': ('h', np.dtype('<i2'), 0.01),
+    'C': ('H', np.dtype('<u2'), 0.01),
+    'e': ('i', np.dtype('<i4'), 0.01),
+    'E': ('I', np.dtype('<u4'), 0.01),
+    'L': ('i', np.dtype('<i4'), 1.0e-7),
+    'd': ('d', np.dtype('<f8'), None),
+    'M': ('b', np.dtype('i1'), None),
+    'q': ('q', np.dtype('<i8'), None),
+    'Q': ('Q', np.dtype('<u8'), None),
+}
+
+STRING_FORMATS = 'nNZ'
+
+DEFAULT_CHUNK_SIZE = 8192
+
+
+def decode_strings(raw: np.ndarray) -> np.ndarray:
+    """Convert a fixed-width bytes column into null-terminated unicode."""
+    if raw.size == 0:
+        return np.zeros(0, dtype='U1')
+    width = raw.dtype.itemsize
+    chars = np.ascontiguousarray(raw).view(np.uint8).reshape(len(raw), width)
+    # blank everything after the first null so garbage past it is dropped
+    chars = np.where(np.cumsum(chars == 0, axis=1) > 0, 0, chars).astype(np.uint8)
+    raw = chars.view(f'S{width}').ravel()
+    try:
+        return np.char.decode(raw, 'utf-8')
+    except UnicodeDecodeError:
+        return np.char.decode(raw, 'latin-1')
+
+
+def convert_column(raw: np.ndarray, fmt_char: Optional[str]) -> np.ndarray:
+    """Apply the pymavlink value conversions to a raw decoded column."""
+    if fmt_char is None or fmt_char not in DF_FORMATS:
+        return raw
+    if fmt_char in STRING_FORMATS:
+        return decode_strings(raw)
+    if fmt_char == 'a':
+        return raw.view('<i2').reshape(len(raw), -1) if raw.dtype.kind == 'S' else raw
+    multiplier = DF_FORMATS[fmt_char][2]
+    if multiplier is not None:
+        return raw.astype(np.float64) * multiplier
+    return raw
+
+
+class ColumnStore:
+    """Accumulates decoded messages as one typed NumPy array per field.
+
+    Rows are buffered per message type and converted to arrays every
+    ``chunk_size`` messages; ``finalize`` concatenates the chunks.
+    """
+
+    def __init__(self, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self._fields: Dict[str, List[str]] = {}
+        self._formats: Dict[str, Optional[str]] = {}
+        self._rows: Dict[str, List[Sequence]] = {}
+        self._chunks: Dict[str, Dict[str, List[np.ndarray]]] = {}
+
+    def declare(self, msg_type: str, fields: List[str], formats: Optional[str] = None):
+        """Register the columns (and DataFlash format string) of a message type."""
+        if msg_type in self._fields:
+            return
+        self._fields[msg_type] = list(fields)
+        self._formats[msg_type] = formats[:len(fields)] if formats else None
+        self._rows[msg_type] = []
+        self._chunks[msg_type] = {field: [] for field in fields}
+
+    def append(self, msg_type: str, values: Sequence):
+        """Buffer one message, given its values in declared field order."""
+        rows = self._rows[msg_type]
+        rows.append(values)
+        if len(rows) >= self.chunk_size:
+            self._flush(msg_type)
+
+    def extend(self, msg_type: str, columns: Dict[str, np.ndarray]):
+        """Add an already-converted chunk of columns for a declared type."""
+        self._flush(msg_type)
+        chunks = self._chunks[msg_type]
+        for field, values in columns.items():
+            if field in chunks:
+                chunks[field].append(values)
+
+    def _flush(self, msg_type: str):
+        rows = self._rows[msg_type]
+        if not rows:
+            return
+        fields = self._fields[msg_type]
+        formats = self._formats[msg_type]
+        columns = list(zip(*rows)) if fields else []
+        for i, field in enumerate(fields[:len(columns)]):
+            fmt_char = formats[i] if formats and i < len(formats) else None
+            self._chunks[msg_type][field].append(self._to_array(columns[i], fmt_char))
+        self._rows[msg_type] = []
+
+    @staticmethod
+    def _to_array(values: Sequence, fmt_char: Optional[str]) -> np.ndarray:
+        if fmt_char not in DF_FORMATS:
+            return np.asarray(values)
+        if fmt_char == 'a':
+            raw = b''.join(v.tobytes() if isinstance(v, array.array) else bytes(v) for v in values)
+            return np.frombuffer(raw, dtype='<i2').reshape(len(values), -1)
+        raw = np.asarray(values, dtype=DF_FORMATS[fmt_char][1])
+        return convert_column(raw, fmt_char)
+
+    def finalize(self) -> Dict[str, Dict[str, np.ndarray]]:
+        """Flush pending rows and return ``{msg_type: {field: array}}``."""
+        data = {}
+        for msg_type, chunks in self._chunks.items():
+            self._flush(msg_type)
+            columns = {}
+            for field, parts in chunks.items():
+                if not parts:
+                    continue
+                columns[field] = parts[0] if len(parts) == 1 else np.concatenate(parts)
+            data[msg_type] = columns
+        self._rows.clear()
+        self._chunks.clear()
+        return data
+
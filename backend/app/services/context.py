@@ -0,0 +1,105 @@
+from typing import Dict, List, Tuple
+import re
+from app.services.llm import model_turn, user_turn
+from app.services.store import BoundedStore
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token)."""
+    return (len(text) + 3) // 4
+
+
+def _shorten(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 3].rstrip() + "..."
+
+
+def compact_message(message: Dict) -> str:
+    """One summary line for a message: the question, or an answer's first sentence."""
+    if message["role"] == "user":
+        return "User asked: " + _shorten(message["content"], 200)
+    first = _SENTENCE_END.split(message["content"].strip(), maxsplit=1)[0]
+    return "Assistant answered: " + _shorten(first, 300)
+
+
+class ConversationContext:
+    """Fits a conversation into a token budget for the next model call.
+
+    The most recent messages that fit in ``max_tokens - summary_tokens``
+    are sent verbatim; older ones are compacted into a running summary of
+    one line per message, capped at ``summary_tokens`` by dropping its
+    oldest lines.  The summary is cached per conversation and extended
+    incrementally as messages leave the verbatim window, so each turn only
+    compacts the messages that just fell out of it.
+    """
+
+    def __init__(self, max_tokens: int, summary_tokens: int, max_bytes: int, ttl_seconds: float):
+        self.max_tokens = max_tokens
+        self.summary_tokens = summary_tokens
+        self.compacted = 0
+        # conversation id -> (messages compacted so far, summary lines)
+        self._summaries = BoundedStore(
+            max_bytes, ttl_seconds,
+            lambda entry: sum(len(line) for line in entry[1]) + 64)
+
+    def _split(self, history: List[Dict], budget: int) -> int:
+        """Index of the first message kept verbatim."""
+        used = 0
+        split = len(history)
+        while split > 0:
+            cost = estimate_tokens(history[split - 1]["content"])
+            if used + cost > budget:
+                break
+            used += cost
+            split -= 1
+        # start the verbatim window on a question so roles alternate
+        while split < len(history) and history[split]["role"] != "user":
+            split += 1
+        return split
+
+    def _summary(self, conversation_id: str, older: List[Dict]) -> List[str]:
+        cached: Tuple[int, List[str]] = self._summaries.get(conversation_id)
+        if cached is None or cached[0] > len(older):
+            count, lines = 0, []
+        else:
+            count, lines = cached[0], list(cached[1])
+        lines.extend(compact_message(message) for message in older[count:])
+        self.compacted += len(older) - count
+        while lines and estimate_tokens("\n".join(lines)) > self.summary_tokens:
+            lines.pop(0)
+        self._summaries[conversation_id] = (len(older), lines)
+        return lines
+
+    def build(self, conversation_id: str, history: List[Dict], prefix: str, question: str) -> List[Dict]:
+        """Model turns for ``question`` given the earlier messages of a conversation.
+
+        ``prefix`` (system prompt and log overview) opens the first user
+        turn, followed by the compacted summary when there is one.
+        """
+        history = [message for message in history if message["role"] in ("user", "assistant")]
+        split = self._split(history, self.max_tokens - self.summary_tokens)
+        lines = self._summary(conversation_id, history[:split]) if split else []
+        if lines:
+            prefix += "\nEarlier in this conversation:\n" + "\n".join(lines)
+        turns = []
+        for message in history[split:]:
+            if message["role"] == "user":
+                turns.append(user_turn(message["content"]))
+            else:
+                turns.append(model_turn(message["content"]))
+        turns.append(user_turn(question))
+        turns[0] = user_turn(prefix + "\n" + turns[0]["text"])
+        return turns
+
+    def forget(self, conversation_id: str):
+        self._summaries.pop(conversation_id)
+
+    def stats(self) -> Dict:
+        return {
+            'max_tokens': self.max_tokens,
+            'summary_tokens': self.summary_tokens,
+            'compacted_messages': self.compacted,
+            'cached_summaries': len(self._summaries),
+        }
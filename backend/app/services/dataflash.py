@@ -0,0 +1,323 @@
+import mmap
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from app.services.column_store import ColumnStore, DF_FORMATS, convert_column
+
+HEAD1 = 0xA3
+HEAD2 = 0x95
+FMT_TYPE = 0x80
+FMT_LENGTH = 89
+
+# Bytes examined per vectorized header search, and records per gather
+SCAN_WINDOW = 64 * 1024 * 1024
+GATHER_BLOCK = 65536
+# Largest possible record (the length field is one byte)
+MAX_RECORD_SIZE = 255
+
+FMT_DTYPE = np.dtype([
+    ('Type', 'u1'), ('Length', 'u1'), ('Name', 'S4'),
+    ('Format', 'S16'), ('Columns', 'S64'),
+])
+
+
+class DataFlashError(Exception):
+    """Raised when a file cannot be decoded as a binary DataFlash log."""
+
+
+class DataFlashFormat:
+    """One FMT record: message layout plus the matching NumPy dtype."""
+
+    def __init__(self, msg_id: int, name: str, length: int, format: str, columns: List[str]):
+        self.msg_id = msg_id
+        self.name = name
+        self.length = length
+        self.format = format
+        self.columns = columns
+        self.dtype = self._build_dtype()
+
+    def _build_dtype(self) -> np.dtype:
+        names, formats, offsets = [], [], []
+        offset = 0
+        for i, char in enumerate(self.format):
+            field_dtype = DF_FORMATS[char][1]
+            if char == 'a':
+                field_dtype = np.dtype(('<i2', (32,)))
+            names.append(f'f{i}')
+            formats.append(field_dtype)
+            offsets.append(offset)
+            offset += field_dtype.itemsize
+        if offset + 3 != self.length:
+            raise DataFlashError(
+                f"FMT length mismatch for {self.name}: {self.length} != {offset + 3}")
+        return np.dtype({'names': names, 'formats': formats,
+                         'offsets': offsets, 'itemsize': offset})
+
+
+def _null_term(value: bytes) -> str:
+    return value.split(b'\0', 1)[0].decode('latin-1')
+
+
+def find_headers(buf: np.ndarray, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+    """Offsets of every ``A3 95`` header candidate in ``buf[start:stop]``."""
+    stop = len(buf) if stop is None else stop
+    found = []
+    for window in range(start, stop, SCAN_WINDOW):
+        end = min(window + SCAN_WINDOW, stop)
+        first = np.flatnonzero(buf[window:end] == HEAD1) + window
+        first = first[first + 2 < len(buf)]
+        found.append(first[buf[first + 1] == HEAD2])
+    if not found:
+        return np.zeros(0, dtype=np.int64)
+    return np.concatenate(found).astype(np.int64)
+
+
+def read_formats(buf: np.ndarray, headers: np.ndarray) -> Dict[int, DataFlashFormat]:
+    """Decode every FMT record found among the header candidates."""
+    candidates = headers[buf[headers + 2] == FMT_TYPE]
+    candidates = candidates[candidates + FMT_LENGTH <= len(buf)]
+    if candidates.size == 0:
+        return {}
+    rows = buf[(candidates + 3)[:, None] + np.arange(FMT_LENGTH - 3)]
+    records = rows.view(FMT_DTYPE).reshape(-1)
+    formats = {}
+    for record in records:
+        msg_id = int(record['Type'])
+        if msg_id in formats:
+            continue
+        try:
+            name = _null_term(record['Name'])
+            fmt = _null_term(record['Format'])
+            columns = _null_term(record['Columns'])
+            if not name.isalnum() or not fmt or any(char not in DF_FORMATS for char in fmt):
+                continue
+            formats[msg_id] = DataFlashFormat(
+                msg_id, name, int(record['Length']), fmt,
+                columns.split(',') if columns else [])
+        except (DataFlashError, UnicodeDecodeError):
+            continue
+    return formats
+
+
+def scan_records(buf: np.ndarray, headers: np.ndarray,
+                 lengths: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Keep the header candidates that are real record starts.
+
+    A record that is reached from the previous one and followed by
+    another header is accepted outright.  Other candidates (resync points
+    after corrupt bytes, the last record before a gap) are accepted when
+    they do not sit inside an accepted record; remaining overlaps are
+    resolved in favour of the better-anchored record.  Returns the
+    record offsets and their message ids.
+    """
+    known = headers[lengths[buf[headers + 2]] > 0]
+    ends = known + lengths[buf[known + 2]]
+    complete = ends <= len(buf)
+    starts, ends = known[complete], ends[complete]
+    if starts.size == 0:
+        return starts, starts.copy()
+
+    forward = (ends == len(buf)) | np.isin(ends, known)
+    anchored = np.isin(starts, ends[forward])
+    anchored[0] = True
+    primary = anchored & forward
+
+    primary_starts, primary_ends = starts[primary], ends[primary]
+    prev = np.searchsorted(primary_starts, starts) - 1
+    inside = np.zeros(len(starts), dtype=bool)
+    if primary_starts.size:
+        inside = (prev >= 0) & (primary_ends[np.maximum(prev, 0)] > starts)
+    keep = primary | ~inside
+    starts, ends = starts[keep], ends[keep]
+    priority = (2 * primary + forward)[keep]
+
+    while True:
+        overlap = np.flatnonzero(starts[1:] < ends[:-1])
+        if overlap.size == 0:
+            break
+        # drop the weaker record of each overlapping pair (the later on ties)
+        drop = np.where(priority[overlap] >= priority[overlap + 1], overlap + 1, overlap)
+        keep = np.ones(len(starts), dtype=bool)
+        keep[drop] = False
+        starts, ends, priority = starts[keep], ends[keep], priority[keep]
+    return starts, buf[starts + 2].astype(np.int64)
+
+
+def gather_records(buf: np.ndarray, offsets: np.ndarray, fmt: DataFlashFormat) -> Dict[str, np.ndarray]:
+    """Decode all records of one type at the given offsets into columns."""
+    payload = fmt.length - 3
+    chunks = []
+    for block in range(0, len(offsets), GATHER_BLOCK):
+        starts = offsets[block:block + GATHER_BLOCK] + 3
+        rows = buf[starts[:, None] + np.arange(payload)]
+        chunks.append(rows.view(fmt.dtype).reshape(-1))
+    if not chunks:
+        records = np.zeros(0, dtype=fmt.dtype)
+    else:
+        records = chunks[0] if len(chunks) == 1 else np.concatenate(chunks)
+    columns = {}
+    for i, column in enumerate(fmt.columns[:len(fmt.format)]):
+        if column in columns:
+            continue
+        raw = np.ascontiguousarray(records[f'f{i}'])
+        columns[column] = convert_column(raw, fmt.format[i])
+    return columns
+
+
+def decode_records(buf: np.ndarray, offsets: np.ndarray, msg_ids: np.ndarray,
+                   formats: Dict[int, DataFlashFormat], store: ColumnStore,
+                   types: Optional[set] = None):
+    """Gather the located records type by type into ``store``."""
+    if offsets.size == 0:
+        return
+    # group record offsets by type, keeping file order within a type
+    order = np.argsort(msg_ids, kind='stable')
+    present, first, counts = np.unique(msg_ids, return_index=True, return_counts=True)
+    bounds = np.concatenate(([0], np.cumsum(counts)))
+
+    # decode types in order of first appearance, like a sequential reader
+    for i in np.argsort(first):
+        fmt = formats[int(present[i])]
+        if types is not None and fmt.name not in types:
+            continue
+        type_offsets = offsets[order[bounds[i]:bounds[i + 1]]]
+        store.declare(fmt.name, fmt.columns, fmt.format)
+        store.extend(fmt.name, gather_records(buf, type_offsets, fmt))
+
+
+def _length_table(formats: Dict[int, DataFlashFormat]) -> np.ndarray:
+    lengths = np.zeros(256, dtype=np.int64)
+    for msg_id, fmt in formats.items():
+        lengths[msg_id] = fmt.length
+    return lengths
+
+
+class DataFlashDecoder:
+    """Vectorized decoder for binary DataFlash (.bin) logs.
+
+    The file is memory-mapped, FMT records are read up front to build a
+    structured dtype per message type, record offsets are located in one
+    scan and each type is then decoded with a single gather.
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.formats: Dict[int, DataFlashFormat] = {}
+
+    def decode(self, types: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, np.ndarray]]:
+        """Decode the log, optionally only the named message types."""
+        if os.path.getsize(self.file_path) == 0:
+            raise DataFlashError("Log file is empty")
+        with open(self.file_path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return self._decode_buffer(np.frombuffer(mapped, dtype=np.uint8),
+                                       set(types) if types is not None else None)
+        finally:
+            try:
+                mapped.close()
+            except BufferError:
+                # still referenced from a traceback; unmapped when collected
+                pass
+
+    def _decode_buffer(self, buf: np.ndarray, types: Optional[set]) -> Dict[str, Dict[str, np.ndarray]]:
+        headers = find_headers(buf)
+        self.formats = read_formats(buf, headers)
+        if not self.formats:
+            raise DataFlashError("No FMT records found")
+
+        offsets, msg_ids = scan_records(buf, headers, _length_table(self.formats))
+        store = ColumnStore()
+        decode_records(buf, offsets, msg_ids, self.formats, store, types)
+        return store.finalize()
+
+
+def last_times(buf: np.ndarray, offsets: np.ndarray, msg_ids: np.ndarray,
+               formats: Dict[int, DataFlashFormat]) -> Dict[str, int]:
+    """``TimeUS`` of the last record of each type among the located records."""
+    ids, from_end = np.unique(msg_ids[::-1], return_index=True)
+    times = {}
+    for msg_id, index in zip(ids.tolist(), (len(msg_ids) - 1 - from_end).tolist()):
+        fmt = formats[msg_id]
+        if 'TimeUS' not in fmt.columns[:len(fmt.format)]:
+            continue
+        start = int(offsets[index]) + 3
+        record = buf[start:start + fmt.length - 3].view(fmt.dtype)
+        times[fmt.name] = int(record[f"f{fmt.columns.index('TimeUS')}"][0])
+    return times
+
+
+class IncrementalDecoder:
+    """Decodes a DataFlash log from successive chunks of bytes.
+
+    Each ``feed`` decodes the complete records received so far and keeps
+    only the unconsumed tail, so a log can be parsed while it is still
+    being uploaded.  ``finish`` decodes the remainder and returns the
+    same columns ``DataFlashDecoder.decode`` would.
+
+    Columns go to ``store`` (a ``ColumnStore`` by default); any object
+    with the same ``declare``/``extend``/``finalize`` methods can consume
+    them instead.  Whatever the ``types`` filter, the decoder tracks the
+    names of all message types seen and the last timestamp of each.
+    """
+
+    def __init__(self, types: Optional[Iterable[str]] = None, store=None):
+        self.types = set(types) if types is not None else None
+        self.formats: Dict[int, DataFlashFormat] = {}
+        self.bytes_fed = 0
+        self.records = 0
+        # every message type seen, in order of first appearance
+        self.message_types: Dict[str, None] = {}
+        self.last_times: Dict[str, int] = {}
+        self._pending = b''
+        self._store = store if store is not None else ColumnStore()
+
+    def feed(self, chunk: bytes):
+        """Decode the complete records available after adding ``chunk``."""
+        self.bytes_fed += len(chunk)
+        self._pending += chunk
+        self._process(final=False)
+
+    @property
+    def bytes_decoded(self) -> int:
+        """Bytes fed so far minus the undecoded tail."""
+        return self.bytes_fed - len(self._pending)
+
+    def finish(self) -> Dict[str, Dict[str, np.ndarray]]:
+        """Decode whatever is left and return the columns."""
+        self._process(final=True)
+        if not self.formats:
+            raise DataFlashError("No FMT records found")
+        return self._store.finalize()
+
+    def _process(self, final: bool):
+        buf = np.frombuffer(self._pending, dtype=np.uint8)
+        if buf.size == 0:
+            return
+        headers = find_headers(buf)
+        for msg_id, fmt in read_formats(buf, headers).items():
+            self.formats.setdefault(msg_id, fmt)
+        lengths = _length_table(self.formats)
+        offsets, msg_ids = scan_records(buf, headers, lengths)
+        if not final:
+            # records near the end cannot be checked against their successor yet
+            safe = offsets + lengths[msg_ids] <= len(buf) - MAX_RECORD_SIZE
+            offsets, msg_ids = offsets[safe], msg_ids[safe]
+        decode_records(buf, offsets, msg_ids, self.formats, self._store, self.types)
+        self.records += len(offsets)
+        if offsets.size:
+            present, first = np.unique(msg_ids, return_index=True)
+            for msg_id in present[np.argsort(first)].tolist():
+                self.message_types.setdefault(self.formats[msg_id].name, None)
+            self.last_times.update(last_times(buf, offsets, msg_ids, self.formats))
+
+        if final:
+            consumed = len(buf)
+        elif offsets.size:
+            consumed = int(offsets[-1] + lengths[msg_ids[-1]])
+        elif len(buf) >= 4 * MAX_RECORD_SIZE:
+            # nothing decodable: keep only enough bytes to hold a partial record
+            consumed = len(buf) - 2 * MAX_RECORD_SIZE
+        else:
+            consumed = 0
+        self._pending = self._pending[consumed:]
@@ -0,0 +1,56 @@
+import numpy as np
+
+
+def minmax(values: np.ndarray, points: int) -> np.ndarray:
+    """Indices of the minimum and maximum of each bucket, in order.
+
+    ``values`` is split into ``points // 2`` equal buckets, so peaks and
+    dips survive however far a series is decimated.  Returns at most
+    ``points`` sorted indices (all of them if there are no more).
+    """
+    count = len(values)
+    if points >= count:
+        return np.arange(count)
+    buckets = max(1, points // 2)
+    size = -(-count // buckets)
+    buckets = -(-count // size)
+    padded = values
+    if buckets * size > count:
+        # pad with the last value: a pick in the padding maps back to it
+        padded = np.concatenate((values, np.repeat(values[-1:], buckets * size - count)))
+    rows = padded.reshape(buckets, size)
+    base = np.arange(buckets) * size
+    picks = np.stack((base + rows.argmin(axis=1), base + rows.argmax(axis=1)), axis=1)
+    indices = np.minimum(np.sort(picks, axis=1).ravel(), count - 1)
+    return indices[np.concatenate(([True], indices[1:] != indices[:-1]))]
+
+
+def lttb(times: np.ndarray, values: np.ndarray, points: int) -> np.ndarray:
+    """Indices picked by Largest-Triangle-Three-Buckets.
+
+    Keeps the first and last samples and, from each of ``points - 2``
+    buckets in between, the sample forming the largest triangle with the
+    previous pick and the average of the next bucket.  Bucket averages
+    and areas are computed with NumPy; only the walk from bucket to
+    bucket, which depends on the previous pick, is a loop.
+    """
+    count = len(values)
+    if points >= count or points < 3:
+        return np.arange(count)
+    x = times.astype(np.float64)
+    y = values.astype(np.float64)
+    edges = np.linspace(1, count - 1, points - 1).astype(np.intp)
+    sizes = np.diff(edges)
+    # anchor for bucket i: the average of bucket i + 1 (the last point for the last bucket)
+    next_x = np.append(np.add.reduceat(x[:count - 1], edges[:-1])[1:] / sizes[1:], x[-1])
+    next_y = np.append(np.add.reduceat(y[:count - 1], edges[:-1])[1:] / sizes[1:], y[-1])
+    picks = np.empty(points, dtype=np.intp)
+    picks[0], picks[-1] = 0, count - 1
+    previous = 0
+    for i in range(points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        px, py = x[previous], y[previous]
+        area = np.abs((px - next_x[i]) * (y[lo:hi] - py) - (px - x[lo:hi]) * (next_y[i] - py))
+        previous = lo + int(area.argmax())
+        picks[i + 1] = previous
+    return picks
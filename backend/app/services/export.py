@@ -0,0 +1,80 @@
+from typing import IO, Dict, Iterable, Optional
+import json
+import zipfile
+import numpy as np
+
+# Download formats: media type and file extension of each table
+EXPORT_FORMATS = {
+    'arrow': ('application/vnd.apache.arrow.file', 'arrow'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+# Column compression inside the files (both formats support it)
+EXPORT_COMPRESSION = 'zstd'
+
+
+class ExportUnavailable(Exception):
+    """Raised when pyarrow, which the export needs, is not installed."""
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ExportUnavailable("Log export needs pyarrow (pip install pyarrow)")
+    return pyarrow
+
+
+def _column(pa, values: np.ndarray):
+    """An Arrow array over a column, sharing its buffer where Arrow allows."""
+    if values.ndim > 1:
+        # fixed-width array fields (format 'a') become fixed-size lists
+        width = values.shape[1]
+        flat = pa.array(np.ascontiguousarray(values).reshape(-1))
+        return pa.FixedSizeListArray.from_arrays(flat, width)
+    # numeric columns are wrapped without a copy; strings are converted
+    return pa.array(values)
+
+
+def to_table(msg_type: str, columns: Dict[str, np.ndarray]):
+    """One message type as an Arrow table, with its column dtypes kept."""
+    pa = _pyarrow()
+    return pa.table(
+        {field: _column(pa, values) for field, values in columns.items()},
+        metadata={'msg_type': msg_type}
+    )
+
+
+def write_table(table, fmt: str, sink: IO[bytes]):
+    """Write a table as an Arrow IPC file or a Parquet file."""
+    pa = _pyarrow()
+    if fmt == 'arrow':
+        options = pa.ipc.IpcWriteOptions(compression=EXPORT_COMPRESSION)
+        with pa.ipc.new_file(sink, table.schema, options=options) as writer:
+            writer.write_table(table)
+    elif fmt == 'parquet':
+        pa.parquet.write_table(table, sink, compression=EXPORT_COMPRESSION)
+    else:
+        raise ValueError(f"format must be one of {', '.join(EXPORT_FORMATS)}")
+
+
+def export_log(summary: Dict, data: Dict[str, Dict[str, np.ndarray]], fmt: str,
+               sink: IO[bytes], types: Optional[Iterable[str]] = None):
+    """Write a parsed log as a zip of one table file per message type.
+
+    The archive holds ``<TYPE>.arrow`` or ``<TYPE>.parquet`` for each
+    message type (or each of ``types``) and the flight summary as
+    ``summary.json``.  Members are stored uncompressed: the tables are
+    compressed column by column already.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    _pyarrow()
+    selected = list(data) if types is None else [msg_type for msg_type in types if msg_type in data]
+    extension = EXPORT_FORMATS[fmt][1]
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+        archive.writestr('summary.json', json.dumps(summary, default=str))
+        for msg_type in selected:
+            with archive.open(f'{msg_type}.{extension}', 'w', force_zip64=True) as member:
+                write_table(to_table(msg_type, data[msg_type]), fmt, member)
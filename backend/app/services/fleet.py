@@ -0,0 +1,249 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+import os
+import re
+import sqlite3
+import threading
+import time
+import numpy as np
+
+# GPS time counts from 1980-01-06 and ignores leap seconds (18 since then)
+GPS_EPOCH = 315964800
+GPS_LEAP_SECONDS = 18
+SECONDS_PER_WEEK = 604800
+# Firmware banner logged at boot, e.g. "ArduCopter V4.5.0 (abcdef12)"
+_FIRMWARE = re.compile(r'\b(Ardu\w+|PX4\w*|Blimp|Rover)\s+(V\d[\w.\-]*)')
+
+# Query filters: name -> SQL condition on the flights table
+FILTERS = {
+    'min_battery_below': 'min_battery < ?',
+    'min_battery_above': 'min_battery > ?',
+    'max_altitude_above': 'max_altitude > ?',
+    'max_altitude_below': 'max_altitude < ?',
+    'flight_time_above': 'flight_time > ?',
+    'flight_time_below': 'flight_time < ?',
+    'since': 'flight_date >= ?',
+    'until': 'flight_date < ?',
+    'vehicle': 'vehicle = ?',
+    'has_gps_issues': '(gps_issue_count > 0) = ?',
+    'has_critical_errors': '(critical_error_count > 0) = ?',
+    'mode': 'EXISTS (SELECT 1 FROM mode_changes m WHERE m.content_hash = flights.content_hash AND m.mode = ?)',
+}
+ORDER_COLUMNS = ('flight_date', 'uploaded', 'flight_time', 'max_altitude', 'min_battery',
+                 'gps_issue_seconds', 'critical_error_count')
+# Most flights one query returns
+MAX_RESULTS = 1000
+
+_COLUMNS = (
+    'content_hash', 'log_id', 'filename', 'uploaded', 'flight_date', 'date_source',
+    'vehicle', 'firmware', 'flight_time', 'max_altitude', 'min_battery',
+    'gps_issue_count', 'gps_issue_seconds', 'error_count', 'critical_error_count',
+    'mode_change_count', 'modes',
+)
+
+
+def _first_string(column: Optional[np.ndarray], pattern: re.Pattern) -> Optional[re.Match]:
+    if column is None:
+        return None
+    for value in column[:100].tolist():
+        match = pattern.search(str(value))
+        if match:
+            return match
+    return None
+
+
+def flight_metadata(data: Dict[str, Dict[str, np.ndarray]]) -> Dict[str, Any]:
+    """Vehicle, firmware and UTC date of a flight, from its messages.
+
+    The vehicle and firmware come from the boot banner in MSG; the date
+    is that of the first GPS sample with a 3D fix (None without one).
+    """
+    match = _first_string(data.get('MSG', {}).get('Message'), _FIRMWARE)
+    gps = data.get('GPS', {})
+    flight_date = None
+    if {'GWk', 'GMS', 'Status'} <= gps.keys():
+        fixed = np.flatnonzero((gps['Status'] >= 3) & (gps['GWk'] > 0))
+        if fixed.size:
+            i = fixed[0]
+            flight_date = (GPS_EPOCH - GPS_LEAP_SECONDS + int(gps['GWk'][i]) * SECONDS_PER_WEEK
+                           + int(gps['GMS'][i]) / 1000)
+    return {
+        'vehicle': match.group(1) if match else None,
+        'firmware': match.group(2) if match else None,
+        'flight_date': flight_date,
+    }
+
+
+def _mode(change: Dict) -> Optional[int]:
+    value = change.get('ModeNum', change.get('Mode'))
+    return int(value) if value is not None else None
+
+
+def _iso(timestamp: Optional[float]) -> Optional[str]:
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat(timespec='seconds')
+
+
+class FleetIndex:
+    """Flight summaries of every ingested log, indexed in SQLite for cross-log queries.
+
+    One row per distinct log (by content hash, so re-uploads update the
+    row) with the summary figures, counts and metadata, plus one row per
+    GPS issue interval and per mode change.  Filters hit indexed columns,
+    so queries over thousands of flights take milliseconds and never
+    touch the logs themselves.  The database is shared by every process
+    on the host (WAL mode) and outlives the log store's TTL.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._lock = threading.Lock()
+        self._db.executescript('''
+            CREATE TABLE IF NOT EXISTS flights (
+                content_hash TEXT PRIMARY KEY, log_id TEXT NOT NULL, filename TEXT,
+                uploaded REAL NOT NULL, flight_date REAL NOT NULL, date_source TEXT NOT NULL,
+                vehicle TEXT, firmware TEXT, flight_time REAL, max_altitude REAL, min_battery REAL,
+                gps_issue_count INTEGER NOT NULL, gps_issue_seconds REAL NOT NULL,
+                error_count INTEGER NOT NULL, critical_error_count INTEGER NOT NULL,
+                mode_change_count INTEGER NOT NULL, modes TEXT NOT NULL);
+            CREATE INDEX IF NOT EXISTS flights_log_id ON flights (log_id);
+            CREATE INDEX IF NOT EXISTS flights_date ON flights (flight_date);
+            CREATE INDEX IF NOT EXISTS flights_battery ON flights (min_battery);
+            CREATE INDEX IF NOT EXISTS flights_altitude ON flights (max_altitude);
+            CREATE INDEX IF NOT EXISTS flights_vehicle ON flights (vehicle, flight_date);
+            CREATE TABLE IF NOT EXISTS gps_issues (
+                content_hash TEXT NOT NULL, start REAL NOT NULL, end REAL NOT NULL,
+                samples INTEGER, worst_status INTEGER, min_satellites INTEGER);
+            CREATE INDEX IF NOT EXISTS gps_issues_hash ON gps_issues (content_hash);
+            CREATE TABLE IF NOT EXISTS mode_changes (
+                content_hash TEXT NOT NULL, seq INTEGER NOT NULL, mode INTEGER,
+                start REAL NOT NULL, end REAL NOT NULL);
+            CREATE INDEX IF NOT EXISTS mode_changes_mode ON mode_changes (mode, content_hash);
+        ''')
+
+    def add(self, log_id: str, content_hash: str, summary: Dict,
+            data: Dict[str, Dict[str, np.ndarray]], filename: Optional[str] = None):
+        """Index a parsed log (or point a known one at its new ``log_id``)."""
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                known = self._db.execute(
+                    'SELECT 1 FROM flights WHERE content_hash = ?', (content_hash,)).fetchone()
+                if known:
+                    self._db.execute(
+                        'UPDATE flights SET log_id = ?, filename = coalesce(?, filename) '
+                        'WHERE content_hash = ?', (log_id, filename, content_hash))
+                else:
+                    self._insert(log_id, content_hash, summary, data, filename)
+                self._db.execute('COMMIT')
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+
+    def _insert(self, log_id: str, content_hash: str, summary: Dict,
+                data: Dict[str, Dict[str, np.ndarray]], filename: Optional[str]):
+        metadata = flight_metadata(data)
+        uploaded = time.time()
+        gps_issues = summary.get('gps_issues', [])
+        critical = summary.get('critical_errors', [])
+        modes = summary.get('mode_changes', [])
+        errors = data.get('ERR', {})
+        row = {
+            'content_hash': content_hash,
+            'log_id': log_id,
+            'filename': filename,
+            'uploaded': uploaded,
+            'flight_date': metadata['flight_date'] or uploaded,
+            'date_source': 'gps' if metadata['flight_date'] else 'upload',
+            'vehicle': metadata['vehicle'],
+            'firmware': metadata['firmware'],
+            'flight_time': summary.get('flight_time'),
+            # the summary reports 0 when nothing was logged; index that as unknown
+            'max_altitude': summary.get('max_altitude') if 'GPS' in data else None,
+            'min_battery': summary.get('min_battery') if 'BAT' in data else None,
+            'gps_issue_count': len(gps_issues),
+            'gps_issue_seconds': sum(issue['end'] - issue['start'] for issue in gps_issues) / 1e6,
+            'error_count': len(next(iter(errors.values()))) if errors else 0,
+            'critical_error_count': sum(error.get('count', 1) for error in critical),
+            'mode_change_count': len(modes),
+            'modes': ','.join(str(_mode(change)) for change in modes),
+        }
+        self._db.execute(
+            f"INSERT INTO flights ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+            [row[column] for column in _COLUMNS])
+        self._db.executemany(
+            'INSERT INTO gps_issues VALUES (?, ?, ?, ?, ?, ?)',
+            [(content_hash, issue['start'] / 1e6, issue['end'] / 1e6, issue.get('samples'),
+              issue.get('worst_status'), issue.get('min_satellites')) for issue in gps_issues])
+        self._db.executemany(
+            'INSERT INTO mode_changes VALUES (?, ?, ?, ?, ?)',
+            [(content_hash, seq, _mode(change), change['start'] / 1e6, change['end'] / 1e6)
+             for seq, change in enumerate(modes)])
+
+    @staticmethod
+    def _where(filters: Dict[str, Any]):
+        conditions, args = [], []
+        for name, value in filters.items():
+            if value is None:
+                continue
+            if name not in FILTERS:
+                raise ValueError(f"Unknown filter: {name}")
+            conditions.append(FILTERS[name])
+            args.append(int(value) if isinstance(value, bool) else value)
+        return (' WHERE ' + ' AND '.join(conditions)) if conditions else '', args
+
+    def query(self, order_by: str = 'flight_date', descending: bool = True,
+              limit: int = 100, offset: int = 0, **filters) -> Dict:
+        """Flights matching every filter (see ``FILTERS``), with the total count.
+
+        ``since`` and ``until`` are UTC timestamps in seconds.
+        """
+        if order_by not in ORDER_COLUMNS:
+            raise ValueError(f"order_by must be one of {', '.join(ORDER_COLUMNS)}")
+        where, args = self._where(filters)
+        limit = max(0, min(int(limit), MAX_RESULTS))
+        with self._lock:
+            total = self._db.execute(f'SELECT count(*) FROM flights{where}', args).fetchone()[0]
+            rows = self._db.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM flights{where} "
+                f"ORDER BY {order_by} IS NULL, {order_by} {'DESC' if descending else 'ASC'} "
+                "LIMIT ? OFFSET ?",
+                args + [limit, int(offset)]
+            ).fetchall()
+        items = []
+        for row in rows:
+            item = dict(zip(_COLUMNS, row))
+            item['flight_date'] = _iso(item['flight_date'])
+            item['uploaded'] = _iso(item['uploaded'])
+            item['modes'] = [int(mode) if mode.lstrip('-').isdigit() else None
+                             for mode in item['modes'].split(',') if mode]
+            items.append(item)
+        return {'total': total, 'items': items}
+
+    def aggregate(self, **filters) -> Dict:
+        """Fleet totals and extremes over the flights matching the filters."""
+        where, args = self._where(filters)
+        with self._lock:
+            row = self._db.execute(
+                'SELECT count(*), coalesce(sum(flight_time), 0), min(min_battery), max(max_altitude), '
+                'sum(gps_issue_count > 0), sum(critical_error_count > 0), '
+                f'min(flight_date), max(flight_date) FROM flights{where}', args
+            ).fetchone()
+        return {
+            'flights': row[0],
+            'total_flight_hours': round(row[1] / 3600, 3),
+            'lowest_battery_v': row[2],
+            'highest_altitude_m': row[3],
+            'flights_with_gps_issues': row[4] or 0,
+            'flights_with_critical_errors': row[5] or 0,
+            'first_flight': _iso(row[6]),
+            'last_flight': _iso(row[7]),
+        }
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'flights': self._db.execute('SELECT count(*) FROM flights').fetchone()[0]}
@@ -0,0 +1,275 @@
+from typing import Any, Dict, List, Optional
+import time
+import numpy as np
+from app.services.anomalies import DETECTORS
+from app.services.fleet import FleetIndex
+from app.services.parsed_log import ParsedLog
+from app.services.series import series_index
+
+# Most items any list-returning tool sends back in one call
+MAX_ITEMS = 50
+
+_TIME_RANGE = {
+    "start": {"type": "number", "description": "Start of the time range, in seconds since boot"},
+    "end": {"type": "number", "description": "End of the time range, in seconds since boot"},
+}
+_LIMIT = {"limit": {"type": "integer", "description": f"Maximum number of items to return (at most {MAX_ITEMS})"}}
+# Fields of each flight that query_fleet returns
+_FLEET_FIELDS = ("log_id", "filename", "flight_date", "vehicle", "flight_time", "max_altitude",
+                 "min_battery", "gps_issue_count", "critical_error_count")
+
+# Function declarations offered to the model (JSON schema parameters)
+TOOL_DECLARATIONS: List[Dict] = [
+    {
+        "name": "get_max_altitude",
+        "description": "Maximum GPS altitude reached during the flight, in meters.",
+    },
+    {
+        "name": "get_flight_time",
+        "description": "Total flight duration in seconds.",
+    },
+    {
+        "name": "get_min_battery",
+        "description": "Minimum battery voltage during the flight, in volts.",
+    },
+    {
+        "name": "get_gps_issues",
+        "description": (
+            "Intervals without a 3D GPS fix (start, end, samples, worst status, "
+            "fewest satellites), optionally within a time range."
+        ),
+        "parameters": {"type": "object", "properties": {**_TIME_RANGE, **_LIMIT}},
+    },
+    {
+        "name": "get_critical_errors",
+        "description": (
+            "ERR messages with a non-zero error code (ECode, per subsystem Subsys), "
+            "repeats merged into intervals, "
+            "optionally within a time range."
+        ),
+        "parameters": {"type": "object", "properties": {**_TIME_RANGE, **_LIMIT}},
+    },
+    {
+        "name": "get_mode_changes",
+        "description": "Flight modes with the interval each was active, optionally within a time range.",
+        "parameters": {"type": "object", "properties": {**_TIME_RANGE, **_LIMIT}},
+    },
+    {
+        "name": "get_anomalies",
+        "description": (
+            "Intervals flagged by the anomaly detectors (detector, source message and instance, "
+            "start, end, anomalous samples, peak value), optionally of one detector and within "
+            "a time range. Detectors: "
+            + "; ".join(f"{name}: {detector.description}" for name, detector in DETECTORS.items())
+            + "."
+        ),
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "detector": {"type": "string", "description": "Only intervals of this detector"},
+                **_TIME_RANGE,
+                **_LIMIT,
+            },
+        },
+    },
+    {
+        "name": "list_message_types",
+        "description": "Message types in the log with their fields and sample counts.",
+    },
+    {
+        "name": "get_series",
+        "description": (
+            "Statistics and a downsampled series of one field of a message type "
+            "(for example GPS.Alt, BAT.Volt, ATT.Roll) over an optional time range."
+        ),
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "msg_type": {"type": "string", "description": "Message type, e.g. GPS"},
+                "field": {"type": "string", "description": "Field name, e.g. Alt"},
+                **_TIME_RANGE,
+                "points": {"type": "integer", "description": f"Number of samples to return (at most {MAX_ITEMS})"},
+            },
+            "required": ["msg_type", "field"],
+        },
+    },
+    {
+        "name": "query_fleet",
+        "description": (
+            "Search the summaries of every uploaded log, not just this one: fleet totals "
+            "and the matching flights, newest first. Filters combine with AND."
+        ),
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "min_battery_below": {"type": "number", "description": "Minimum battery voltage below this, in volts"},
+                "max_altitude_above": {"type": "number", "description": "Maximum altitude above this, in meters"},
+                "flight_time_above": {"type": "number", "description": "Flight time above this, in seconds"},
+                "days": {"type": "number", "description": "Only flights of the last this many days"},
+                "vehicle": {"type": "string", "description": "Vehicle type, e.g. ArduCopter"},
+                "has_gps_issues": {"type": "boolean", "description": "Flights with (or without) GPS issues"},
+                "has_critical_errors": {"type": "boolean", "description": "Flights with (or without) critical errors"},
+                "mode": {"type": "integer", "description": "Flights that entered this flight mode number"},
+                **_LIMIT,
+            },
+        },
+    },
+]
+# Tools whose results depend on other logs than the one asked about
+FLEET_TOOLS = frozenset({"query_fleet"})
+
+
+def _seconds(time_us: float) -> float:
+    return round(float(time_us) / 1e6, 3)
+
+
+def _plain(value: Any) -> Any:
+    """Convert NumPy scalars and arrays to JSON-friendly values."""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, float):
+        return round(value, 6)
+    return value
+
+
+class FlightTools:
+    """The chatbot's tools, answered from a parsed log.
+
+    Scalar tools read the precomputed summary; list tools filter the
+    summary's interval lists by time range; ``get_series`` slices and
+    downsamples columns through the log's shared ``SeriesIndex``; ``query_fleet`` searches
+    the ``FleetIndex`` of all logs.  Every result is small and bounded in
+    size, whatever the size of the log or the fleet.
+    """
+
+    def __init__(self, parsed: ParsedLog, fleet: Optional[FleetIndex] = None):
+        self.summary = parsed.summary
+        self.data = parsed.data
+        self.series = series_index(parsed)
+        self.fleet = fleet
+
+    def call(self, name: str, args: Optional[Dict] = None) -> Dict:
+        """Run a tool by name; errors are returned to the model as data."""
+        if name not in {tool["name"] for tool in TOOL_DECLARATIONS}:
+            return {"error": f"Unknown tool: {name}"}
+        try:
+            return getattr(self, name)(**(args or {}))
+        except (KeyError, TypeError, ValueError) as e:
+            return {"error": str(e)}
+
+    def get_max_altitude(self) -> Dict:
+        return {"max_altitude_m": self.summary.get("max_altitude", 0.0)}
+
+    def get_flight_time(self) -> Dict:
+        return {"flight_time_s": self.summary.get("flight_time", 0.0)}
+
+    def get_min_battery(self) -> Dict:
+        return {"min_battery_v": self.summary.get("min_battery", 0.0)}
+
+    def _window(self, intervals: List[Dict], start: Optional[float], end: Optional[float],
+                limit: Optional[int]) -> Dict:
+        """Summary intervals overlapping a time range, capped in number."""
+        starts = np.array([item["start"] for item in intervals], dtype=np.float64)
+        ends = np.array([item["end"] for item in intervals], dtype=np.float64)
+        selected = np.ones(len(intervals), dtype=bool)
+        if start is not None:
+            selected &= ends >= start * 1e6
+        if end is not None:
+            selected &= starts <= end * 1e6
+        indices = np.flatnonzero(selected)
+        limit = min(int(limit or MAX_ITEMS), MAX_ITEMS)
+        return {
+            "total": len(indices),
+            "items": [
+                {
+                    key: _seconds(value) if key in ("start", "end") else _plain(value)
+                    for key, value in intervals[i].items()
+                }
+                for i in indices[:limit].tolist()
+            ],
+        }
+
+    def get_gps_issues(self, start: Optional[float] = None, end: Optional[float] = None,
+                       limit: Optional[int] = None) -> Dict:
+        return self._window(self.summary.get("gps_issues", []), start, end, limit)
+
+    def get_critical_errors(self, start: Optional[float] = None, end: Optional[float] = None,
+                            limit: Optional[int] = None) -> Dict:
+        return self._window(self.summary.get("critical_errors", []), start, end, limit)
+
+    def get_mode_changes(self, start: Optional[float] = None, end: Optional[float] = None,
+                         limit: Optional[int] = None) -> Dict:
+        return self._window(self.summary.get("mode_changes", []), start, end, limit)
+
+    def get_anomalies(self, detector: Optional[str] = None, start: Optional[float] = None,
+                      end: Optional[float] = None, limit: Optional[int] = None) -> Dict:
+        if detector is not None and detector not in DETECTORS:
+            raise ValueError(f"Unknown detector: {detector}")
+        anomalies = self.summary.get("anomalies", [])
+        if detector is not None:
+            anomalies = [item for item in anomalies if item["detector"] == detector]
+        return self._window(anomalies, start, end, limit)
+
+    def list_message_types(self) -> Dict:
+        return {
+            msg_type: {
+                "fields": list(columns.keys()),
+                "count": len(next(iter(columns.values()))) if columns else 0,
+            }
+            for msg_type, columns in self.data.items()
+        }
+
+    def get_series(self, msg_type: str, field: str, start: Optional[float] = None,
+                   end: Optional[float] = None, points: Optional[int] = None) -> Dict:
+        if field not in self.data.get(msg_type, {}):
+            raise KeyError(f"{msg_type}.{field} is not in this log")
+        times, values = self.series.window(
+            msg_type, field,
+            None if start is None else start * 1e6,
+            None if end is None else end * 1e6
+        )
+        if values.ndim != 1 or values.dtype.kind not in 'biuf':
+            raise ValueError(f"{msg_type}.{field} is not a numeric series")
+        if not len(values):
+            return {"count": 0}
+        points = max(3, min(int(points or 20), MAX_ITEMS))
+        sample_times, sample_values = self.series.downsample(
+            msg_type, field,
+            None if start is None else start * 1e6,
+            None if end is None else end * 1e6,
+            points
+        )
+        return {
+            "count": len(values),
+            "start": _seconds(times[0]),
+            "end": _seconds(times[-1]),
+            "min": _plain(values.min()),
+            "max": _plain(values.max()),
+            "mean": _plain(float(values.mean())),
+            "samples": [
+                [_seconds(time), _plain(value)]
+                for time, value in zip(sample_times.tolist(), sample_values.tolist())
+            ],
+        }
+
+    def query_fleet(self, days: Optional[float] = None, limit: Optional[int] = None, **filters) -> Dict:
+        if self.fleet is None:
+            raise ValueError("No fleet index is available")
+        allowed = {tool["name"]: tool for tool in TOOL_DECLARATIONS}["query_fleet"]["parameters"]["properties"]
+        unknown = set(filters) - set(allowed)
+        if unknown:
+            raise TypeError(f"Unknown filter: {', '.join(sorted(unknown))}")
+        if days is not None:
+            filters["since"] = time.time() - float(days) * 86400
+        limit = min(int(limit or MAX_ITEMS), MAX_ITEMS)
+        result = self.fleet.query(limit=limit, **filters)
+        return {
+            "fleet": self.fleet.aggregate(**filters),
+            "total": result["total"],
+            "items": [
+                {field: _plain(item[field]) for field in _FLEET_FIELDS}
+                for item in result["items"]
+            ],
+        }
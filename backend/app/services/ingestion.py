@@ -0,0 +1,180 @@
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+import asyncio
+import multiprocessing
+import threading
+import time
+from app.services import metrics
+from app.services.anomalies import AnomalyEngine
+from app.services.jobs import JobStore
+from app.services.log_parser import LogParser
+from app.services.parsed_log import ParsedLog
+
+
+class IngestionQueueFull(Exception):
+    """Raised when the ingestion pool already has its maximum of pending parses."""
+
+
+def parse_log_file(file_path: str, decode_workers: int = 1,
+                   anomalies: Optional[Dict[str, Dict[str, Any]]] = None) -> Tuple[bytes, Dict[str, float], int]:
+    """Worker entry point: parse a log and return it in packed form.
+
+    Also returns the parser's stage timings and message count, which the
+    API process records (metrics of the worker process are not exposed).
+    ``anomalies`` is the anomaly detector configuration.
+    """
+    parser = LogParser(file_path, workers=decode_workers, anomalies=AnomalyEngine(anomalies))
+    summary = parser.parse()
+    return ParsedLog(summary, parser.data).to_bytes(), parser.timings, parser.messages
+
+
+def parse_job_file(file_path: str, job_id: str, store_path: Optional[str], chunk_size: int,
+                   decode_workers: int = 1, anomalies: Optional[Dict[str, Dict[str, Any]]] = None,
+                   interval: float = 0.25) -> Tuple[bytes, Dict[str, float], int]:
+    """Worker entry point of a background job: ``parse_log_file`` with progress.
+
+    The log is fed in chunks of ``chunk_size`` and the job's progress is
+    written to the job store at ``store_path`` at most every ``interval``
+    seconds.  With ``decode_workers > 1`` the log is split across
+    processes instead and only its completion is reported.
+    """
+    engine = AnomalyEngine(anomalies)
+    if decode_workers > 1:
+        parser = LogParser(file_path, workers=decode_workers, anomalies=engine)
+        summary = parser.parse()
+        return ParsedLog(summary, parser.data).to_bytes(), parser.timings, parser.messages
+
+    store = JobStore(store_path) if store_path else None
+    parser = LogParser(file_path, anomalies=engine)
+    reported = float('-inf')  # the first chunk is always reported
+    with open(file_path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            parser.feed(chunk)
+            if store is not None and time.monotonic() - reported >= interval:
+                store.progress(job_id, *parser.progress())
+                reported = time.monotonic()
+    summary = parser.finish()
+    return ParsedLog(summary, parser.data).to_bytes(), parser.timings, parser.messages
+
+
+def summarize_log_file(file_path: str,
+                       anomalies: Optional[Dict[str, Dict[str, Any]]] = None) -> Tuple[Dict, Dict[str, float], int]:
+    """Worker entry point: compute only the summary of a log (with timings)."""
+    parser = LogParser(file_path, anomalies=AnomalyEngine(anomalies))
+    return parser.summarize(), parser.timings, parser.messages
+
+
+class IngestionPool:
+    """Runs log parsing in worker processes, off the API event loop.
+
+    At most ``max_pending`` parses may be running or queued at once;
+    beyond that ``parse`` raises ``IngestionQueueFull`` so callers can
+    shed load instead of queueing without bound.  ``max_workers=0`` parses
+    in a thread instead of a process pool.  ``decode_workers > 1`` lets
+    each parse split a large log across that many more processes.
+    ``anomalies`` configures the anomaly detectors of the workers.
+    Background jobs use ``parse_job``, which waits for a free slot
+    rather than raising.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int, decode_workers: int = 1,
+                 anomalies: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.decode_workers = decode_workers
+        self.anomalies = anomalies
+        self._executor: Optional[Executor] = None
+        # job threads and the event loop may both start the workers
+        self._executor_lock = threading.Lock()
+        self._pending = 0
+        # job threads and the event loop share the pending count
+        self._slots = threading.Condition()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    @property
+    def started(self) -> bool:
+        """Whether the workers exist yet (they start with the first parse)."""
+        return self._executor is not None
+
+    def _get_executor(self) -> Executor:
+        with self._executor_lock:
+            if self._executor is None:
+                if self.max_workers > 0:
+                    # spawn rather than fork: the API process runs threads
+                    # (uvicorn, grpc) that are unsafe to fork
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=multiprocessing.get_context('spawn'))
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=1)
+            return self._executor
+
+    def _release(self):
+        with self._slots:
+            self._pending -= 1
+            self._slots.notify()
+
+    async def _run(self, func: Callable, *args):
+        with self._slots:
+            if self._pending >= self.max_pending:
+                raise IngestionQueueFull(
+                    f"{self._pending} logs are already being parsed")
+            self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self._release()
+
+    async def parse(self, file_path: str) -> ParsedLog:
+        """Parse a log file in the pool and return the unpacked result."""
+        started = time.perf_counter()
+        packed, timings, messages = await self._run(
+            parse_log_file, file_path, self.decode_workers, self.anomalies)
+        metrics.parse_seconds.observe(time.perf_counter() - started, mode='full')
+        metrics.observe_parse(timings, messages)
+        return ParsedLog.from_buffer(packed)
+
+    async def summarize(self, file_path: str) -> Dict:
+        """Compute only the summary of a log file in the pool."""
+        started = time.perf_counter()
+        summary, timings, messages = await self._run(summarize_log_file, file_path, self.anomalies)
+        metrics.parse_seconds.observe(time.perf_counter() - started, mode='summary')
+        metrics.observe_parse(timings, messages)
+        return summary
+
+    def parse_job(self, file_path: str, job_id: str, store_path: Optional[str],
+                  chunk_size: int) -> Tuple[ParsedLog, int]:
+        """Parse the log of a background job, blocking the calling job thread.
+
+        Waits for a free slot instead of raising ``IngestionQueueFull``;
+        the worker reports progress to the job store at ``store_path``.
+        Returns the parsed log and its message count.
+        """
+        with self._slots:
+            while self._pending >= self.max_pending:
+                self._slots.wait()
+            self._pending += 1
+        try:
+            started = time.perf_counter()
+            packed, timings, messages = self._get_executor().submit(
+                parse_job_file, file_path, job_id, store_path, chunk_size,
+                self.decode_workers, self.anomalies).result()
+        finally:
+            self._release()
+        metrics.parse_seconds.observe(time.perf_counter() - started, mode='job')
+        metrics.observe_parse(timings, messages)
+        return ParsedLog.from_buffer(packed), messages
+
+    def shutdown(self):
+        """Stop the worker processes."""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
@@ -0,0 +1,123 @@
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+
+def segments(indices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Split sorted row indices into runs of consecutive rows.
+
+    Returns the first and last position (inclusive) of each run within
+    ``indices``.
+    """
+    if not len(indices):
+        empty = np.zeros(0, dtype=np.intp)
+        return empty, empty
+    breaks = np.flatnonzero(np.diff(indices) > 1) + 1
+    starts = np.concatenate(([0], breaks))
+    ends = np.concatenate((breaks, [len(indices)])) - 1
+    return starts, ends
+
+
+def change_points(columns: List[np.ndarray]) -> np.ndarray:
+    """Positions where any of the (1-D) columns differs from the row before."""
+    length = len(columns[0]) if columns else 0
+    changed = np.zeros(length, dtype=bool)
+    if length:
+        changed[0] = True
+    for values in columns:
+        if values.ndim == 1 and length > 1:
+            changed[1:] |= values[1:] != values[:-1]
+    return np.flatnonzero(changed)
+
+
+def _rows(columns: Dict[str, np.ndarray], rows: np.ndarray) -> List[Dict]:
+    fields = [field for field, values in columns.items() if values.ndim == 1]
+    values = [columns[field][rows].tolist() for field in fields]
+    return [dict(zip(fields, row)) for row in zip(*values)]
+
+
+def gps_issue_intervals(times: np.ndarray, status: np.ndarray,
+                        satellites: Optional[np.ndarray] = None) -> List[Dict]:
+    """Runs of GPS samples without a 3D fix (``Status < 3``).
+
+    Each interval gives the first and last sample time, the number of
+    samples, the worst (lowest) fix status and the fewest satellites.
+    """
+    indices = np.flatnonzero(status < 3)
+    starts, ends = segments(indices)
+    if not len(starts):
+        return []
+    if satellites is None:
+        satellites = np.zeros(len(status), dtype=np.int64)
+    worst = np.minimum.reduceat(status[indices], starts)
+    fewest = np.minimum.reduceat(satellites[indices], starts)
+    return [
+        {'start': start, 'end': end, 'samples': samples,
+         'worst_status': status_, 'min_satellites': sats}
+        for start, end, samples, status_, sats in zip(
+            times[indices[starts]].tolist(),
+            times[indices[ends]].tolist(),
+            (ends - starts + 1).tolist(),
+            worst.tolist(),
+            fewest.tolist()
+        )
+    ]
+
+
+def gps_issue_samples(times: np.ndarray, status: np.ndarray, satellites: Optional[np.ndarray],
+                      offset: int, limit: int) -> Dict:
+    """One page of the individual GPS samples without a 3D fix."""
+    indices = np.flatnonzero(status < 3)
+    page = indices[offset:offset + limit]
+    if satellites is None:
+        satellites = np.zeros(len(status), dtype=np.int64)
+    return {
+        'total': len(indices),
+        'offset': offset,
+        'limit': limit,
+        'items': [
+            {'time': time, 'status': fix, 'satellites': sats}
+            for time, fix, sats in zip(
+                times[page].tolist(), status[page].tolist(), satellites[page].tolist())
+        ],
+    }
+
+
+def repeat_intervals(times: np.ndarray, columns: Dict[str, np.ndarray],
+                     time_field: Optional[str] = None) -> List[Dict]:
+    """Collapse runs of identical consecutive messages into intervals.
+
+    Each interval holds the message fields (minus the timestamp), the
+    first and last time of the run and the number of messages.
+    """
+    fields = {field: values for field, values in columns.items() if field != time_field}
+    starts = change_points(list(fields.values()))
+    if not len(starts):
+        return []
+    ends = np.concatenate((starts[1:], [len(times)])) - 1
+    return [
+        dict(row, start=start, end=end, count=count)
+        for row, start, end, count in zip(
+            _rows(fields, starts),
+            times[starts].tolist(),
+            times[ends].tolist(),
+            (ends - starts + 1).tolist()
+        )
+    ]
+
+
+def state_intervals(times: np.ndarray, columns: Dict[str, np.ndarray], end_time: float,
+                    time_field: Optional[str] = None) -> List[Dict]:
+    """Intervals between successive state messages (e.g. MODE).
+
+    Each message starts an interval that lasts until the next one, the
+    last until ``end_time``.
+    """
+    if not len(times):
+        return []
+    fields = {field: values for field, values in columns.items() if field != time_field}
+    ends = times[1:].tolist() + [max(end_time, times[-1].item())]
+    return [
+        dict(row, start=start, end=end)
+        for row, start, end in zip(
+            _rows(fields, np.arange(len(times))), times.tolist(), ends)
+    ]
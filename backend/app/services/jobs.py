@@ -0,0 +1,250 @@
+from typing import Callable, Dict, List, Optional
+import itertools
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+
+# Queue order: interactive uploads run ahead of bulk imports
+PRIORITIES = {'interactive': 0, 'bulk': 1}
+
+
+class JobQueueFull(Exception):
+    """Raised when the job queue already holds its maximum of waiting jobs."""
+
+
+# Job fields kept in the job store (the upload's path stays with the queue)
+_FIELDS = ('id', 'filename', 'priority', 'bytes_total', 'content_hash', 'log_id', 'status',
+           'bytes_decoded', 'messages', 'created', 'started', 'finished', 'result', 'error')
+
+
+class Job:
+    """A background ingestion of one saved upload, with its progress."""
+
+    def __init__(self, file_path: str, filename: str, priority: str,
+                 bytes_total: int, content_hash: str, log_id: str, job_id: Optional[str] = None):
+        self.id = job_id or str(uuid.uuid4())
+        self.file_path = file_path
+        self.filename = filename
+        self.priority = priority
+        self.bytes_total = bytes_total
+        self.content_hash = content_hash
+        self.log_id = log_id
+        self.status = 'queued'
+        self.bytes_decoded = 0
+        self.messages = 0
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+
+    def progress(self, bytes_decoded: int, messages: int):
+        """Record how far decoding has got (called from the worker)."""
+        self.bytes_decoded = bytes_decoded
+        self.messages = messages
+
+    def to_dict(self) -> Dict:
+        """Status report: progress, decode rate and, while running, an ETA."""
+        elapsed = 0.0
+        if self.started is not None:
+            elapsed = (self.finished or time.time()) - self.started
+        byte_rate = self.bytes_decoded / elapsed if elapsed > 0 else 0.0
+        eta = None
+        if self.status == 'running' and byte_rate > 0:
+            eta = round(max(0, self.bytes_total - self.bytes_decoded) / byte_rate, 2)
+        report = {
+            'job_id': self.id,
+            'status': self.status,
+            'filename': self.filename,
+            'priority': self.priority,
+            'bytes_total': self.bytes_total,
+            'bytes_decoded': self.bytes_decoded,
+            'progress': round(self.bytes_decoded / self.bytes_total, 4) if self.bytes_total else 0.0,
+            'messages': self.messages,
+            'message_rate': round(self.messages / elapsed, 1) if elapsed > 0 else 0.0,
+            'elapsed_seconds': round(elapsed, 3),
+            'eta_seconds': eta,
+        }
+        if self.result is not None:
+            report['result'] = self.result
+        if self.error is not None:
+            report['error'] = self.error
+        return report
+
+
+class JobStore:
+    """Job states in SQLite, readable by every API worker process.
+
+    The worker that queued a job writes its state on every change (the
+    parse worker writes its progress), so a status poll may reach any
+    worker.  Finished jobs are kept for ``ttl_seconds``, at most
+    ``history`` of them.  ``:memory:`` keeps the states in this process.
+    """
+
+    def __init__(self, path: str, history: Optional[int] = None, ttl_seconds: Optional[float] = None):
+        self.path = path
+        self.history = history
+        self.ttl_seconds = ttl_seconds
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            if path != ':memory:':
+                self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.executescript('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY, filename TEXT, priority TEXT NOT NULL,
+                    bytes_total INTEGER NOT NULL, content_hash TEXT, log_id TEXT,
+                    status TEXT NOT NULL, bytes_decoded INTEGER NOT NULL, messages INTEGER NOT NULL,
+                    created REAL NOT NULL, started REAL, finished REAL, result TEXT, error TEXT);
+                CREATE INDEX IF NOT EXISTS jobs_created ON jobs (created);
+                CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished);
+            ''')
+
+    def save(self, job: Job, status: Optional[str] = None):
+        """Write the whole state of a job, optionally with a new ``status``."""
+        row = [getattr(job, field) for field in _FIELDS]
+        if status is not None:
+            row[_FIELDS.index('status')] = status
+        row[_FIELDS.index('result')] = None if job.result is None else json.dumps(job.result, default=str)
+        with self._lock:
+            self._db.execute(
+                f"INSERT OR REPLACE INTO jobs ({', '.join(_FIELDS)}) "
+                f"VALUES ({', '.join('?' * len(_FIELDS))})", row)
+            if job.finished is not None:
+                self._prune()
+
+    def progress(self, job_id: str, bytes_decoded: int, messages: int):
+        """Record how far decoding has got (called from the parse worker)."""
+        with self._lock:
+            self._db.execute('UPDATE jobs SET bytes_decoded = ?, messages = ? WHERE id = ?',
+                             (bytes_decoded, messages, job_id))
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {', '.join(_FIELDS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        values = dict(zip(_FIELDS, row))
+        job = Job('', values['filename'], values['priority'], values['bytes_total'],
+                  values['content_hash'], values['log_id'], values['id'])
+        for field in _FIELDS[6:]:
+            setattr(job, field, values[field])
+        if job.result is not None:
+            job.result = json.loads(job.result)
+        return job
+
+    def _prune(self):
+        if self.ttl_seconds is not None:
+            self._db.execute('DELETE FROM jobs WHERE finished < ?', (time.time() - self.ttl_seconds,))
+        if self.history is not None:
+            self._db.execute(
+                'DELETE FROM jobs WHERE finished IS NOT NULL AND id NOT IN '
+                '(SELECT id FROM jobs WHERE finished IS NOT NULL ORDER BY finished DESC LIMIT ?)',
+                (self.history,))
+
+
+class JobQueue:
+    """Runs ingestion jobs on a pool of worker threads, by priority.
+
+    Jobs wait in a priority queue (``PRIORITIES``, then submission
+    order) and ``process(job)`` runs each one, reporting progress on the
+    job and returning its result.  At most ``max_queued`` jobs may wait;
+    beyond that ``submit`` raises ``JobQueueFull``.  Job states go to a
+    ``JobStore`` at ``path``, where finished jobs stay queryable for
+    ``ttl_seconds``, up to ``history`` of them.
+    """
+
+    def __init__(self, workers: int, max_queued: int, process: Callable[[Job], Dict],
+                 history: int, ttl_seconds: float, path: str = ':memory:'):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.process = process
+        self.jobs = JobStore(path, history, ttl_seconds)
+        self.completed = 0
+        self.failed = 0
+        self._queue: "queue.PriorityQueue" = queue.PriorityQueue()
+        self._order = itertools.count()
+        self._threads: List[threading.Thread] = []
+        self._running = 0
+        self._lock = threading.Lock()
+
+    def submit(self, job: Job) -> Job:
+        """Queue a job for the workers."""
+        if job.priority not in PRIORITIES:
+            raise ValueError(f"priority must be one of {', '.join(PRIORITIES)}")
+        with self._lock:
+            if self._queue.qsize() >= self.max_queued:
+                raise JobQueueFull(f"{self._queue.qsize()} jobs are already queued")
+            self._start_workers()
+            self.jobs.save(job)
+            self._queue.put((PRIORITIES[job.priority], next(self._order), job))
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """The latest state of a job queued by any worker process."""
+        return self.jobs.get(job_id)
+
+    def _start_workers(self):
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, name=f"ingest-{len(self._threads)}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            _, _, job = self._queue.get()
+            if job is None:
+                return
+            with self._lock:
+                self._running += 1
+            job.status = 'running'
+            job.started = time.time()
+            self._save(job)
+            try:
+                job.result = self.process(job)
+                job.bytes_decoded = job.bytes_total
+                status = 'done'
+            except Exception as e:
+                job.error = str(e)
+                status = 'failed'
+            # saved before the status changes, so a finished job is always found finished
+            job.finished = time.time()
+            self._save(job, status)
+            job.status = status
+            with self._lock:
+                self._running -= 1
+                if status == 'done':
+                    self.completed += 1
+                else:
+                    self.failed += 1
+
+    def _save(self, job: Job, status: Optional[str] = None):
+        try:
+            self.jobs.save(job, status)
+        except sqlite3.Error as e:
+            # the job itself goes on; only its status report is stale
+            print(f"Warning: could not save the state of job {job.id}: {str(e)}")
+
+    def shutdown(self):
+        """Stop the workers once their current jobs finish."""
+        with self._lock:
+            for _ in self._threads:
+                # ahead of every queued job
+                self._queue.put((-1, next(self._order), None))
+            self._threads = []
+
+    def stats(self) -> Dict:
+        return {
+            'workers': self.workers,
+            'queued': self._queue.qsize(),
+            'running': self._running,
+            'completed': self.completed,
+            'failed': self.failed,
+        }
@@ -0,0 +1,364 @@
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
+import asyncio
+import json
+import random
+import weakref
+
+
+class LLMError(Exception):
+    """Raised when the LLM fails to answer after all retries."""
+
+
+class ToolCall:
+    """A function call requested by the model."""
+
+    def __init__(self, name: str, args: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.args = args or {}
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, ToolCall) and (self.name, self.args) == (other.name, other.args)
+
+    def __repr__(self) -> str:
+        return f"ToolCall({self.name!r}, {self.args!r})"
+
+
+class LLMReply:
+    """A model reply: answer text and/or tool calls to run first.
+
+    ``usage`` holds the ``prompt`` and ``response`` token counts when the
+    backend reports them.
+    """
+
+    def __init__(self, text: str = "", tool_calls: Optional[List[ToolCall]] = None,
+                 usage: Optional[Dict[str, int]] = None):
+        self.text = text
+        self.tool_calls = tool_calls or []
+        self.usage = usage
+
+
+def user_turn(text: str) -> Dict:
+    return {"role": "user", "text": text}
+
+
+def model_turn(text: str = "", tool_calls: Optional[List[ToolCall]] = None) -> Dict:
+    return {"role": "model", "text": text, "tool_calls": tool_calls or []}
+
+
+def tool_turn(name: str, result: Any) -> Dict:
+    return {"role": "tool", "name": name, "result": result}
+
+
+class LLMBackend(ABC):
+    """A text generation backend used by ``LLMClient``.
+
+    Backends receive the conversation as a list of turns (see
+    ``user_turn``, ``model_turn`` and ``tool_turn``) and optionally the
+    declarations of the tools the model may call.
+    """
+
+    @abstractmethod
+    async def complete(self, turns: List[Dict], tools: Optional[List[Dict]] = None) -> LLMReply:
+        """Generate the whole reply: its text or the tool calls the model requests."""
+
+    async def stream(self, turns: List[Dict], tools: Optional[List[Dict]] = None
+                     ) -> AsyncIterator[Union[str, ToolCall]]:
+        """Yield the answer in pieces as it is generated, and any tool calls."""
+        reply = await self.complete(turns, tools)
+        for call in reply.tool_calls:
+            yield call
+        if reply.text:
+            yield reply.text
+
+    def is_retryable(self, error: Exception) -> bool:
+        """Whether a failed call is worth retrying (timeouts always are)."""
+        return True
+
+
+class GeminiBackend(LLMBackend):
+    """Google Gemini through the async API of ``google.generativeai``.
+
+    One model object is kept per backend so its gRPC channel is reused
+    across requests.  It is created, and the SDK imported, on the first
+    request: the import is slow and most API calls never reach the model.
+    """
+
+    def __init__(self, api_key: Optional[str], model: str):
+        self.api_key = api_key
+        self.model_name = model
+        self._model = None
+
+    @property
+    def model(self):
+        if self._model is None:
+            if not self.api_key:
+                raise LLMError("GEMINI_API_KEY is not set")
+            import google.generativeai as genai
+            genai.configure(api_key=self.api_key)
+            self._model = genai.GenerativeModel(self.model_name)
+        return self._model
+
+    @staticmethod
+    def _contents(turns: List[Dict]) -> List[Dict]:
+        from google.generativeai import protos
+        contents: List[Dict] = []
+        for turn in turns:
+            if turn["role"] == "tool":
+                part = protos.Part(function_response=protos.FunctionResponse(
+                    name=turn["name"], response={"result": turn["result"]}))
+                # responses to one model turn travel together
+                if contents and contents[-1].get("tool"):
+                    contents[-1]["parts"].append(part)
+                else:
+                    contents.append({"role": "user", "parts": [part], "tool": True})
+                continue
+            parts = []
+            if turn.get("text"):
+                parts.append(protos.Part(text=turn["text"]))
+            for call in turn.get("tool_calls", []):
+                parts.append(protos.Part(function_call=protos.FunctionCall(
+                    name=call.name, args=call.args)))
+            contents.append({"role": turn["role"], "parts": parts})
+        for content in contents:
+            content.pop("tool", None)
+        return contents
+
+    @staticmethod
+    def _parts(response) -> List[Union[str, ToolCall]]:
+        from google.generativeai import protos
+        pieces: List[Union[str, ToolCall]] = []
+        if not response.candidates:
+            return pieces
+        for part in response.candidates[0].content.parts:
+            if part.function_call.name:
+                call = protos.FunctionCall.to_dict(part.function_call)
+                pieces.append(ToolCall(call["name"], call.get("args") or {}))
+            elif part.text:
+                pieces.append(part.text)
+        return pieces
+
+    async def complete(self, turns: List[Dict], tools: Optional[List[Dict]] = None) -> LLMReply:
+        response = await self.model.generate_content_async(
+            self._contents(turns),
+            tools=[{"function_declarations": tools}] if tools else None
+        )
+        pieces = self._parts(response)
+        metadata = getattr(response, "usage_metadata", None)
+        usage = None
+        if metadata is not None and metadata.prompt_token_count:
+            usage = {"prompt": metadata.prompt_token_count,
+                     "response": metadata.candidates_token_count}
+        return LLMReply(
+            "".join(piece for piece in pieces if isinstance(piece, str)),
+            [piece for piece in pieces if isinstance(piece, ToolCall)],
+            usage
+        )
+
+    async def stream(self, turns: List[Dict], tools: Optional[List[Dict]] = None
+                     ) -> AsyncIterator[Union[str, ToolCall]]:
+        response = await self.model.generate_content_async(
+            self._contents(turns),
+            tools=[{"function_declarations": tools}] if tools else None,
+            stream=True
+        )
+        async for chunk in response:
+            for piece in self._parts(chunk):
+                yield piece
+
+    def is_retryable(self, error: Exception) -> bool:
+        if isinstance(error, LLMError):
+            return False
+        from google.api_core import exceptions
+        return isinstance(error, (
+            exceptions.TooManyRequests,
+            exceptions.ServiceUnavailable,
+            exceptions.InternalServerError,
+            exceptions.DeadlineExceeded,
+        ))
+
+
+class StubBackend(LLMBackend):
+    """Local stand-in for tests and benchmarks.
+
+    Answers by echoing the last line of the question.  When tools are
+    offered it first calls the one whose name matches a keyword of the
+    question, then appends the tool results to its answer.
+    """
+
+    KEYWORD_TOOLS = {
+        "fleet": "query_fleet",
+        "anomal": "get_anomalies",
+        "altitude": "get_max_altitude",
+        "gps": "get_gps_issues",
+        "error": "get_critical_errors",
+        "mode": "get_mode_changes",
+        "battery": "get_min_battery",
+        "time": "get_flight_time",
+    }
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+
+    async def complete(self, turns: List[Dict], tools: Optional[List[Dict]] = None) -> LLMReply:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        last_user = max(i for i, turn in enumerate(turns) if turn["role"] == "user")
+        text = turns[last_user]["text"].strip()
+        question = text.splitlines()[-1] if text else ""
+        results = [turn for turn in turns[last_user + 1:] if turn["role"] == "tool"]
+        if tools and not results:
+            names = {tool["name"] for tool in tools}
+            calls = [
+                ToolCall(name) for keyword, name in self.KEYWORD_TOOLS.items()
+                if keyword in question.lower() and name in names
+            ]
+            if calls:
+                return LLMReply(tool_calls=calls[:1])
+        answer = f"Stub answer to: {question}"
+        for turn in results:
+            answer += f" [{turn['name']}: {json.dumps(turn['result'])}]"
+        return LLMReply(answer)
+
+    async def stream(self, turns: List[Dict], tools: Optional[List[Dict]] = None
+                     ) -> AsyncIterator[Union[str, ToolCall]]:
+        reply = await self.complete(turns, tools)
+        for call in reply.tool_calls:
+            yield call
+        words = reply.text.split(' ') if reply.text else []
+        for i, word in enumerate(words):
+            yield word if i == len(words) - 1 else word + ' '
+            await asyncio.sleep(0)
+
+
+def create_backend(name: str, settings) -> LLMBackend:
+    """Build the backend selected by the ``LLM_BACKEND`` setting."""
+    if name == 'gemini':
+        return GeminiBackend(settings.GEMINI_API_KEY, settings.GEMINI_MODEL)
+    if name == 'stub':
+        return StubBackend(settings.LLM_STUB_LATENCY)
+    raise ValueError(f"Unknown LLM backend: {name}")
+
+
+class LLMClient:
+    """Async LLM access with a concurrency limit, timeouts and retries.
+
+    At most ``max_concurrency`` calls are in flight at once; each attempt
+    is cancelled after ``timeout`` seconds (for streams: ``timeout``
+    seconds without a new chunk).  Timeouts and retryable backend errors
+    are retried up to ``max_retries`` times, sleeping a random delay of up
+    to ``backoff * 2 ** attempt`` seconds in between (full jitter) so
+    clients do not retry in lockstep.  A stream is only retried before
+    its first chunk.
+    """
+
+    def __init__(self, backend: LLMBackend, max_concurrency: int = 8,
+                 timeout: float = 60.0, max_retries: int = 2, backoff: float = 0.5):
+        self.backend = backend
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.in_flight = 0
+        # asyncio primitives belong to one event loop; keep one per loop
+        self._semaphores: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphores[loop] = semaphore
+        return semaphore
+
+    def _check_retry(self, error: Exception, attempt: int):
+        """Raise ``LLMError`` unless a failed attempt should be retried."""
+        if isinstance(error, asyncio.TimeoutError):
+            reason = f"timed out after {self.timeout}s"
+        elif self.backend.is_retryable(error):
+            reason = str(error)
+        else:
+            self.failures += 1
+            raise LLMError(str(error)) from error
+        if attempt >= self.max_retries:
+            self.failures += 1
+            raise LLMError(f"LLM request failed: {reason}") from error
+        self.retries += 1
+
+    async def _backoff(self, attempt: int):
+        await asyncio.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+
+    async def complete(self, turns: List[Dict], tools: Optional[List[Dict]] = None) -> LLMReply:
+        """Get the model's next reply, raising ``LLMError`` if every attempt fails."""
+        self.requests += 1
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore():
+                    self.in_flight += 1
+                    try:
+                        return await asyncio.wait_for(
+                            self.backend.complete(turns, tools), self.timeout)
+                    finally:
+                        self.in_flight -= 1
+            except Exception as e:
+                self._check_retry(e, attempt)
+            await self._backoff(attempt)
+            attempt += 1
+
+    async def generate(self, prompt: str) -> str:
+        """Generate a plain-text completion of a single prompt."""
+        reply = await self.complete([user_turn(prompt)])
+        return reply.text
+
+    async def stream(self, turns: List[Dict], tools: Optional[List[Dict]] = None
+                     ) -> AsyncIterator[Union[str, ToolCall]]:
+        """Stream a reply chunk by chunk, raising ``LLMError`` on failure."""
+        self.requests += 1
+        attempt = 0
+        while True:
+            started = False
+            try:
+                async with self._semaphore():
+                    self.in_flight += 1
+                    chunks = self.backend.stream(turns, tools)
+                    try:
+                        while True:
+                            try:
+                                chunk = await asyncio.wait_for(
+                                    chunks.__anext__(), self.timeout)
+                            except StopAsyncIteration:
+                                return
+                            started = True
+                            yield chunk
+                    finally:
+                        self.in_flight -= 1
+                        await chunks.aclose()
+            except Exception as e:
+                # Retrying after a chunk was sent would repeat it to the caller
+                self._check_retry(e, self.max_retries if started else attempt)
+            await self._backoff(attempt)
+            attempt += 1
+
+    def stats(self) -> Dict:
+        return {
+            'requests': self.requests,
+            'retries': self.retries,
+            'failures': self.failures,
+            'in_flight': self.in_flight,
+            'max_concurrency': self.max_concurrency,
+        }
+
+
+def create_client(settings, backend: Optional[LLMBackend] = None) -> LLMClient:
+    """Build an ``LLMClient`` from the application settings."""
+    return LLMClient(
+        backend or create_backend(settings.LLM_BACKEND, settings),
+        max_concurrency=settings.LLM_MAX_CONCURRENCY,
+        timeout=settings.LLM_TIMEOUT,
+        max_retries=settings.LLM_MAX_RETRIES,
+        backoff=settings.LLM_RETRY_BACKOFF
+    )
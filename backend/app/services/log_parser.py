@@ -1,60 +1,293 @@
 import os
-from typing import Dict, List, Optional
-import pandas as pd
-from pymavlink import mavutil
-from datetime import datetime
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple
 import numpy as np
+from app.services.anomalies import AnomalyEngine
+from app.services.column_store import ColumnStore
+from app.services.dataflash import DataFlashDecoder, IncrementalDecoder
+from app.services.parallel_decode import ParallelDecoder
+from app.services.intervals import gps_issue_intervals, repeat_intervals, state_intervals
+from app.services.summary import SUMMARY_TYPES, SummaryAggregator
+
+# pandas and pymavlink take a while to import and most logs need neither
+# (they are decoded natively), so both are imported on first use
+if TYPE_CHECKING:
+    import pandas as pd
+
+EVENT_TYPES = ['EV', 'ERR', 'MODE']
+TIME_FIELDS = ('TimeUS', 'time_usec')
+# Bytes read per step of a summary-only parse
+SUMMARY_CHUNK_SIZE = 8 * 1024 * 1024
 
 class LogParser:
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, decoder: str = 'auto', workers: int = 1,
+                 anomalies: Optional[AnomalyEngine] = None):
+        # decoder: 'native' (vectorized DataFlash), 'pymavlink', or 'auto'
+        # to try the native decoder first and fall back to pymavlink;
+        # workers > 1 decodes large logs natively across that many processes;
+        # anomalies: the detectors run over the log (default settings if None)
         self.file_path = file_path
+        self.decoder = decoder
+        self.workers = workers
+        self.anomalies = anomalies or AnomalyEngine()
         self.mlog = None
-        self.data = {}
+        self.data: Dict[str, Dict[str, np.ndarray]] = {}
         self.events = []
         self.summary = {}
-        
+        # seconds spent per stage (decode, or recv_match and to_dict for
+        # pymavlink; events; anomalies; summary) and the messages decoded
+        self.timings: Dict[str, float] = {}
+        self.messages = 0
+        self._stream: Optional[IncrementalDecoder] = None
+        self._stream_failed = False
+
+    @contextmanager
+    def _timed(self, stage: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[stage] = self.timings.get(stage, 0.0) + time.perf_counter() - started
+
     def parse(self) -> Dict:
         """Parse the MAVLink log file and extract relevant data."""
         try:
-            self.mlog = mavutil.mavlink_connection(self.file_path)
-            if not self.mlog:
-                raise Exception("Failed to create MAVLink connection")
-                
-            self._extract_messages()
+            if not self._decode_native():
+                from pymavlink import mavutil
+                self.mlog = mavutil.mavlink_connection(self.file_path)
+                if not self.mlog:
+                    raise Exception("Failed to create MAVLink connection")
+                    
+                self._extract_messages()
             self._generate_summary()
             return self.summary
         except Exception as e:
             raise Exception(f"Error parsing log file: {str(e)}")
-        
+
+    def feed(self, chunk: bytes):
+        """Incremental mode: decode a chunk of the log as it is received.
+
+        In ``auto`` mode a decode failure only stops the stream; ``finish``
+        then parses the saved file instead.
+        """
+        if self._stream_failed:
+            return
+        if self._stream is None:
+            self._stream = IncrementalDecoder()
+        try:
+            with self._timed('decode'):
+                self._stream.feed(chunk)
+        except Exception as e:
+            if self.decoder == 'native':
+                raise
+            print(f"Warning: incremental decode failed, will re-parse the file: {str(e)}")
+            self._stream = None
+            self._stream_failed = True
+
+    def progress(self) -> Tuple[int, int]:
+        """Incremental mode: bytes and records decoded so far."""
+        if self._stream is None:
+            return 0, 0
+        return self._stream.bytes_decoded, self._stream.records
+
+    def discard(self):
+        """Incremental mode: drop what was decoded so far (e.g. on a cache hit).
+
+        A later ``finish`` re-parses ``file_path`` instead.
+        """
+        self._stream = None
+        self.data = {}
+
+    def finish(self) -> Dict:
+        """Finish an incremental parse and return the summary.
+
+        Falls back to a regular ``parse`` of ``file_path`` when the stream
+        could not be decoded natively.
+        """
+        if self._stream is None or self.decoder == 'pymavlink':
+            return self.parse()
+        try:
+            with self._timed('decode'):
+                self.data = self._stream.finish()
+        except Exception as e:
+            print(f"Warning: incremental decode failed, re-parsing from file: {str(e)}")
+            return self.parse()
+        finally:
+            self._stream = None
+        self._count_messages()
+        self.events = self._collect_events()
+        self._generate_summary()
+        return self.summary
+
+    def summarize(self) -> Dict:
+        """Summary-only parse in constant memory.
+
+        Reads the log in fixed-size chunks, decodes only the message types
+        the summary needs and folds them into running aggregates; no
+        message data is kept, so ``self.data`` stays empty.  Anomaly
+        detectors over full-rate messages (IMU) only run if their
+        ``summary`` parameter is set.  Falls back to a full ``parse`` when
+        the log cannot be decoded natively.
+        """
+        if self.decoder == 'pymavlink' or (
+                self.decoder == 'auto' and not self.file_path.lower().endswith('.bin')):
+            return self.parse()
+        anomalies = self.anomalies.for_summary()
+        aggregator = SummaryAggregator(anomalies)
+        stream = IncrementalDecoder(types=SUMMARY_TYPES + anomalies.message_types, store=aggregator)
+        try:
+            with self._timed('decode'), open(self.file_path, 'rb') as f:
+                while True:
+                    chunk = f.read(SUMMARY_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    stream.feed(chunk)
+                stream.finish()
+        except OSError as e:
+            raise Exception(f"Error parsing log file: {str(e)}")
+        except Exception as e:
+            if self.decoder == 'native':
+                raise Exception(f"Error parsing log file: {str(e)}")
+            print(f"Warning: summary decode failed, falling back to a full parse: {str(e)}")
+            summary = self.parse()
+            self.data = {}
+            self.events = []
+            return summary
+        self.messages = stream.records
+        with self._timed('summary'):
+            self.summary = aggregator.summary(
+                list(stream.message_types),
+                max(stream.last_times.values(), default=0)
+            )
+        return self.summary
+
+    def _decode_native(self) -> bool:
+        """Decode with the vectorized DataFlash decoder if possible.
+
+        Returns False when the pymavlink path should be used instead.
+        """
+        if self.decoder == 'pymavlink':
+            return False
+        if self.decoder == 'auto' and not self.file_path.lower().endswith('.bin'):
+            return False
+        try:
+            with self._timed('decode'):
+                if self.workers > 1:
+                    self.data = ParallelDecoder(self.file_path, self.workers).decode()
+                else:
+                    self.data = DataFlashDecoder(self.file_path).decode()
+        except Exception as e:
+            # in auto mode any decoder failure (not only a rejected file)
+            # falls back to the slower but more lenient pymavlink reader
+            if self.decoder == 'native':
+                raise
+            print(f"Warning: native decoder failed, falling back to pymavlink: {str(e)}")
+            return False
+        self._count_messages()
+        self.events = self._collect_events()
+        return True
+
     def _extract_messages(self):
-        """Extract messages from the log file."""
+        """Extract messages from the log file into per-field NumPy columns."""
+        store = ColumnStore()
+        # per-message stage timing, accumulated inline: this loop is hot
+        receiving = converting = 0.0
         try:
             while True:
+                started = time.perf_counter()
                 msg = self.mlog.recv_match()
+                received = time.perf_counter()
+                receiving += received - started
                 if msg is None:
                     break
                     
                 msg_type = msg.get_type()
-                if msg_type not in self.data:
-                    self.data[msg_type] = []
-                    
-                # Convert message to dictionary
-                msg_dict = msg.to_dict()
-                self.data[msg_type].append(msg_dict)
-                
-                # Track events
-                if msg_type in ['EV', 'ERR', 'MODE']:
-                    self.events.append({
-                        'type': msg_type,
-                        'time': msg_dict.get('time_usec', 0),
-                        'data': msg_dict
-                    })
+                fmt = getattr(msg, 'fmt', None)
+                if fmt is not None:
+                    # DataFlash message: keep the raw unpacked elements and
+                    # let the store convert whole chunks at once
+                    store.declare(msg_type, fmt.columns, fmt.format)
+                    store.append(msg_type, msg._elements)
+                else:
+                    msg_dict = msg.to_dict()
+                    msg_dict.pop('mavpackettype', None)
+                    store.declare(msg_type, list(msg_dict.keys()))
+                    store.append(msg_type, list(msg_dict.values()))
+                converting += time.perf_counter() - received
         except Exception as e:
             print(f"Warning: Error extracting messages: {str(e)}")
             # Continue with whatever data we have
+        finally:
+            self.timings['recv_match'] = receiving
+            with self._timed('to_dict'):
+                self.data = store.finalize()
+            self.timings['to_dict'] += converting
+            self._count_messages()
+            self.events = self._collect_events()
+
+    def _count_messages(self):
+        self.messages = sum(
+            len(next(iter(columns.values()))) for columns in self.data.values() if columns)
+
+    def _column(self, msg_type: str, field: str) -> Optional[np.ndarray]:
+        """Get a single field column, or None if it was not logged."""
+        return self.data.get(msg_type, {}).get(field)
+
+    def _time_field(self, msg_type: str) -> Optional[str]:
+        columns = self.data.get(msg_type, {})
+        for field in TIME_FIELDS:
+            if field in columns:
+                return field
+        return None
+
+    def _time_column(self, msg_type: str) -> np.ndarray:
+        """Get the timestamp column of a message type (zeros if absent)."""
+        columns = self.data.get(msg_type, {})
+        for field in TIME_FIELDS:
+            if field in columns:
+                return columns[field]
+        length = len(next(iter(columns.values()))) if columns else 0
+        return np.zeros(length, dtype=np.int64)
+
+    def _rows(self, msg_type: str) -> List[Dict]:
+        """Materialize the messages of one type as dicts (for low-rate types)."""
+        columns = self.data.get(msg_type, {})
+        fields = list(columns.keys())
+        values = [columns[field].tolist() for field in fields]
+        return [
+            dict(zip(fields, row), mavpackettype=msg_type)
+            for row in zip(*values)
+        ]
+
+    def _collect_events(self) -> List[Dict]:
+        """Build the time-ordered event list from the EV/ERR/MODE columns."""
+        with self._timed('events'):
+            return self._event_list()
+
+    def _event_list(self) -> List[Dict]:
+        events = []
+        for msg_type in EVENT_TYPES:
+            if msg_type not in self.data:
+                continue
+            times = self._time_column(msg_type).tolist()
+            for time, msg_dict in zip(times, self._rows(msg_type)):
+                events.append({
+                    'type': msg_type,
+                    'time': time,
+                    'data': msg_dict
+                })
+        events.sort(key=lambda event: event['time'])
+        return events
             
     def _generate_summary(self):
         """Generate a summary of the flight data."""
+        with self._timed('anomalies'):
+            anomalies = self._detect_anomalies()
+        with self._timed('summary'):
+            self._summarize(anomalies)
+
+    def _summarize(self, anomalies: List[Dict]):
         try:
             self.summary = {
                 'flight_time': self._calculate_flight_time(),
@@ -63,6 +296,7 @@ class LogParser:
                 'gps_issues': self._detect_gps_issues(),
                 'critical_errors': self._get_critical_errors(),
                 'mode_changes': self._get_mode_changes(),
+                'anomalies': anomalies,
                 'message_types': list(self.data.keys())  # Add available message types
             }
         except Exception as e:
@@ -76,9 +310,9 @@ class LogParser:
         """Calculate total flight time in seconds."""
         try:
             if 'MODE' in self.data:
-                times = [msg.get('time_usec', 0) for msg in self.data['MODE']]
-                if times:
-                    return (max(times) - min(times)) / 1e6
+                times = self._time_column('MODE')
+                if times.size:
+                    return float(times.max() - times.min()) / 1e6
             return 0.0
         except Exception as e:
             print(f"Warning: Error calculating flight time: {str(e)}")
@@ -87,9 +321,9 @@ class LogParser:
     def _get_max_altitude(self) -> float:
         """Get maximum altitude reached during flight."""
         try:
-            if 'GPS' in self.data:
-                altitudes = [msg.get('Alt', 0) for msg in self.data['GPS']]
-                return max(altitudes) if altitudes else 0.0
+            altitudes = self._column('GPS', 'Alt')
+            if altitudes is not None and altitudes.size:
+                return float(altitudes.max())
             return 0.0
         except Exception as e:
             print(f"Warning: Error getting max altitude: {str(e)}")
@@ -98,58 +332,85 @@ class LogParser:
     def _get_min_battery(self) -> float:
         """Get minimum battery voltage during flight."""
         try:
-            if 'BAT' in self.data:
-                voltages = [msg.get('Volt', 0) for msg in self.data['BAT']]
-                return min(voltages) if voltages else 0.0
+            voltages = self._column('BAT', 'Volt')
+            if voltages is not None and voltages.size:
+                return float(voltages.min())
             return 0.0
         except Exception as e:
             print(f"Warning: Error getting min battery: {str(e)}")
             return 0.0
     
+    def _end_time(self) -> float:
+        """Timestamp of the last message of any type."""
+        ends = [
+            self._time_column(msg_type)[-1].item()
+            for msg_type in self.data
+            if self._time_field(msg_type) and len(self._time_column(msg_type))
+        ]
+        return max(ends) if ends else 0
+    
     def _detect_gps_issues(self) -> List[Dict]:
-        """Detect GPS signal issues during flight."""
-        try:
-            gps_issues = []
-            if 'GPS' in self.data:
-                for msg in self.data['GPS']:
-                    if msg.get('Status', 0) < 3:  # Less than 3D fix
-                        gps_issues.append({
-                            'time': msg.get('time_usec', 0),
-                            'status': msg.get('Status', 0),
-                            'satellites': msg.get('NSats', 0)
-                        })
-            return gps_issues
+        """Detect GPS signal issues during flight, as intervals without a 3D fix."""
+        try:
+            status = self._column('GPS', 'Status')
+            if status is None:
+                return []
+            return gps_issue_intervals(
+                self._time_column('GPS'), status, self._column('GPS', 'NSats'))
         except Exception as e:
             print(f"Warning: Error detecting GPS issues: {str(e)}")
             return []
     
     def _get_critical_errors(self) -> List[Dict]:
-        """Get list of critical errors during flight."""
+        """Get critical errors during flight; repeats of an error form one interval."""
         try:
-            return [
-                event for event in self.events 
-                if event['type'] == 'ERR' and event['data'].get('Severity', 0) >= 2
-            ]
+            # ERR records are Subsys,ECode; an ECode of 0 means the error cleared
+            ecode = self._column('ERR', 'ECode')
+            if ecode is None:
+                return []
+            rows = np.flatnonzero(ecode != 0)
+            columns = {field: values[rows] for field, values in self.data['ERR'].items()}
+            return repeat_intervals(
+                self._time_column('ERR')[rows], columns, self._time_field('ERR'))
         except Exception as e:
             print(f"Warning: Error getting critical errors: {str(e)}")
             return []
     
     def _get_mode_changes(self) -> List[Dict]:
-        """Get list of flight mode changes."""
+        """Get flight mode changes, each with the interval the mode was active."""
         try:
-            return [
-                event for event in self.events 
-                if event['type'] == 'MODE'
-            ]
+            if 'MODE' not in self.data:
+                return []
+            times = self._time_column('MODE')
+            order = np.argsort(times, kind='stable')
+            columns = {field: values[order] for field, values in self.data['MODE'].items()}
+            return state_intervals(
+                times[order], columns, self._end_time(), self._time_field('MODE'))
         except Exception as e:
             print(f"Warning: Error getting mode changes: {str(e)}")
             return []
     
-    def get_dataframe(self, message_type: str) -> Optional[pd.DataFrame]:
-        """Get a pandas DataFrame for a specific message type."""
+    def _detect_anomalies(self) -> List[Dict]:
+        """Run the anomaly detectors over the full-rate columns, as intervals."""
+        try:
+            return self.anomalies.detect(self.data)
+        except Exception as e:
+            print(f"Warning: Error detecting anomalies: {str(e)}")
+            return []
+    
+    def get_dataframe(self, message_type: str) -> Optional["pd.DataFrame"]:
+        """Get a pandas DataFrame for a specific message type.
+
+        The DataFrame wraps the parsed column arrays without copying them.
+        """
+        import pandas as pd
         try:
             if message_type in self.data:
-                return pd.DataFrame(self.data[message_type])
+                columns = {
+                    field: list(values) if values.ndim > 1 else values
+                    for field, values in self.data[message_type].items()
+                }
+                return pd.DataFrame(columns, copy=False)
             return None
         except Exception as e:
             print(f"Warning: Error getting dataframe: {str(e)}")
@@ -0,0 +1,357 @@
+from typing import Callable, Dict, List, Optional, Set, Tuple
+import ast
+import functools
+import math
+import os
+import re
+import threading
+import xml.etree.ElementTree as ET
+import numpy as np
+from app.services.series import SeriesIndex
+
+# Preset graphs, in MAVProxy's mavgraphs.xml format
+GRAPHS_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'mavgraphs.xml')
+# Fields naming the sensor instance that ``MSG[n]`` selects
+INSTANCE_FIELDS = ('I', 'C', 'Instance')
+# Largest power of the lowpass factor's inverse a block may reach, which
+# bounds the rounding error of the blocked filter
+_LOWPASS_GROWTH = 1e4
+# Below this factor a filter step is solved as a single look-back
+_NEGLIGIBLE_FACTOR = 1e-6
+
+_FIELD_SUFFIX = re.compile(r'^(?P<expr>.*?)(?:\{(?P<condition>[^{}]*)\})?(?::(?P<axis>2))?$')
+
+
+class ExpressionError(ValueError):
+    """Raised when a graph expression cannot be evaluated on a log."""
+
+
+def lowpass(values: np.ndarray, factor: float) -> np.ndarray:
+    """mavextra's ``lowpass``: ``y[n] = factor * y[n-1] + (1 - factor) * x[n]``, ``y[0] = x[0]``.
+
+    Vectorized by splitting the series into blocks short enough that
+    ``factor ** -length`` stays small: each block is filtered from a zero
+    state with a scaled cumulative sum, then the state carried between
+    blocks (itself a first-order filter, with factor ``factor ** length``)
+    is solved the same way and added back.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if not 0.0 <= factor < 1.0:
+        raise ExpressionError("lowpass factor must be within [0, 1)")
+    if factor == 0.0 or len(values) < 2:
+        return values.copy()
+    return _first_order(values * (1.0 - factor), factor, values[0])
+
+
+def _first_order(inputs: np.ndarray, factor: float, initial: float) -> np.ndarray:
+    """Solve ``y[n] = factor * y[n-1] + inputs[n]`` with ``y[-1] = initial``."""
+    count = len(inputs)
+    if factor < _NEGLIGIBLE_FACTOR:
+        # two steps back contribute less than factor ** 2 of a sample
+        result = inputs.copy()
+        result[0] += factor * initial
+        result[1:] += factor * inputs[:-1]
+        return result
+    length = max(2, min(count, int(math.log(_LOWPASS_GROWTH) / -math.log(factor))))
+    blocks = -(-count // length)
+    padded = np.zeros(blocks * length)
+    padded[:count] = inputs
+    rows = padded.reshape(blocks, length)
+    powers = factor ** np.arange(length)
+    # zero-state response of every block at once
+    partial = np.cumsum(rows / powers, axis=1) * powers
+    carry_factor = factor ** length
+    if blocks > 1:
+        # state at the end of each block: the same recurrence, one step per block
+        ends = _first_order(partial[:, -1], carry_factor, initial)
+    else:
+        ends = np.array([])
+    starts = np.concatenate(([initial], ends[:-1]))
+    result = partial + starts[:, None] * (factor * powers)
+    return result.ravel()[:count]
+
+
+def _lowpass_call(values: np.ndarray, key=None, factor: float = 0.9) -> np.ndarray:
+    # the key names mavextra's filter state; each call here has its own
+    return lowpass(values, float(factor))
+
+
+FUNCTIONS: Dict[str, Callable] = {
+    'degrees': np.degrees,
+    'radians': np.radians,
+    'sqrt': np.sqrt,
+    'abs': np.abs,
+    'sin': np.sin,
+    'cos': np.cos,
+    'tan': np.tan,
+    'asin': np.arcsin,
+    'acos': np.arccos,
+    'atan': np.arctan,
+    'atan2': np.arctan2,
+    'exp': np.exp,
+    'log': np.log,
+    'log10': np.log10,
+    'min': np.minimum,
+    'max': np.maximum,
+    'lowpass': _lowpass_call,
+}
+
+_BINARY_OPS = {
+    ast.Add: np.add, ast.Sub: np.subtract, ast.Mult: np.multiply, ast.Div: np.true_divide,
+    ast.Pow: np.power, ast.Mod: np.mod,
+}
+_COMPARE_OPS = {
+    ast.Eq: np.equal, ast.NotEq: np.not_equal, ast.Lt: np.less, ast.LtE: np.less_equal,
+    ast.Gt: np.greater, ast.GtE: np.greater_equal,
+}
+
+# (message type, instance or None, field)
+Variable = Tuple[str, Optional[int], str]
+
+
+def _variable(node: ast.AST) -> Optional[Variable]:
+    """The message field an ``MSG.Field`` or ``MSG[n].Field`` node refers to."""
+    if not isinstance(node, ast.Attribute):
+        return None
+    source = node.value
+    if isinstance(source, ast.Name):
+        return source.id, None, node.attr
+    if (isinstance(source, ast.Subscript) and isinstance(source.value, ast.Name)
+            and isinstance(source.slice, ast.Constant) and isinstance(source.slice.value, int)):
+        return source.value.id, source.slice.value, node.attr
+    return None
+
+
+class Expression:
+    """One plotted field of a mavgraph expression, parsed for vectorized evaluation.
+
+    ``text`` is a Python-syntax formula over ``MSG.Field`` and
+    ``MSG[instance].Field`` variables, optionally followed by a
+    ``{condition}`` and ``:2`` for the second axis.  Only arithmetic,
+    comparisons and the functions in ``FUNCTIONS`` are accepted.
+    """
+
+    def __init__(self, text: str):
+        match = _FIELD_SUFFIX.match(text)
+        self.text = text
+        self.axis = 2 if match.group('axis') else 1
+        self.formula = self._parse(match.group('expr'))
+        condition = match.group('condition')
+        self.condition = self._parse(condition) if condition else None
+        self.variables: Set[Variable] = set()
+        for tree in (self.formula, self.condition):
+            if tree is not None:
+                self._collect(tree)
+
+    @staticmethod
+    def _parse(text: str) -> ast.AST:
+        try:
+            return ast.parse(text, mode='eval').body
+        except SyntaxError:
+            raise ExpressionError(f"Cannot parse expression: {text}")
+
+    def _collect(self, node: ast.AST):
+        variable = _variable(node)
+        if variable is not None:
+            self.variables.add(variable)
+        elif isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPS:
+            self._collect(node.left)
+            self._collect(node.right)
+        elif isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+            self._collect(node.operand)
+        elif isinstance(node, ast.Compare) and all(type(op) in _COMPARE_OPS for op in node.ops):
+            for child in [node.left] + node.comparators:
+                self._collect(child)
+        elif isinstance(node, ast.BoolOp):
+            for child in node.values:
+                self._collect(child)
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name) \
+                and node.func.id in FUNCTIONS and not node.keywords:
+            for child in node.args:
+                self._collect(child)
+        elif not (isinstance(node, ast.Constant) and isinstance(node.value, (int, float, str))):
+            raise ExpressionError(f"Unsupported in {self.text}: {ast.unparse(node)}")
+
+    @property
+    def message_types(self) -> Set[str]:
+        return {msg_type for msg_type, _, _ in self.variables}
+
+    def evaluate(self, index: SeriesIndex) -> Tuple[np.ndarray, np.ndarray]:
+        """Timestamps (µs) and values of the expression over a log.
+
+        Like mavgraph, the expression is evaluated whenever any message it
+        refers to arrives, each variable holding its latest value; points
+        before every variable has a value, failing the condition or not
+        finite are dropped.
+        """
+        sources: Dict[Tuple[str, Optional[int]], Tuple[np.ndarray, Optional[np.ndarray]]] = {}
+        for msg_type, instance, _ in self.variables:
+            if (msg_type, instance) not in sources:
+                sources[msg_type, instance] = self._source(index, msg_type, instance)
+        if not sources:
+            raise ExpressionError(f"No message fields in {self.text}")
+
+        if len(sources) == 1:
+            times = next(iter(sources.values()))[0]
+            positions = {key: None for key in sources}
+            valid = np.ones(len(times), dtype=bool)
+        else:
+            times = np.unique(np.concatenate([source[0] for source in sources.values()]))
+            positions, valid = {}, np.ones(len(times), dtype=bool)
+            for key, (source_times, _) in sources.items():
+                position = np.searchsorted(source_times, times, side='right') - 1
+                valid &= position >= 0
+                positions[key] = np.maximum(position, 0)
+
+        columns = {}
+        for msg_type, instance, field in self.variables:
+            if field not in index.data[msg_type]:
+                raise ExpressionError(f"{msg_type}.{field} is not in this log")
+            values = index.column(msg_type, field)
+            rows = sources[msg_type, instance][1]
+            if rows is not None:
+                values = values[rows]
+            if positions[msg_type, instance] is not None:
+                values = values[positions[msg_type, instance]]
+            columns[msg_type, instance, field] = values
+
+        try:
+            with np.errstate(all='ignore'):
+                result = np.broadcast_to(
+                    np.asarray(self._eval(self.formula, columns), dtype=np.float64), times.shape)
+                if self.condition is not None:
+                    valid &= np.broadcast_to(
+                        np.asarray(self._eval(self.condition, columns), dtype=bool), times.shape)
+        except (TypeError, ValueError) as e:
+            raise ExpressionError(f"Cannot evaluate {self.text}: {str(e)}")
+        valid &= np.isfinite(result)
+        return times[valid], result[valid]
+
+    @staticmethod
+    def _source(index: SeriesIndex, msg_type: str,
+                instance: Optional[int]) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Sorted times of a message (instance) and its rows within the sorted columns."""
+        if msg_type not in index.data:
+            raise ExpressionError(f"{msg_type} is not in this log")
+        try:
+            times = index.times(msg_type)
+        except KeyError as e:
+            raise ExpressionError(str(e.args[0]))
+        if instance is None:
+            return times, None
+        field = next((name for name in INSTANCE_FIELDS if name in index.data[msg_type]), None)
+        if field is None:
+            # a single-instance message only has instance 0
+            if instance != 0:
+                raise ExpressionError(f"{msg_type} has no instance {instance}")
+            return times, None
+        rows = np.flatnonzero(index.column(msg_type, field) == instance)
+        return times[rows], rows
+
+    def _eval(self, node: ast.AST, columns: Dict[Variable, np.ndarray]):
+        variable = _variable(node)
+        if variable is not None:
+            return columns[variable]
+        if isinstance(node, ast.Constant):
+            return node.value
+        if isinstance(node, ast.BinOp):
+            left, right = self._eval(node.left, columns), self._eval(node.right, columns)
+            return _BINARY_OPS[type(node.op)](np.asarray(left, dtype=np.float64), right)
+        if isinstance(node, ast.UnaryOp):
+            operand = self._eval(node.operand, columns)
+            return -np.asarray(operand, dtype=np.float64) if isinstance(node.op, ast.USub) else operand
+        if isinstance(node, ast.Compare):
+            result, left = True, self._eval(node.left, columns)
+            for op, comparator in zip(node.ops, node.comparators):
+                right = self._eval(comparator, columns)
+                result = np.logical_and(result, _COMPARE_OPS[type(op)](left, right))
+                left = right
+            return result
+        if isinstance(node, ast.BoolOp):
+            combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+            return functools.reduce(combine, [self._eval(value, columns) for value in node.values])
+        return FUNCTIONS[node.func.id](*[self._eval(arg, columns) for arg in node.args])
+
+
+class Graph:
+    """A preset graph: alternative expressions for different log formats."""
+
+    def __init__(self, name: str, description: str, expressions: List[str]):
+        self.name = name
+        self.description = description
+        self.expressions = expressions
+
+    def to_dict(self) -> Dict:
+        return {'name': self.name, 'description': self.description, 'expressions': self.expressions}
+
+
+@functools.lru_cache(maxsize=4)
+def load_graphs(path: str = GRAPHS_PATH) -> Dict[str, Graph]:
+    """Preset graphs from a mavgraphs.xml file, by name."""
+    graphs = {}
+    for element in ET.parse(path).getroot().iter('graph'):
+        description = element.findtext('description') or ''
+        expressions = [' '.join(node.text.split()) for node in element.iter('expression') if node.text]
+        graphs[element.get('name')] = Graph(element.get('name'), ' '.join(description.split()), expressions)
+    return graphs
+
+
+class GraphEngine:
+    """Evaluates preset graphs over one parsed log, caching each result.
+
+    A graph lists alternative expressions (for telemetry and DataFlash
+    logs, or different firmware versions); the first whose fields all
+    parse and whose message types are all in the log is used, as in
+    mavgraph.  Every field is evaluated in whole-column NumPy operations.
+    """
+
+    def __init__(self, index: SeriesIndex, graphs: Optional[Dict[str, Graph]] = None):
+        self.index = index
+        self.graphs = graphs if graphs is not None else load_graphs()
+        self._results: Dict[str, Tuple[str, List[Dict]]] = {}
+        self._lock = threading.Lock()
+
+    def _choose(self, graph: Graph) -> Tuple[str, List[Expression]]:
+        reasons = []
+        for text in graph.expressions:
+            try:
+                fields = [Expression(field) for field in text.split()]
+            except ExpressionError as e:
+                reasons.append(str(e))
+                continue
+            missing = set().union(*(field.message_types for field in fields)) - set(self.index.data)
+            if missing:
+                reasons.append(f"missing {', '.join(sorted(missing))}")
+                continue
+            return text, fields
+        raise ExpressionError(f"{graph.name} cannot be drawn from this log ({'; '.join(reasons)})")
+
+    def available(self) -> List[str]:
+        """Names of the graphs with an expression this log can evaluate."""
+        names = []
+        for name, graph in self.graphs.items():
+            try:
+                self._choose(graph)
+            except ExpressionError:
+                continue
+            names.append(name)
+        return names
+
+    def evaluate(self, name: str) -> Tuple[str, List[Dict]]:
+        """The chosen expression of a graph and one series per field.
+
+        Each series holds its field text, axis and ``time`` (µs) and
+        ``values`` arrays.
+        """
+        if name not in self.graphs:
+            raise KeyError(f"Unknown graph: {name}")
+        with self._lock:
+            if name not in self._results:
+                text, fields = self._choose(self.graphs[name])
+                series = []
+                for field in fields:
+                    times, values = field.evaluate(self.index)
+                    series.append({'expression': field.text, 'axis': field.axis,
+                                   'time': times, 'values': values})
+                self._results[name] = (text, series)
+            return self._results[name]
@@ -0,0 +1,228 @@
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+import threading
+import time
+
+# Latency buckets in seconds, from a cache hit to a long parse or LLM call
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+# Messages decoded per second by one parse
+RATE_BUCKETS = (1e4, 3e4, 1e5, 3e5, 1e6, 3e6, 1e7, 3e7)
+# Parse stages that decode messages (the rest post-process them)
+DECODE_STAGES = ('decode', 'recv_match', 'to_dict')
+
+
+def _labels(names: Sequence[str], values: Tuple[str, ...]) -> str:
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric(ABC):
+    """One metric family; samples are keyed by their label values."""
+
+    kind = ''
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} takes labels {', '.join(self.label_names) or 'none'}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        """The exposition lines of every labelled value."""
+
+    def render(self) -> List[str]:
+        return [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}'] + self.samples()
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f'{self.name}{_labels(self.label_names, key)} {_number(value)}' for key, value in values]
+
+
+class Histogram(Metric):
+    """Cumulative-bucket histogram with a sum and count per label set."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (per-bucket counts, the last for +Inf; sum)
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """Observe the seconds spent in the ``with`` block."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels) -> int:
+        entry = self._values.get(self._key(labels))
+        return sum(entry[0]) if entry else 0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        lines = []
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                labels = _labels(self.label_names + ('le',), key + (_number(bound),))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _labels(self.label_names, key)
+            lines.append(f'{self.name}_sum{labels} {_number(total)}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class StatsCollector:
+    """Exposes a component's ``stats()`` dict, read at scrape time.
+
+    Each numeric entry becomes a metric named ``<prefix>_<key>``: a
+    counter (with a ``_total`` suffix) for the keys in ``counters``,
+    otherwise a gauge.
+    """
+
+    def __init__(self, prefix: str, help: str, stats: Callable[[], Dict], counters: Sequence[str] = ()):
+        self.prefix = prefix
+        self.help = help
+        self.stats = stats
+        self.counters = set(counters)
+
+    def render(self) -> List[str]:
+        try:
+            stats = self.stats()
+        except Exception as e:
+            print(f"Warning: could not collect {self.prefix} metrics: {str(e)}")
+            return []
+        lines = []
+        for key, value in stats.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            kind = 'counter' if key in self.counters else 'gauge'
+            name = f'{self.prefix}_{key}' + ('_total' if kind == 'counter' else '')
+            lines += [f'# HELP {name} {self.help}: {key.replace("_", " ")}',
+                      f'# TYPE {name} {kind}', f'{name} {_number(value)}']
+        return lines
+
+
+class Registry:
+    """The metrics of one process, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _add(self, name: str, metric):
+        with self._lock:
+            if name in self._metrics:
+                raise ValueError(f"Metric {name} is already registered")
+            self._metrics[name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._add(name, Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._add(name, Histogram(name, help, labels, buckets))
+
+    def collect(self, prefix: str, help: str, stats: Callable[[], Dict],
+                counters: Sequence[str] = ()) -> StatsCollector:
+        """Register (or replace) the stats of a component."""
+        collector = StatsCollector(prefix, help, stats, counters)
+        with self._lock:
+            self._metrics[prefix] = collector
+        return collector
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines += metric.render()
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+http_seconds = registry.histogram(
+    'uav_http_request_seconds', 'HTTP request latency by route', ('method', 'route', 'status'))
+upload_bytes = registry.counter('uav_upload_bytes_total', 'Bytes of log uploads received')
+upload_read_seconds = registry.histogram(
+    'uav_upload_read_seconds', 'Time to receive an upload and write it to disk')
+parse_seconds = registry.histogram(
+    'uav_parse_seconds', 'Time to parse a log, as seen by the API (including queueing)', ('mode',))
+parse_stage_seconds = registry.histogram(
+    'uav_parse_stage_seconds', 'Time spent in each stage of a log parse', ('stage',))
+parse_messages = registry.counter('uav_parse_messages_total', 'Messages decoded from uploaded logs')
+parse_message_rate = registry.histogram(
+    'uav_parse_messages_per_second', 'Messages decoded per second of decoding, per log',
+    buckets=RATE_BUCKETS)
+chat_seconds = registry.histogram(
+    'uav_chat_seconds', 'Time to answer a chat message', ('mode', 'cached'))
+llm_seconds = registry.histogram('uav_llm_call_seconds', 'Latency of one LLM call', ('mode',))
+llm_tokens = registry.counter(
+    'uav_llm_tokens_total', 'Prompt and response tokens of LLM calls '
+    '(reported by the model, else estimated)', ('kind',))
+
+
+def observe_parse(timings: Dict[str, float], messages: int):
+    """Record the stage timings and message count of one parse.
+
+    ``timings`` maps stage names to seconds (see ``LogParser.timings``);
+    the decode rate is measured over the decoding stages only.
+    """
+    for stage, seconds in timings.items():
+        parse_stage_seconds.observe(seconds, stage=stage)
+    parse_messages.inc(messages)
+    decoding = sum(seconds for stage, seconds in timings.items() if stage in DECODE_STAGES)
+    if messages and decoding > 0:
+        parse_message_rate.observe(messages / decoding)
@@ -0,0 +1,217 @@
+from concurrent.futures import Executor, ProcessPoolExecutor, wait
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import mmap
+import multiprocessing
+import os
+import threading
+import numpy as np
+from app.services.column_store import ColumnStore
+from app.services.dataflash import (
+    FMT_LENGTH, FMT_TYPE, DataFlashDecoder, DataFlashError, DataFlashFormat,
+    _length_table, decode_records, find_headers, read_formats, scan_records
+)
+from app.services.parsed_log import ParsedLog
+
+# Logs smaller than this are decoded in-process: worker round trips and
+# the extra format scan would cost more than they save
+PARALLEL_MIN_BYTES = 64 * 1024 * 1024
+# Bytes searched on either side of a split point for a record boundary
+SPLIT_WINDOW = 64 * 1024
+
+_executor: Optional[Executor] = None
+_executor_workers = 0
+_executor_lock = threading.Lock()
+
+
+def _get_executor(workers: int) -> Executor:
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is None or _executor_workers != workers:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            _executor = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            _executor_workers = workers
+        return _executor
+
+
+def shutdown():
+    """Stop the decode worker processes."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+@contextmanager
+def _mapped(file_path: str) -> Iterator[np.ndarray]:
+    with open(file_path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        yield np.frombuffer(mapped, dtype=np.uint8)
+    finally:
+        try:
+            mapped.close()
+        except BufferError:
+            # still referenced by the caller; unmapped when collected
+            pass
+
+
+class _Counter:
+    """Write sink that only counts bytes, to size a shared memory block."""
+
+    def __init__(self):
+        self.size = 0
+
+    def write(self, data):
+        self.size += memoryview(data).nbytes
+
+
+class _BufferWriter:
+    """Write sink over a preallocated buffer."""
+
+    def __init__(self, buffer: memoryview):
+        self.buffer = buffer
+        self.position = 0
+
+    def write(self, data):
+        data = memoryview(data).cast('B')
+        self.buffer[self.position:self.position + len(data)] = data
+        self.position += len(data)
+
+
+def format_records(file_path: str, start: int, stop: int) -> bytes:
+    """Worker: the raw FMT records whose header lies in ``[start, stop)``."""
+    with _mapped(file_path) as buf:
+        headers = find_headers(buf, start, stop)
+        found = headers[buf[headers + 2] == FMT_TYPE]
+        found = found[found + FMT_LENGTH <= len(buf)]
+        return buf[found[:, None] + np.arange(FMT_LENGTH)].tobytes()
+
+
+def decode_range(file_path: str, start: int, stop: int, formats: Dict[int, DataFlashFormat],
+                 types: Optional[set]) -> str:
+    """Worker: decode the records in ``[start, stop)`` into shared memory.
+
+    ``start`` and ``stop`` must be record boundaries.  The columns are
+    packed as a ``ParsedLog`` into a new shared memory block whose name
+    is returned; the caller unlinks it.
+    """
+    with _mapped(file_path) as buf:
+        chunk = buf[start:stop]
+        offsets, msg_ids = scan_records(chunk, find_headers(chunk), _length_table(formats))
+        store = ColumnStore()
+        decode_records(chunk, offsets, msg_ids, formats, store, types)
+        del chunk
+    parsed = ParsedLog({}, store.finalize())
+    counter = _Counter()
+    parsed.write(counter)
+    block = shared_memory.SharedMemory(create=True, size=max(counter.size, 1))
+    # the parent attaches, and so registers, the block before unlinking it
+    resource_tracker.unregister(block._name, 'shared_memory')
+    try:
+        parsed.write(_BufferWriter(block.buf))
+    finally:
+        block.close()
+    return block.name
+
+
+def record_boundaries(buf: np.ndarray, formats: Dict[int, DataFlashFormat], parts: int) -> List[int]:
+    """Split points at record starts dividing ``buf`` into about ``parts`` ranges.
+
+    Each point is the first record at or after an even split, found by
+    scanning a small window around it.  Returns the range edges,
+    ``0`` and ``len(buf)`` included.
+    """
+    lengths = _length_table(formats)
+    bounds = [0]
+    for i in range(1, parts):
+        point = len(buf) * i // parts
+        lo = max(point - SPLIT_WINDOW, 0)
+        window = buf[lo:min(point + SPLIT_WINDOW, len(buf))]
+        offsets, _ = scan_records(window, find_headers(window), lengths)
+        offsets = offsets[offsets + lo >= point]
+        if offsets.size and int(offsets[0]) + lo > bounds[-1]:
+            bounds.append(int(offsets[0]) + lo)
+    bounds.append(len(buf))
+    return bounds
+
+
+def _merge(parts: List[ParsedLog]) -> Dict[str, Dict[str, np.ndarray]]:
+    """Concatenate per-range columns in file order (copying out of the parts)."""
+    chunks: Dict[str, Dict[str, List[np.ndarray]]] = {}
+    for part in parts:
+        for msg_type, columns in part.data.items():
+            fields = chunks.setdefault(msg_type, {})
+            for field, values in columns.items():
+                fields.setdefault(field, []).append(values)
+    return {
+        msg_type: {field: np.concatenate(values) for field, values in fields.items()}
+        for msg_type, fields in chunks.items()
+    }
+
+
+class ParallelDecoder:
+    """Decodes one large DataFlash log on several cores.
+
+    The file is split at record boundaries and each range is decoded by a
+    worker process, which hands its columns back through shared memory.
+    The format table is read first (by the same workers, one range each),
+    so message types whose FMT record appears mid-log decode in every
+    range.  Ranges are contiguous and in file order, so concatenating
+    them gives each type's records in the same (time) order, and the same
+    columns, as ``DataFlashDecoder``.  Logs under ``PARALLEL_MIN_BYTES``
+    are decoded in-process.
+    """
+
+    def __init__(self, file_path: str, workers: int):
+        self.file_path = file_path
+        self.workers = workers
+        self.formats: Dict[int, DataFlashFormat] = {}
+
+    def decode(self, types: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, np.ndarray]]:
+        """Decode the log, optionally only the named message types."""
+        if self.workers < 2 or os.path.getsize(self.file_path) < PARALLEL_MIN_BYTES:
+            decoder = DataFlashDecoder(self.file_path)
+            data = decoder.decode(types)
+            self.formats = decoder.formats
+            return data
+        types = set(types) if types is not None else None
+        executor = _get_executor(self.workers)
+        with _mapped(self.file_path) as buf:
+            even = [len(buf) * i // self.workers for i in range(self.workers + 1)]
+            records = b''.join(executor.map(
+                format_records, [self.file_path] * self.workers, even[:-1], even[1:]))
+            table = np.frombuffer(records, dtype=np.uint8)
+            self.formats = read_formats(table, np.arange(0, len(table), FMT_LENGTH))
+            if not self.formats:
+                raise DataFlashError("No FMT records found")
+            bounds = record_boundaries(buf, self.formats, self.workers)
+            del buf
+        futures = [
+            executor.submit(decode_range, self.file_path, start, stop, self.formats, types)
+            for start, stop in zip(bounds[:-1], bounds[1:])
+        ]
+        wait(futures)
+        blocks = [
+            shared_memory.SharedMemory(name=future.result())
+            for future in futures if future.exception() is None
+        ]
+        try:
+            for future in futures:
+                if future.exception() is not None:
+                    raise future.exception()
+            parts = [ParsedLog.from_buffer(block.buf) for block in blocks]
+            data = _merge(parts)
+            del parts
+            return data
+        finally:
+            for block in blocks:
+                try:
+                    block.close()
+                except BufferError:
+                    pass
+                block.unlink()
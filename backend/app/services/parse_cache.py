@@ -0,0 +1,152 @@
+from collections import OrderedDict
+from typing import Dict, Optional
+import mmap
+import os
+import threading
+from app.services.parsed_log import ParsedLog
+
+# Bump when the parser output changes so stale entries are ignored
+CACHE_VERSION = 4
+
+
+class ParseCache:
+    """On-disk cache of parsed logs keyed by the SHA-256 of the upload.
+
+    Entries are ParsedLog packs, read back through mmap so a hit costs
+    little more than opening the file.  The total size is capped at
+    ``max_bytes`` with least-recently-used eviction; recency survives
+    restarts through the files' modification times.  ``variant`` tells
+    apart results of other parser settings (the anomaly detector
+    parameters), whose entries are ignored.
+
+    The directory may be shared by several worker processes: a hash
+    missing from this process's index is looked up on disk, and eviction
+    rereads the directory so the budget and LRU order hold across them.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, variant: str = ''):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._suffix = f".v{CACHE_VERSION}{'.' + variant if variant else ''}.pack"
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @property
+    def size_bytes(self) -> int:
+        return sum(self._entries.values())
+
+    def _path(self, content_hash: str) -> str:
+        return os.path.join(self.directory, content_hash + self._suffix)
+
+    def _load_index(self):
+        """Rebuild the LRU order from the files on disk (written by any process).
+
+        File times are coarse, so ties keep this process's own order.
+        """
+        rank = {content_hash: i for i, content_hash in enumerate(self._entries)}
+        found = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(self._suffix):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue  # evicted by another process meanwhile
+            content_hash = name[:-len(self._suffix)]
+            found.append((stat.st_mtime, rank.get(content_hash, -1), content_hash, stat.st_size))
+        self._entries.clear()
+        for _, _, content_hash, size in sorted(found):
+            self._entries[content_hash] = size
+
+    def _known(self, content_hash: str) -> bool:
+        """Whether a hash is cached, adopting packs other processes wrote (under the lock)."""
+        if not self.enabled:
+            return False
+        if content_hash not in self._entries:
+            try:
+                self._entries[content_hash] = os.path.getsize(self._path(content_hash))
+            except OSError:
+                return False
+        return True
+
+    def __contains__(self, content_hash: str) -> bool:
+        """Whether a hash is cached, without counting a hit or miss."""
+        with self._lock:
+            return self._known(content_hash)
+
+    def path(self, content_hash: str) -> Optional[str]:
+        """The pack file of a cached hash, or None if it is not cached."""
+        with self._lock:
+            if not self._known(content_hash):
+                return None
+        return self._path(content_hash)
+
+    def get(self, content_hash: str) -> Optional[ParsedLog]:
+        """Return the cached parse for a hash, or None on a miss."""
+        with self._lock:
+            if not self._known(content_hash):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(content_hash)
+        path = self._path(content_hash)
+        try:
+            with open(path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            os.utime(path)
+            parsed = ParsedLog.from_buffer(mapped)
+        except (OSError, ValueError) as e:
+            print(f"Warning: dropping unreadable cache entry {content_hash}: {str(e)}")
+            with self._lock:
+                self._entries.pop(content_hash, None)
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return parsed
+
+    def put(self, content_hash: str, parsed: ParsedLog):
+        """Store a parse result, evicting least recently used entries."""
+        if not self.enabled:
+            return
+        path = self._path(content_hash)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            parsed.write(f)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._entries[content_hash] = os.path.getsize(path)
+            self._entries.move_to_end(content_hash)
+            # other processes may have added or evicted packs
+            self._load_index()
+            if content_hash in self._entries:
+                self._entries.move_to_end(content_hash)
+            self._evict()
+
+    def _evict(self):
+        while self.size_bytes > self.max_bytes and len(self._entries) > 1:
+            content_hash, _ = self._entries.popitem(last=False)
+            try:
+                os.remove(self._path(content_hash))
+            except OSError:
+                pass
+            self.evictions += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'size_bytes': self.size_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
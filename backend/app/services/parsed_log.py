@@ -0,0 +1,94 @@
+from typing import BinaryIO, Dict, Optional
+import io
+import json
+import struct
+import numpy as np
+
+MAGIC = b'ULOGPACK'
+ALIGNMENT = 64
+_HEADER_LEN = struct.Struct('<Q')
+
+
+def _padding(offset: int) -> int:
+    return -offset % ALIGNMENT
+
+
+class ParsedLog:
+    """A parsed flight log: the summary plus its columnar message data.
+
+    Packed form: magic, header length, a JSON header (summary, metadata
+    and a column directory), then each column's raw buffer aligned to 64
+    bytes.  Unpacking with ``from_buffer`` wraps the buffers in place, so
+    a memory-mapped pack is read without copying the arrays.
+    """
+
+    def __init__(self, summary: Dict, data: Optional[Dict[str, Dict[str, np.ndarray]]] = None,
+                 content_hash: Optional[str] = None):
+        self.summary = summary
+        self.data = data or {}
+        self.content_hash = content_hash
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate in-memory size of the column data."""
+        return sum(
+            values.nbytes
+            for columns in self.data.values()
+            for values in columns.values()
+        )
+
+    def _header(self) -> bytes:
+        directory = []
+        offset = 0
+        for msg_type, columns in self.data.items():
+            for field, values in columns.items():
+                offset += _padding(offset)
+                directory.append([msg_type, field, values.dtype.str, list(values.shape), offset])
+                offset += values.nbytes
+        header = {
+            'summary': self.summary,
+            'content_hash': self.content_hash,
+            'columns': directory,
+        }
+        return json.dumps(header, separators=(',', ':')).encode()
+
+    def write(self, stream: BinaryIO):
+        """Write the packed form to a binary stream."""
+        header = self._header()
+        prefix = len(MAGIC) + _HEADER_LEN.size + len(header)
+        stream.write(MAGIC)
+        stream.write(_HEADER_LEN.pack(len(header)))
+        stream.write(header)
+        stream.write(b'\0' * _padding(prefix))
+        offset = 0
+        for columns in self.data.values():
+            for values in columns.values():
+                stream.write(b'\0' * _padding(offset))
+                offset += _padding(offset)
+                stream.write(np.ascontiguousarray(values).data)
+                offset += values.nbytes
+
+    def to_bytes(self) -> bytes:
+        """Serialize to the compact packed form."""
+        stream = io.BytesIO()
+        self.write(stream)
+        return stream.getvalue()
+
+    @classmethod
+    def from_buffer(cls, buffer) -> 'ParsedLog':
+        """Load a packed log; column arrays are views into ``buffer``."""
+        view = memoryview(buffer)
+        if bytes(view[:len(MAGIC)]) != MAGIC:
+            raise ValueError("Not a packed log")
+        start = len(MAGIC) + _HEADER_LEN.size
+        (header_len,) = _HEADER_LEN.unpack(view[len(MAGIC):start])
+        header = json.loads(bytes(view[start:start + header_len]))
+        base = start + header_len
+        base += _padding(base)
+        data: Dict[str, Dict[str, np.ndarray]] = {}
+        for msg_type, field, dtype, shape, offset in header['columns']:
+            dtype = np.dtype(dtype)
+            count = int(np.prod(shape)) if shape else 1
+            values = np.frombuffer(view, dtype=dtype, count=count, offset=base + offset)
+            data.setdefault(msg_type, {})[field] = values.reshape(shape)
+        return cls(header['summary'], data, header.get('content_hash'))
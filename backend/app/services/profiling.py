@@ -0,0 +1,106 @@
+from contextlib import contextmanager
+from typing import Iterator, Optional
+import cProfile
+import os
+import threading
+import time
+import tracemalloc
+import uuid
+
+# What a request may ask to capture, and the file written for each
+PROFILE_KINDS = {'cpu': 'prof', 'memory': 'txt'}
+
+
+class RequestProfiler:
+    """Captures a CPU or memory profile of a single request.
+
+    ``cpu`` runs cProfile over the request and writes a ``.prof`` file
+    (load it with ``pstats`` or snakeviz); ``memory`` traces allocations
+    with tracemalloc and writes the ``top`` allocating lines and the peak.
+    Both profile the API process, not the parse workers: cProfile sees
+    the event-loop thread and tracemalloc every thread.  So that other
+    requests are not mixed in, a request is only profiled when it is the
+    only one in flight (see ``in_flight``); otherwise it runs unprofiled,
+    as do requests arriving while a profile runs.
+    """
+
+    def __init__(self, directory: str, top: int = 50):
+        self.directory = directory
+        self.top = top
+        self._lock = threading.Lock()
+        self._count_lock = threading.Lock()
+        self._in_flight = 0
+
+    @contextmanager
+    def in_flight(self) -> Iterator[None]:
+        """Count the ``with`` block as a request in flight."""
+        with self._count_lock:
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            with self._count_lock:
+                self._in_flight -= 1
+
+    @contextmanager
+    def profile(self, kind: str) -> Iterator[Optional[str]]:
+        """Profile the ``with`` block; yields the output path, or None if busy.
+
+        Called inside ``in_flight``, so it is busy when any other request
+        is in flight or another profile is running.
+        """
+        if kind not in PROFILE_KINDS:
+            raise ValueError(f"profile must be one of {', '.join(PROFILE_KINDS)}")
+        if not self._lock.acquire(blocking=False):
+            yield None
+            return
+        with self._count_lock:
+            alone = self._in_flight <= 1
+        if not alone:
+            self._lock.release()
+            yield None
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(
+                self.directory,
+                f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}-{kind}.{PROFILE_KINDS[kind]}")
+            if kind == 'cpu':
+                with self._cpu(path):
+                    yield path
+            else:
+                with self._memory(path):
+                    yield path
+        finally:
+            self._lock.release()
+
+    @contextmanager
+    def _cpu(self, path: str) -> Iterator[None]:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(path)
+
+    @contextmanager
+    def _memory(self, path: str) -> Iterator[None]:
+        started = not tracemalloc.is_tracing()
+        # already tracing: report the difference from before the request
+        baseline = None if started else tracemalloc.take_snapshot()
+        if started:
+            tracemalloc.start(16)
+        tracemalloc.reset_peak()
+        try:
+            yield
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            if started:
+                tracemalloc.stop()
+            stats = snapshot.compare_to(baseline, 'lineno') if baseline else snapshot.statistics('lineno')
+            with open(path, 'w') as f:
+                f.write(f"traced: {current} bytes, peak: {peak} bytes\n")
+                for stat in stats[:self.top]:
+                    f.write(f"{stat}\n")
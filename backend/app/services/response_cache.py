@@ -0,0 +1,67 @@
+from typing import Dict, Optional, Tuple
+import re
+import threading
+from app.services.store import BoundedStore
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+
+def normalize_question(question: str) -> str:
+    """Case- and punctuation-insensitive form of a question."""
+    return " ".join(_NON_WORD.sub(" ", question.lower()).split())
+
+
+class ResponseCache:
+    """Chat answers keyed by log content, prompt version and question.
+
+    Only standalone questions are cached: an answer that depends on
+    earlier turns of a conversation must not be served to another one.
+    Entries are bounded by bytes with LRU eviction and expire after the
+    TTL.  Each entry keeps the latency of the call that produced it, so
+    ``stats`` can report the time saved by hits.
+    """
+
+    def __init__(self, max_bytes: int, ttl_seconds: float):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.latency_saved = 0.0
+        self._lock = threading.Lock()
+        self._store = BoundedStore(
+            max_bytes, ttl_seconds, lambda entry: len(entry[0]) + 128)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @staticmethod
+    def key(content_hash: str, prompt_version: int, question: str) -> str:
+        return f"{content_hash}:{prompt_version}:{normalize_question(question)}"
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached answer for a key, or None on a miss."""
+        entry: Optional[Tuple[str, float]] = self._store.get(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.latency_saved += entry[1]
+        return entry[0]
+
+    def put(self, key: str, answer: str, latency: float):
+        """Cache an answer along with the seconds it took to generate."""
+        if self.enabled:
+            self._store.put(key, (answer, latency))
+
+    def stats(self) -> Dict:
+        stats = self._store.stats()
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats.update({
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'latency_saved_seconds': round(self.latency_saved, 3),
+            })
+        return stats
@@ -0,0 +1,163 @@
+from typing import Dict, List, Optional, Tuple
+import threading
+import weakref
+import numpy as np
+from app.services.downsample import lttb, minmax
+from app.services.log_parser import TIME_FIELDS
+from app.services.parsed_log import ParsedLog
+
+# Each pyramid level keeps about 1/PYRAMID_FACTOR of the samples of the
+# level below; levels stop once they are this small
+PYRAMID_FACTOR = 4
+PYRAMID_MIN_SAMPLES = 1024
+# A level serves a query if its window holds this many samples per point
+LEVEL_OVERSAMPLE = 4
+DOWNSAMPLE_METHODS = ('lttb', 'minmax')
+
+
+class SeriesIndex:
+    """Binary-searchable time index over the columns of a parsed log.
+
+    Each message type's timestamps are sorted once, on first access, so
+    time-range queries are two ``searchsorted`` calls and a slice.  Logs
+    are nearly always already in time order; when one is not, the sort
+    order is kept and the columns are permuted lazily per field.
+
+    For plots, ``downsample`` decimates a window to a point budget.  It
+    works from a min-max pyramid built per field on first use, so a
+    zoomed-out view reads a small coarse level instead of every sample.
+    """
+
+    def __init__(self, data: Dict[str, Dict[str, np.ndarray]]):
+        self.data = data
+        # msg_type -> (sorted times, sort order or None if already sorted)
+        self._times: Dict[str, Tuple[np.ndarray, Optional[np.ndarray]]] = {}
+        self._sorted: Dict[Tuple[str, str], np.ndarray] = {}
+        # (msg_type, field) -> index arrays into the sorted column, finest first
+        self._pyramids: Dict[Tuple[str, str], List[np.ndarray]] = {}
+        self._lock = threading.Lock()
+
+    def time_field(self, msg_type: str) -> Optional[str]:
+        columns = self.data.get(msg_type, {})
+        for field in TIME_FIELDS:
+            if field in columns:
+                return field
+        return None
+
+    def times(self, msg_type: str) -> np.ndarray:
+        """Sorted timestamps (microseconds) of a message type."""
+        with self._lock:
+            if msg_type not in self._times:
+                field = self.time_field(msg_type)
+                if field is None:
+                    raise KeyError(f"{msg_type} has no timestamp column")
+                times = self.data[msg_type][field]
+                order = None
+                if times.size > 1 and np.any(times[1:] < times[:-1]):
+                    order = np.argsort(times, kind='stable')
+                    times = times[order]
+                self._times[msg_type] = (times, order)
+            return self._times[msg_type][0]
+
+    def column(self, msg_type: str, field: str) -> np.ndarray:
+        """A field's values in the order of ``times(msg_type)``."""
+        times = self.times(msg_type)
+        values = self.data[msg_type][field]
+        order = self._times[msg_type][1]
+        if order is None:
+            return values
+        with self._lock:
+            key = (msg_type, field)
+            if key not in self._sorted:
+                self._sorted[key] = values[order]
+            return self._sorted[key]
+
+    @staticmethod
+    def _search(times: np.ndarray, value: float, side: str) -> int:
+        # search with a key of the column's own dtype: a mismatched key
+        # (float against integer times) makes NumPy cast the whole column
+        if times.dtype.kind in 'iu':
+            info = np.iinfo(times.dtype)
+            value = np.ceil(value) if side == 'left' else np.floor(value)
+            if value < info.min:
+                return 0
+            if value > info.max:
+                return len(times)
+            value = int(value)
+        return int(np.searchsorted(times, times.dtype.type(value), side=side))
+
+    def bounds(self, msg_type: str, start: Optional[float] = None,
+               end: Optional[float] = None) -> Tuple[int, int]:
+        """Index range of the samples with ``start <= time <= end``."""
+        times = self.times(msg_type)
+        lo = 0 if start is None else self._search(times, start, 'left')
+        hi = len(times) if end is None else self._search(times, end, 'right')
+        return lo, max(lo, hi)
+
+    def window(self, msg_type: str, field: str, start: Optional[float] = None,
+               end: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Timestamps and values of a field between ``start`` and ``end`` (µs)."""
+        lo, hi = self.bounds(msg_type, start, end)
+        return self.times(msg_type)[lo:hi], self.column(msg_type, field)[lo:hi]
+
+    def pyramid(self, msg_type: str, field: str) -> List[np.ndarray]:
+        """Min-max decimation levels of a field, finest first.
+
+        Each level is a sorted array of indices into ``column(msg_type,
+        field)`` keeping the extremes of the level below.
+        """
+        values = self.column(msg_type, field)
+        key = (msg_type, field)
+        with self._lock:
+            if key not in self._pyramids:
+                levels = []
+                indices = np.arange(len(values))
+                while len(indices) // PYRAMID_FACTOR >= PYRAMID_MIN_SAMPLES:
+                    indices = indices[minmax(values[indices], len(indices) // PYRAMID_FACTOR)]
+                    levels.append(indices)
+                self._pyramids[key] = levels
+            return self._pyramids[key]
+
+    def downsample(self, msg_type: str, field: str, start: Optional[float] = None,
+                   end: Optional[float] = None, points: int = 1000,
+                   method: str = 'lttb') -> Tuple[np.ndarray, np.ndarray]:
+        """Timestamps and values of a window decimated to at most ``points`` samples.
+
+        Reads the coarsest pyramid level that still has ``LEVEL_OVERSAMPLE``
+        samples per point in the window, then picks points from it by
+        LTTB or per-bucket min-max.
+        """
+        if method not in DOWNSAMPLE_METHODS:
+            raise ValueError(f"Unknown downsampling method: {method}")
+        lo, hi = self.bounds(msg_type, start, end)
+        times, values = self.times(msg_type), self.column(msg_type, field)
+        if hi - lo <= points:
+            return times[lo:hi], values[lo:hi]
+        for level in reversed(self.pyramid(msg_type, field)):
+            first, last = np.searchsorted(level, [lo, hi])
+            if last - first >= points * LEVEL_OVERSAMPLE:
+                rows = level[first:last]
+                break
+        else:
+            rows = np.arange(lo, hi)
+        if method == 'lttb':
+            picks = lttb(times[rows], values[rows], points)
+        else:
+            picks = minmax(values[rows], points)
+        rows = rows[picks]
+        return times[rows], values[rows]
+
+
+# One index per parsed log, shared by the API and the chat tools so the
+# sorted times and pyramids of a log exist once; dropped with the log
+_indexes: "weakref.WeakKeyDictionary[ParsedLog, SeriesIndex]" = weakref.WeakKeyDictionary()
+_indexes_lock = threading.Lock()
+
+
+def series_index(parsed: ParsedLog) -> SeriesIndex:
+    """The shared ``SeriesIndex`` of a parsed log, created on first use."""
+    with _indexes_lock:
+        index = _indexes.get(parsed)
+        if index is None:
+            index = _indexes[parsed] = SeriesIndex(parsed.data)
+        return index
@@ -0,0 +1,439 @@
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import json
+import mmap
+import os
+import sqlite3
+import threading
+import time
+from app.services.parse_cache import ParseCache
+from app.services.parsed_log import ParsedLog
+
+
+class BoundedStore:
+    """Dict-like store with a memory budget in bytes, a TTL and LRU eviction.
+
+    ``sizeof`` estimates the bytes held by a value.  When the total
+    exceeds ``max_bytes`` the least recently used entries are evicted;
+    entries not accessed for ``ttl_seconds`` expire.  Subclasses can keep
+    evicted values elsewhere by overriding ``_spill`` and ``_load``.
+    """
+
+    def __init__(self, max_bytes: int, ttl_seconds: float, sizeof: Callable[[Any], int]):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.sizeof = sizeof
+        self.size_bytes = 0
+        self.evictions = 0
+        self.expirations = 0
+        # key -> (value, size, last access)
+        self._entries: "OrderedDict[str, Tuple[Any, int, float]]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            self._expire()
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = (entry[0], entry[1], time.monotonic())
+                self._entries.move_to_end(key)
+                return entry[0]
+            value = self._load(key)
+            if value is None:
+                return default
+            self._insert(key, value)
+            self._evict()
+            return value
+
+    def put(self, key: str, value: Any):
+        with self._lock:
+            self._expire()
+            self._insert(key, value)
+            self._evict()
+
+    def pop(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return default
+            self.size_bytes -= entry[1]
+            self._discard(key)
+            return entry[0]
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def __getitem__(self, key: str) -> Any:
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value: Any):
+        self.put(key, value)
+
+    def __delitem__(self, key: str):
+        if self.pop(key) is None:
+            raise KeyError(key)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _insert(self, key: str, value: Any):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.size_bytes -= old[1]
+        size = self.sizeof(value)
+        self._entries[key] = (value, size, time.monotonic())
+        self.size_bytes += size
+
+    def _evict(self):
+        while self.size_bytes > self.max_bytes and self._entries:
+            key, (value, size, _) = self._entries.popitem(last=False)
+            self.size_bytes -= size
+            self.evictions += 1
+            self._spill(key, value)
+
+    def _expire(self):
+        deadline = time.monotonic() - self.ttl_seconds
+        while self._entries:
+            key, (_, size, accessed) = next(iter(self._entries.items()))
+            if accessed > deadline:
+                break
+            self._entries.popitem(last=False)
+            self.size_bytes -= size
+            self.expirations += 1
+            self._discard(key)
+
+    def _discard(self, key: str):
+        """Called when an entry expires or is removed."""
+
+    def _spill(self, key: str, value: Any):
+        """Called with each value evicted for the memory budget."""
+
+    def _load(self, key: str) -> Any:
+        """Called on a miss; returns a previously spilled value or None."""
+        return None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'size_bytes': self.size_bytes,
+                'max_bytes': self.max_bytes,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+
+def conversation_size(messages: List[Dict]) -> int:
+    """Approximate bytes held by a conversation history."""
+    return sum(len(message.get('content', '')) + 64 for message in messages)
+
+
+def parsed_log_size(parsed: ParsedLog) -> int:
+    """Bytes held by a parsed log: its columns plus the JSON summary."""
+    return parsed.nbytes + len(json.dumps(parsed.summary))
+
+
+class LogStore(BoundedStore):
+    """Store of parsed logs that spills evicted logs to disk.
+
+    Logs pushed out by the memory budget are written as ParsedLog packs
+    to ``spill_dir`` and memory-mapped back on their next access.  The TTL
+    applies to spilled logs too: an expired log is gone for good.
+    """
+
+    def __init__(self, max_bytes: int, ttl_seconds: float, spill_dir: str):
+        super().__init__(max_bytes, ttl_seconds, parsed_log_size)
+        self.spill_dir = spill_dir
+        self.spills = 0
+        self.reloads = 0
+        # key -> last access of logs that currently live only on disk
+        self._spilled: Dict[str, float] = {}
+        # keys with an up-to-date spill file (resident or not)
+        self._on_disk = set()
+        os.makedirs(spill_dir, exist_ok=True)
+        self._remove_stale_spills()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.spill_dir, f"{key}.pack")
+
+    def _remove_stale_spills(self):
+        """Delete spill files that outlived the TTL, e.g. from a dead process."""
+        deadline = time.time() - self.ttl_seconds
+        for name in os.listdir(self.spill_dir):
+            path = os.path.join(self.spill_dir, name)
+            try:
+                if os.path.getmtime(path) < deadline:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def _spill(self, key: str, value: ParsedLog):
+        if key not in self._on_disk or not os.path.exists(self._path(key)):
+            path = self._path(key)
+            tmp_path = f"{path}.tmp"
+            try:
+                with open(tmp_path, 'wb') as f:
+                    value.write(f)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                print(f"Warning: could not spill log {key}: {str(e)}")
+                return
+            self._on_disk.add(key)
+            self.spills += 1
+        self._spilled[key] = time.monotonic()
+
+    def _load(self, key: str) -> Optional[ParsedLog]:
+        if key not in self._spilled:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            os.utime(path)
+            parsed = ParsedLog.from_buffer(mapped)
+        except (OSError, ValueError) as e:
+            print(f"Warning: could not reload spilled log {key}: {str(e)}")
+            self._discard(key)
+            return None
+        del self._spilled[key]
+        self.reloads += 1
+        return parsed
+
+    def _discard(self, key: str):
+        self._spilled.pop(key, None)
+        if key in self._on_disk:
+            self._on_disk.discard(key)
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def _insert(self, key: str, value: ParsedLog):
+        if key in self._entries or key in self._spilled:
+            # a new value for the key invalidates its spill file
+            self._discard(key)
+        super()._insert(key, value)
+
+    def _expire(self):
+        super()._expire()
+        deadline = time.monotonic() - self.ttl_seconds
+        for key, accessed in list(self._spilled.items()):
+            if accessed <= deadline:
+                self.expirations += 1
+                self._discard(key)
+
+    def pop(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            if key in self._spilled:
+                value = self._load(key)
+                self._discard(key)
+                return default if value is None else value
+            return super().pop(key, default)
+
+    def stats(self) -> Dict:
+        stats = super().stats()
+        with self._lock:
+            stats.update({
+                'spilled': len(self._spilled),
+                'spills': self.spills,
+                'reloads': self.reloads,
+            })
+        return stats
+
+
+class SharedLogStore(BoundedStore):
+    """Log store shared by every API process on the host.
+
+    Each log is written once as a ParsedLog pack in ``directory`` (named
+    by content hash, so identical uploads share a file) and indexed in a
+    SQLite database next to it.  Any process can then serve any log id:
+    a miss in the local LRU looks the id up in the index and memory-maps
+    the pack, so the arrays are read zero-copy from the shared page cache.
+    ``max_bytes`` bounds the logs each process keeps mapped; the TTL
+    applies to the shared index.  A log already in ``parse_cache`` is
+    hard-linked from its cache entry rather than written again.
+    """
+
+    # Seconds between index writes (access times, purges) from one process
+    TOUCH_INTERVAL = 60
+
+    def __init__(self, max_bytes: int, ttl_seconds: float, directory: str,
+                 parse_cache: Optional[ParseCache] = None):
+        super().__init__(max_bytes, ttl_seconds, parsed_log_size)
+        self.directory = directory
+        self.parse_cache = parse_cache
+        self.links = 0
+        self.reloads = 0
+        self._touched: Dict[str, float] = {}
+        self._purged = 0.0
+        os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(
+            os.path.join(directory, 'index.sqlite'),
+            timeout=30,
+            isolation_level=None,
+            check_same_thread=False
+        )
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS logs ('
+            'log_id TEXT PRIMARY KEY, pack TEXT NOT NULL, accessed REAL NOT NULL)'
+        )
+        self._db.execute('CREATE INDEX IF NOT EXISTS logs_pack ON logs (pack)')
+        self._purge()
+
+    def _pack_path(self, pack: str) -> str:
+        return os.path.join(self.directory, pack)
+
+    def put(self, key: str, value: ParsedLog):
+        pack = f"{value.content_hash or key}.pack"
+        path = self._pack_path(pack)
+        # written ahead, outside the index's write lock
+        tmp_path = None if os.path.exists(path) else self._prepare(value, path)
+        with self._lock:
+            # the pack is checked and referenced in one transaction, so a
+            # purge in another process cannot remove it in between
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                if not os.path.exists(path):
+                    if tmp_path is None:
+                        tmp_path = self._prepare(value, path)
+                    os.replace(tmp_path, path)
+                    tmp_path = None
+                self._db.execute(
+                    'INSERT OR REPLACE INTO logs (log_id, pack, accessed) VALUES (?, ?, ?)',
+                    (key, pack, time.time())
+                )
+                self._db.execute('COMMIT')
+            except Exception:
+                self._db.execute('ROLLBACK')
+                raise
+            finally:
+                if tmp_path is not None:
+                    try:
+                        os.remove(tmp_path)
+                    except OSError:
+                        pass
+            self._touched[key] = time.monotonic()
+            super().put(key, value)
+
+    def _prepare(self, value: ParsedLog, path: str) -> str:
+        """Link or write the pack of ``value`` to a temporary file next to ``path``."""
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        if not self._link(value.content_hash, tmp_path):
+            with open(tmp_path, 'wb') as f:
+                value.write(f)
+        return tmp_path
+
+    def _link(self, content_hash: Optional[str], path: str) -> bool:
+        """Hard-link the parse-cache pack of a hash to ``path``, if there is one.
+
+        Packs are replaced, never rewritten, so both names stay valid when
+        the cache evicts its entry.  Fails (and the caller writes the pack)
+        across filesystems.
+        """
+        source = self.parse_cache.path(content_hash) if self.parse_cache and content_hash else None
+        if source is None:
+            return False
+        try:
+            os.link(source, path)
+        except OSError:
+            return False
+        self.links += 1
+        return True
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            value = super().get(key, default)
+            if value is not default and value is not None:
+                self._touch(key)
+            return value
+
+    def _interval(self) -> float:
+        return min(self.TOUCH_INTERVAL, self.ttl_seconds / 2)
+
+    def _touch(self, key: str):
+        """Record an access in the index so other processes keep the log."""
+        now = time.monotonic()
+        if now - self._touched.get(key, 0.0) < self._interval():
+            return
+        self._touched[key] = now
+        self._db.execute('UPDATE logs SET accessed = ? WHERE log_id = ?', (time.time(), key))
+
+    def _load(self, key: str) -> Optional[ParsedLog]:
+        row = self._db.execute(
+            'SELECT pack, accessed FROM logs WHERE log_id = ?', (key,)
+        ).fetchone()
+        if row is None or row[1] < time.time() - self.ttl_seconds:
+            return None
+        try:
+            with open(self._pack_path(row[0]), 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            parsed = ParsedLog.from_buffer(mapped)
+        except (OSError, ValueError) as e:
+            print(f"Warning: could not load shared log {key}: {str(e)}")
+            return None
+        self.reloads += 1
+        return parsed
+
+    def _discard(self, key: str):
+        # Local expiry only unmaps the log; the index has its own TTL
+        self._touched.pop(key, None)
+
+    def _expire(self):
+        super()._expire()
+        now = time.monotonic()
+        if now - self._purged >= self._interval():
+            self._purged = now
+            self._purge()
+
+    def _purge(self, log_id: Optional[str] = None):
+        """Drop expired (or the given) index rows and their unused packs."""
+        if log_id is not None:
+            where, args = 'log_id = ?', (log_id,)
+        else:
+            where, args = 'accessed < ?', (time.time() - self.ttl_seconds,)
+        self._db.execute('BEGIN IMMEDIATE')
+        try:
+            packs = {pack for (pack,) in self._db.execute(
+                f'SELECT pack FROM logs WHERE {where}', args
+            )}
+            if packs:
+                self._db.execute(f'DELETE FROM logs WHERE {where}', args)
+            for pack in packs:
+                in_use = self._db.execute(
+                    'SELECT 1 FROM logs WHERE pack = ? LIMIT 1', (pack,)
+                ).fetchone()
+                if in_use is None:
+                    try:
+                        os.remove(self._pack_path(pack))
+                    except OSError:
+                        pass
+            self._db.execute('COMMIT')
+        except Exception:
+            self._db.execute('ROLLBACK')
+            raise
+
+    def pop(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            value = super().pop(key, None)
+            if value is None:
+                value = self._load(key)
+            self._purge(key)
+            return default if value is None else value
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM logs').fetchone()[0]
+
+    def stats(self) -> Dict:
+        stats = super().stats()
+        with self._lock:
+            stats.update({
+                'shared_entries': len(self),
+                'reloads': self.reloads,
+                'linked_packs': self.links,
+            })
+        return stats
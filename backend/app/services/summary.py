@@ -0,0 +1,133 @@
+from typing import Dict, List, Optional
+import numpy as np
+from app.services.anomalies import AnomalyEngine
+from app.services.column_store import ColumnStore
+from app.services.intervals import gps_issue_intervals, repeat_intervals, state_intervals
+
+# Message types the summary is computed from
+SUMMARY_TYPES = ('GPS', 'BAT', 'MODE', 'ERR')
+
+
+def _same_event(a: Dict, b: Dict) -> bool:
+    skip = ('start', 'end', 'count')
+    return {k: v for k, v in a.items() if k not in skip} == {k: v for k, v in b.items() if k not in skip}
+
+
+class SummaryAggregator:
+    """Computes the flight summary online from decoded chunks of columns.
+
+    Plugs into ``IncrementalDecoder`` in place of a ``ColumnStore``: each
+    chunk of GPS, BAT and ERR records updates running extremes and
+    interval lists and is then dropped, so memory stays constant however
+    long the log.  Only MODE records, a handful per flight, are kept.
+    Every chunk also goes through the anomaly detectors, which keep only
+    the few samples their windows look back over.  ``summary`` returns
+    the same dict as ``LogParser`` would.
+    """
+
+    def __init__(self, anomalies: Optional[AnomalyEngine] = None):
+        self.max_altitude: Optional[float] = None
+        self.min_battery: Optional[float] = None
+        self.gps_issues: List[Dict] = []
+        self.critical_errors: List[Dict] = []
+        # last GPS issue interval if it runs up to the end of the previous chunk
+        self._open_gps_issue: Optional[Dict] = None
+        self._modes = ColumnStore()
+        self._anomalies = (anomalies or AnomalyEngine()).stream()
+        self._declared: Dict[str, List[str]] = {}
+
+    def declare(self, msg_type: str, fields: List[str], formats: Optional[str] = None):
+        self._declared.setdefault(msg_type, fields)
+        if msg_type == 'MODE':
+            self._modes.declare(msg_type, fields, formats)
+
+    def extend(self, msg_type: str, columns: Dict[str, np.ndarray]):
+        self._anomalies.extend(msg_type, columns)
+        if msg_type == 'GPS':
+            self._update_gps(columns)
+        elif msg_type == 'BAT':
+            volts = columns.get('Volt')
+            if volts is not None and volts.size:
+                low = float(volts.min())
+                self.min_battery = low if self.min_battery is None else min(self.min_battery, low)
+        elif msg_type == 'ERR':
+            self._update_errors(columns)
+        elif msg_type == 'MODE':
+            self._modes.extend(msg_type, columns)
+
+    def finalize(self) -> Dict:
+        return {}
+
+    def _update_gps(self, columns: Dict[str, np.ndarray]):
+        altitudes = columns.get('Alt')
+        if altitudes is not None and altitudes.size:
+            high = float(altitudes.max())
+            self.max_altitude = high if self.max_altitude is None else max(self.max_altitude, high)
+        status = columns.get('Status')
+        times = columns.get('TimeUS')
+        if status is None or times is None or not status.size:
+            return
+        intervals = gps_issue_intervals(times, status, columns.get('NSats'))
+        if self._open_gps_issue is not None:
+            if status[0] < 3:
+                # the interval continues across the chunk boundary
+                first, merged = intervals[0], self._open_gps_issue
+                merged.update(
+                    end=first['end'],
+                    samples=merged['samples'] + first['samples'],
+                    worst_status=min(merged['worst_status'], first['worst_status']),
+                    min_satellites=min(merged['min_satellites'], first['min_satellites']))
+                intervals[0] = merged
+            else:
+                self.gps_issues.append(self._open_gps_issue)
+            self._open_gps_issue = None
+        if status[-1] < 3:
+            self._open_gps_issue = intervals.pop()
+        self.gps_issues.extend(intervals)
+
+    def _update_errors(self, columns: Dict[str, np.ndarray]):
+        # ERR records are Subsys,ECode; an ECode of 0 means the error cleared
+        ecode = columns.get('ECode')
+        if ecode is None:
+            return
+        rows = np.flatnonzero(ecode != 0)
+        if not rows.size:
+            return
+        filtered = {field: values[rows] for field, values in columns.items()}
+        intervals = repeat_intervals(filtered['TimeUS'], filtered, 'TimeUS') \
+            if 'TimeUS' in filtered else []
+        if intervals and self.critical_errors and _same_event(self.critical_errors[-1], intervals[0]):
+            last, first = self.critical_errors[-1], intervals.pop(0)
+            last.update(end=first['end'], count=last['count'] + first['count'])
+        self.critical_errors.extend(intervals)
+
+    def summary(self, message_types: List[str], end_time: float) -> Dict:
+        """The summary once every chunk has been seen.
+
+        ``message_types`` lists every type in the log in order of first
+        appearance and ``end_time`` is its last timestamp.
+        """
+        gps_issues = list(self.gps_issues)
+        if self._open_gps_issue is not None:
+            gps_issues.append(self._open_gps_issue)
+        flight_time = 0.0
+        mode_changes = []
+        modes = self._modes.finalize().get('MODE')
+        if modes and 'TimeUS' in modes:
+            times = modes['TimeUS']
+            if times.size:
+                flight_time = float(times.max() - times.min()) / 1e6
+            order = np.argsort(times, kind='stable')
+            mode_changes = state_intervals(
+                times[order], {field: values[order] for field, values in modes.items()},
+                end_time, 'TimeUS')
+        return {
+            'flight_time': flight_time,
+            'max_altitude': self.max_altitude if self.max_altitude is not None else 0.0,
+            'min_battery': self.min_battery if self.min_battery is not None else 0.0,
+            'gps_issues': gps_issues,
+            'critical_errors': list(self.critical_errors),
+            'mode_changes': mode_changes,
+            'anomalies': self._anomalies.intervals(),
+            'message_types': list(message_types)
+        }
@@ -0,0 +1,47 @@
+from typing import AsyncIterator, Awaitable, Callable, Optional, Tuple
+import hashlib
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds the configured size limit."""
+
+
+async def iter_upload(file: UploadFile, chunk_size: int) -> AsyncIterator[bytes]:
+    """Yield an uploaded file in fixed-size chunks."""
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+async def save_stream(
+    chunks: AsyncIterator[bytes],
+    file_path: str,
+    max_size: int,
+    on_chunk: Optional[Callable[[bytes], Awaitable[None]]] = None
+) -> Tuple[int, str]:
+    """Write a stream of chunks to disk, enforcing ``max_size`` as it goes.
+
+    ``on_chunk`` is awaited with every chunk after it is written, so a
+    consumer can process the upload while it is still arriving.  Returns
+    the number of bytes written and their SHA-256 hex digest.  Each chunk
+    is written and hashed in a thread, off the event loop.
+    """
+    total = 0
+    digest = hashlib.sha256()
+    with open(file_path, "wb") as buffer:
+        def store(chunk: bytes):
+            buffer.write(chunk)
+            digest.update(chunk)
+
+        async for chunk in chunks:
+            total += len(chunk)
+            if total > max_size:
+                raise UploadTooLarge(f"Upload exceeds the {max_size} byte limit")
+            await run_in_threadpool(store, chunk)
+            if on_chunk is not None:
+                await on_chunk(chunk)
+    return total, digest.hexdigest()
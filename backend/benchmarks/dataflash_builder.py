@@ -0,0 +1,129 @@
+"""Helpers for writing DataFlash (.bin) logs, for the benchmarks and the tests."""
+import struct
+
+HEAD = bytes([0xA3, 0x95])
+FMT_TYPE = 0x80
+
+STRUCT_CODES = {
+    'a': '64s', 'b': 'b', 'B': 'B', 'h': 'h', 'H': 'H', 'i': 'i', 'I': 'I',
+    'f': 'f', 'n': '4s', 'N': '16s', 'Z': '64s', 'c': 'h', 'C': 'H',
+    'e': 'i', 'E': 'I', 'L': 'i', 'd': 'd', 'M': 'b', 'q': 'q', 'Q': 'Q',
+}
+
+# A subset of the ArduPilot message definitions
+FORMATS = {
+    'GPS': (130, 'QBBIHBcLLeffffB',
+            'TimeUS,I,Status,GMS,GWk,NSats,HDop,Lat,Lng,Alt,Spd,GCrs,VZ,Yaw,U'),
+    'BAT': (131, 'QBfffffcfB',
+            'TimeUS,Inst,Volt,VoltR,Curr,CurrTot,EnrgTot,Temp,Res,RemPct'),
+    'MODE': (132, 'QMBB', 'TimeUS,Mode,ModeNum,Rsn'),
+    'ERR': (133, 'QBB', 'TimeUS,Subsys,ECode'),
+    'EV': (134, 'QB', 'TimeUS,Id'),
+    'MSG': (135, 'QZ', 'TimeUS,Message'),
+    'PARM': (136, 'QNf', 'TimeUS,Name,Value'),
+    'IMU': (137, 'QBffffffIIfBBHH',
+            'TimeUS,I,GyrX,GyrY,GyrZ,AccX,AccY,AccZ,EG,EA,T,GH,AH,GHz,AHz'),
+    'VIBE': (138, 'QBfffI', 'TimeUS,IMU,VibeX,VibeY,VibeZ,Clip'),
+    'XKF4': (139, 'QBcccccfffHBIHb', 'TimeUS,C,SV,SP,SH,SM,SVT,errRP,OFN,OFE,FS,TS,SS,GPS,PI'),
+    'RCIN': (140, 'QHHHHHHHHHHHHHH', 'TimeUS,C1,C2,C3,C4,C5,C6,C7,C8,C9,C10,C11,C12,C13,C14'),
+}
+
+
+def _struct(fmt: str) -> struct.Struct:
+    return struct.Struct('<' + ''.join(STRUCT_CODES[c] for c in fmt))
+
+
+class DataFlashWriter:
+    """Builds a DataFlash log in memory, emitting FMT records on first use."""
+
+    def __init__(self, formats=None):
+        self.formats = dict(formats or FORMATS)
+        self.buffer = bytearray()
+        self._written = set()
+        self._fmt_struct = _struct('BBnNZ')
+        self.buffer += HEAD + bytes([FMT_TYPE]) + self._fmt_struct.pack(
+            FMT_TYPE, 89, b'FMT', b'BBnNZ', b'Type,Length,Name,Format,Columns')
+
+    def _write_fmt(self, name: str):
+        msg_id, fmt, columns = self.formats[name]
+        length = 3 + _struct(fmt).size
+        self.buffer += HEAD + bytes([FMT_TYPE]) + self._fmt_struct.pack(
+            msg_id, length, name.encode(), fmt.encode(), columns.encode())
+        self._written.add(name)
+
+    def declare(self, name: str):
+        """Emit the FMT record of a message type unless already written."""
+        if name not in self._written:
+            self._write_fmt(name)
+
+    def write(self, name: str, **values):
+        """Append one message; unspecified fields are zero."""
+        self.declare(name)
+        msg_id, fmt, columns = self.formats[name]
+        packed = []
+        for char, column in zip(fmt, columns.split(',')):
+            value = values.get(column, b'' if char in 'nNZa' else 0)
+            if isinstance(value, str):
+                value = value.encode()
+            if char in 'cCeE':
+                value = int(round(value * 100))
+            elif char == 'L':
+                value = int(round(value * 1e7))
+            packed.append(value)
+        self.buffer += HEAD + bytes([msg_id]) + _struct(fmt).pack(*packed)
+
+    def save(self, path: str) -> str:
+        with open(path, 'wb') as f:
+            f.write(bytes(self.buffer))
+        return path
+
+
+def build_flight_log(path: str, seconds: int = 60) -> str:
+    """Write a short synthetic flight with a GPS dropout and a few events."""
+    writer = DataFlashWriter()
+    writer.write('MSG', TimeUS=1000, Message='ArduCopter V4.5.0 (test)')
+    writer.write('PARM', TimeUS=1000, Name='BATT_LOW_VOLT', Value=10.5)
+    writer.write('MODE', TimeUS=2000, Mode=0, ModeNum=0, Rsn=1)
+    for step in range(seconds * 5):
+        t = 1000000 + step * 200000
+        lost = seconds * 2 <= step < seconds * 2 + 20
+        writer.write('GPS', TimeUS=t, I=0, Status=1 if lost else 3,
+                     GMS=300000000 + step * 200, GWk=2300, NSats=4 if lost else 12,
+                     HDop=0.8, Lat=-35.3632621 + step * 1e-6, Lng=149.1652374,
+                     Alt=584.0 + min(step, 100) * 0.5, Spd=3.0, GCrs=90.0, VZ=0.0)
+        writer.write('BAT', TimeUS=t + 100, Inst=0, Volt=max(9.0, 12.6 - step * 0.002),
+                     Curr=15.0, Temp=25.0, RemPct=max(0, 100 - step // 10))
+        writer.write('IMU', TimeUS=t + 50, AccZ=-9.8, GyrX=0.01, T=40.0)
+        if step == 30:
+            writer.write('MODE', TimeUS=t, Mode=5, ModeNum=5, Rsn=2)
+        if step == seconds * 2 + 1:
+            writer.write('ERR', TimeUS=t, Subsys=11, ECode=2)
+            writer.write('EV', TimeUS=t, Id=10)
+    writer.write('MODE', TimeUS=1000000 + seconds * 1000000, Mode=6, ModeNum=6, Rsn=2)
+    return writer.save(path)
+
+
+def build_anomalous_log(path: str) -> str:
+    """A 60 s log at 10 Hz with one anomaly of each kind, at known steps."""
+    writer = DataFlashWriter()
+    clips = 0
+    for step in range(600):
+        t = 1000000 + step * 100000
+        for imu in (0, 1):
+            if imu == 0 and step in (120, 121):
+                clips += 3
+            writer.write('VIBE', TimeUS=t, IMU=imu, VibeX=5.0, VibeY=5.0,
+                         VibeZ=45.0 if imu == 0 and 100 <= step < 150 else 8.0,
+                         Clip=clips if imu == 0 else 0)
+        writer.write('IMU', TimeUS=t + 10, I=0, AccZ=-156.0 if step == 200 else -9.8)
+        sagging = 300 <= step < 310
+        writer.write('BAT', TimeUS=t + 20, Inst=0, Volt=11.0 if sagging else 12.6,
+                     Curr=40.0 if sagging else 10.0)
+        writer.write('XKF4', TimeUS=t + 30, C=0, SV=1.5 if 400 <= step < 405 else 0.2, SP=0.1, SH=0.1)
+        lost = 500 <= step < 505
+        writer.write('GPS', TimeUS=t + 40, I=0, Status=1 if lost else 3,
+                     Alt=0.0 if lost else (110.0 if step == 450 else 100.0))
+        if not 540 <= step < 560:
+            writer.write('RCIN', TimeUS=t + 50, C1=1500, C2=1500,
+                         C3=900 if 520 <= step < 530 else 1500, C4=1500)
+    return writer.save(path)
@@ -0,0 +1,189 @@
+"""Generate realistic synthetic DataFlash logs for benchmarks.
+
+Writes a copter flight of the requested size with FMT, GPS, BAT, IMU,
+MODE and ERR records at typical ArduPilot logging rates, in time order.
+Records are built with NumPy a block of flight at a time, so even a
+1 GB log takes seconds and little memory::
+
+    python benchmarks/generate_log.py flight.bin --size-mb 100
+"""
+import argparse
+import os
+from typing import Dict, List, Tuple
+import numpy as np
+from dataflash_builder import FORMATS, HEAD, STRUCT_CODES, DataFlashWriter
+
+# Records per second of each regularly logged type
+RATES = {'IMU': 400, 'GPS': 10, 'BAT': 10}
+# IMU records alternate between this many sensors
+IMU_INSTANCES = 2
+# Mean seconds between mode changes, errors and GPS dropouts
+MODE_INTERVAL = 120
+ERR_INTERVAL = 600
+DROPOUT_INTERVAL = 900
+DROPOUT_SECONDS = (5, 20)
+# Seconds of flight per battery pack (voltage sawtooth)
+BATTERY_SECONDS = 1200
+# Seconds of flight generated per block
+BLOCK_SECONDS = 60
+
+COPTER_MODES = (0, 2, 3, 5, 6, 9)  # Stabilize, AltHold, Auto, Loiter, RTL, Land
+HOME = (-35.3632621, 149.1652374, 584.0)
+
+# Fields stored as scaled integers, by format character
+_SCALES = {'c': 100, 'C': 100, 'e': 100, 'E': 100, 'L': 1e7}
+
+
+def record_dtype(name: str) -> np.dtype:
+    """Packed dtype of a whole record (header included) of a builder type."""
+    msg_id, fmt, columns = FORMATS[name]
+    fields = [('head1', 'u1'), ('head2', 'u1'), ('msgid', 'u1')]
+    for char, column in zip(fmt, columns.split(',')):
+        code = STRUCT_CODES[char]
+        fields.append((column, 'S' + code[:-1] if code.endswith('s') else '<' + code))
+    return np.dtype(fields)
+
+
+def bytes_per_second() -> float:
+    """Average log growth of a generated flight."""
+    size = sum(rate * record_dtype(name).itemsize for name, rate in RATES.items())
+    return size + record_dtype('MODE').itemsize / MODE_INTERVAL + record_dtype('ERR').itemsize / ERR_INTERVAL
+
+
+def _records(name: str, columns: Dict[str, np.ndarray]) -> np.ndarray:
+    """Pack column values into raw records, one row of bytes each."""
+    msg_id, fmt, names = FORMATS[name]
+    count = len(columns['TimeUS'])
+    records = np.zeros(count, dtype=record_dtype(name))
+    records['head1'], records['head2'], records['msgid'] = HEAD[0], HEAD[1], msg_id
+    for char, column in zip(fmt, names.split(',')):
+        if column in columns:
+            values = columns[column]
+            if char in _SCALES:
+                values = np.round(np.asarray(values) * _SCALES[char])
+            records[column] = values
+    return records.view(np.uint8).reshape(count, records.dtype.itemsize)
+
+
+def _interleave(parts: List[Tuple[np.ndarray, np.ndarray]]) -> np.ndarray:
+    """Merge the records of several types into one buffer, ordered by time."""
+    times = np.concatenate([part_times for part_times, _ in parts])
+    lengths = np.concatenate([np.full(len(t), rows.shape[1]) for t, rows in parts])
+    order = np.argsort(times, kind='stable')
+    starts = np.empty(len(order), dtype=np.int64)
+    starts[order] = np.cumsum(lengths[order]) - lengths[order]
+    out = np.empty(int(lengths.sum()), dtype=np.uint8)
+    position = 0
+    for part_times, rows in parts:
+        begin = starts[position:position + len(part_times)]
+        out[begin[:, None] + np.arange(rows.shape[1])] = rows
+        position += len(part_times)
+    return out
+
+
+def _sample_times(start: float, seconds: float, rate: float, offset_us: int) -> np.ndarray:
+    count = int(seconds * rate)
+    return (start * 1e6 + offset_us + np.arange(count) * (1e6 / rate)).astype(np.int64)
+
+
+def _events(rng: np.random.Generator, start: float, seconds: float, interval: float) -> np.ndarray:
+    """Poisson-distributed event times (microseconds) within a block."""
+    count = rng.poisson(seconds / interval)
+    return np.sort((start + rng.uniform(0, seconds, count)) * 1e6).astype(np.int64)
+
+
+def generate_block(rng: np.random.Generator, start: float, seconds: float) -> np.ndarray:
+    """Records for ``seconds`` of flight starting ``start`` seconds in."""
+    parts = []
+
+    gps_t = _sample_times(start, seconds, RATES['GPS'], 0)
+    t = gps_t / 1e6
+    climb = np.minimum(t * 2.0, 80.0)
+    heading = 2 * np.pi * t / 600.0
+    status = np.full(len(t), 3)
+    sats = rng.integers(12, 19, len(t))
+    hdop = rng.uniform(0.6, 1.0, len(t))
+    if rng.random() < seconds / DROPOUT_INTERVAL:
+        lost_from = rng.uniform(start, start + seconds)
+        lost = (t >= lost_from) & (t < lost_from + rng.uniform(*DROPOUT_SECONDS))
+        status[lost] = rng.integers(0, 2, int(lost.sum()))
+        sats[lost] = rng.integers(3, 6, int(lost.sum()))
+        hdop[lost] = rng.uniform(3.0, 9.0, int(lost.sum()))
+    parts.append((gps_t, _records('GPS', {
+        'TimeUS': gps_t, 'I': 0, 'Status': status,
+        'GMS': (300000000 + gps_t // 1000) % 604800000, 'GWk': 2300,
+        'NSats': sats, 'HDop': hdop,
+        'Lat': HOME[0] + 0.0045 * np.sin(heading), 'Lng': HOME[1] + 0.0055 * np.cos(heading),
+        'Alt': HOME[2] + climb + 10.0 * np.sin(t / 120.0) + rng.normal(0, 0.3, len(t)),
+        'Spd': 5.0 + rng.normal(0, 0.5, len(t)), 'GCrs': np.degrees(heading) % 360,
+        'VZ': rng.normal(0, 0.4, len(t)), 'U': 1,
+    })))
+
+    bat_t = _sample_times(start, seconds, RATES['BAT'], 100)
+    t = bat_t / 1e6
+    used = (t % BATTERY_SECONDS) / BATTERY_SECONDS
+    current = 15.0 + rng.normal(0, 3.0, len(t))
+    parts.append((bat_t, _records('BAT', {
+        'TimeUS': bat_t, 'Inst': 0,
+        'Volt': 16.8 - 2.8 * used - 0.02 * (current - 15.0), 'VoltR': 16.8 - 2.8 * used,
+        'Curr': current, 'CurrTot': used * 5000.0, 'EnrgTot': used * 80.0,
+        'Temp': 30.0 + 10.0 * used, 'RemPct': np.round(100 * (1 - used)),
+    })))
+
+    imu_t = _sample_times(start, seconds, RATES['IMU'], 50)
+    count = len(imu_t)
+    parts.append((imu_t, _records('IMU', {
+        'TimeUS': imu_t, 'I': np.arange(count) % IMU_INSTANCES,
+        'GyrX': rng.normal(0, 0.02, count), 'GyrY': rng.normal(0, 0.02, count),
+        'GyrZ': rng.normal(0, 0.02, count), 'AccX': rng.normal(0, 0.3, count),
+        'AccY': rng.normal(0, 0.3, count), 'AccZ': -9.8 + rng.normal(0, 0.3, count),
+        'T': 40.0, 'GH': 1, 'AH': 1, 'GHz': RATES['IMU'], 'AHz': RATES['IMU'],
+    })))
+
+    mode_t = _events(rng, start, seconds, MODE_INTERVAL)
+    modes = rng.choice(COPTER_MODES, len(mode_t))
+    parts.append((mode_t, _records('MODE', {
+        'TimeUS': mode_t, 'Mode': modes, 'ModeNum': modes, 'Rsn': rng.integers(1, 4, len(mode_t)),
+    })))
+
+    err_t = _events(rng, start, seconds, ERR_INTERVAL)
+    parts.append((err_t, _records('ERR', {
+        'TimeUS': err_t, 'Subsys': rng.choice((5, 6, 11, 16), len(err_t)),
+        'ECode': rng.integers(1, 3, len(err_t)),
+    })))
+    return _interleave(parts)
+
+
+def generate_log(path: str, size_mb: float, seed: int = 0) -> str:
+    """Write a synthetic flight log of about ``size_mb`` megabytes to ``path``."""
+    seconds = size_mb * 1e6 / bytes_per_second()
+    writer = DataFlashWriter()
+    writer.write('MSG', TimeUS=1000, Message='ArduCopter V4.5.0 (benchmark)')
+    writer.write('PARM', TimeUS=1000, Name='BATT_LOW_VOLT', Value=14.0)
+    for name in ('GPS', 'BAT', 'IMU', 'MODE', 'ERR'):
+        writer.declare(name)
+    writer.write('MODE', TimeUS=2000, Mode=0, ModeNum=0, Rsn=1)
+    with open(path, 'wb') as f:
+        f.write(bytes(writer.buffer))
+        block = 0
+        while block * BLOCK_SECONDS < seconds:
+            start = 1.0 + block * BLOCK_SECONDS
+            length = min(BLOCK_SECONDS, seconds - block * BLOCK_SECONDS)
+            rng = np.random.default_rng((seed, block))
+            f.write(generate_block(rng, start, length).tobytes())
+            block += 1
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path')
+    parser.add_argument('--size-mb', type=float, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    generate_log(args.path, args.size_mb, args.seed)
+    print(f"{os.path.getsize(args.path) / 1e6:.1f} MB written to {args.path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""Benchmark parallel decoding of one large DataFlash log.
+
+Builds a synthetic log (or uses ``--log``), then times ``ParallelDecoder``
+for each worker count and reports the speedup over one worker::
+
+    python benchmarks/parallel_decode.py --seconds 100000 --workers 1 2 4 8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path[:0] = [os.path.join(os.path.dirname(__file__), '..')]
+
+from app.services import parallel_decode  # noqa: E402
+from app.services.parallel_decode import ParallelDecoder  # noqa: E402
+from dataflash_builder import build_flight_log  # noqa: E402
+
+
+def best_time(log: str, workers: int, repeat: int) -> float:
+    decoder = ParallelDecoder(log, workers)
+    decoder.decode()  # start the worker processes
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        decoder.decode()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--log', help='log to decode instead of a synthetic one')
+    parser.add_argument('--seconds', type=int, default=100000, help='synthetic flight length')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    # decode in parallel whatever the size, so small logs show the overhead
+    parallel_decode.PARALLEL_MIN_BYTES = 0
+    with tempfile.TemporaryDirectory() as directory:
+        log = args.log or build_flight_log(os.path.join(directory, 'bench.bin'), args.seconds)
+        size = os.path.getsize(log) / 1e6
+        print(f"{size:.1f} MB log, {os.cpu_count()} CPUs")
+        print(f"{'workers':>8} {'seconds':>8} {'MB/s':>8} {'speedup':>8}")
+        baseline = None
+        for workers in args.workers:
+            elapsed = best_time(log, workers, args.repeat)
+            baseline = baseline or elapsed
+            print(f"{workers:>8} {elapsed:>8.3f} {size / elapsed:>8.1f} {baseline / elapsed:>8.2f}")
+        parallel_decode.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,239 @@
+"""Ingestion and chat benchmark suite.
+
+For each log size, generates a realistic synthetic log (see
+``generate_log.py``) and measures:
+
+* ``LogParser.parse`` time, throughput and peak RSS, and the same for a
+  summary-only parse (``LogParser.summarize``), each run in a fresh
+  process so peak RSS is that of one parse;
+* the cost of the anomaly detectors: both parses again with every
+  detector disabled, and the overhead of the detectors over those;
+* end-to-end ``/api/upload`` latency and ``/api/chat`` latency through the
+  app, with the stub LLM backend and the parse and response caches off.
+
+Results are written as JSON (``--output``, default stdout) with the
+environment they were measured in; ``--compare`` prints the change of
+every timing against an earlier results file::
+
+    python benchmarks/suite.py --sizes 1 10 100 1000 --output before.json
+    python benchmarks/suite.py --sizes 1 10 100 1000 --compare before.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Dict, List, Optional
+
+sys.path[:0] = [os.path.join(os.path.dirname(__file__), '..')]
+
+from generate_log import generate_log  # noqa: E402
+
+# Questions sent to /api/chat: one per tool the stub backend calls, plus
+# one answered without tools
+CHAT_QUESTIONS = [
+    "What was the highest altitude reached?",
+    "Were there any GPS issues?",
+    "List the critical errors.",
+    "When did the flight mode change?",
+    "What was the minimum battery voltage?",
+    "How long was the flight time?",
+    "Summarize the flight.",
+]
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def measure_parse(path: str, mode: str, anomalies: bool = True) -> Dict:
+    """Worker: time one parse of ``path`` (``parse`` or ``summarize``).
+
+    ``anomalies=False`` disables every anomaly detector.
+    """
+    from app.services.anomalies import DETECTORS, AnomalyEngine
+    from app.services.log_parser import LogParser
+    baseline = _peak_rss_mb()
+    engine = AnomalyEngine(None if anomalies else {name: {'enabled': False} for name in DETECTORS})
+    parser = LogParser(path, anomalies=engine)
+    start = time.perf_counter()
+    getattr(parser, mode)()
+    seconds = time.perf_counter() - start
+    records = sum(len(next(iter(columns.values()), ())) for columns in parser.data.values())
+    return {'seconds': seconds, 'baseline_rss_mb': baseline,
+            'peak_rss_mb': _peak_rss_mb(), 'records': records}
+
+
+def _isolated(func, *args):
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+        return executor.submit(func, *args).result()
+
+
+def _timings(seconds: List[float]) -> Dict:
+    return {
+        'min_seconds': round(min(seconds), 6),
+        'median_seconds': round(statistics.median(seconds), 6),
+        'mean_seconds': round(statistics.fmean(seconds), 6),
+        'p95_seconds': round(sorted(seconds)[max(0, -(-len(seconds) * 95 // 100) - 1)], 6),
+        'runs': len(seconds),
+    }
+
+
+def bench_parse(path: str, mode: str, repeat: int, anomalies: bool = True) -> Dict:
+    runs = [_isolated(measure_parse, path, mode, anomalies) for _ in range(repeat)]
+    megabytes = os.path.getsize(path) / 1e6
+    best = min(run['seconds'] for run in runs)
+    result = _timings([run['seconds'] for run in runs])
+    result.update(
+        mb_per_second=round(megabytes / best, 2),
+        peak_rss_mb=round(max(run['peak_rss_mb'] for run in runs), 1),
+        baseline_rss_mb=round(min(run['baseline_rss_mb'] for run in runs), 1),
+    )
+    if runs[0]['records']:
+        result['records'] = runs[0]['records']
+        result['records_per_second'] = round(runs[0]['records'] / best)
+    return result
+
+
+def anomaly_overhead(benches: Dict) -> Dict:
+    """Extra median time of each parse mode with the anomaly detectors on."""
+    return {
+        mode: round(benches[mode]['median_seconds'] / benches[f'{mode}_no_anomalies']['median_seconds'] - 1, 4)
+        for mode in ('parse', 'summary')
+    }
+
+
+def bench_api(client, path: str, repeat: int) -> Dict:
+    """Upload ``path`` ``repeat`` times, then ask every chat question ``repeat`` times."""
+    uploads = []
+    log_id = None
+    for _ in range(repeat):
+        with open(path, 'rb') as f:
+            start = time.perf_counter()
+            response = client.post('/api/upload', files={'file': (os.path.basename(path), f)})
+            uploads.append(time.perf_counter() - start)
+        response.raise_for_status()
+        log_id = response.json()['log_id']
+    chats = []
+    for _ in range(repeat):
+        for question in CHAT_QUESTIONS:
+            start = time.perf_counter()
+            response = client.post(f'/api/chat/{log_id}', json={'message': question})
+            chats.append(time.perf_counter() - start)
+            response.raise_for_status()
+    return {'upload': _timings(uploads), 'chat': _timings(chats)}
+
+
+def environment() -> Dict:
+    import numpy
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': numpy.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def compare(results: Dict, baseline: Dict) -> List[str]:
+    """Lines giving the change of each median timing against ``baseline``."""
+    lines = []
+    for size, benches in results['sizes'].items():
+        for name, result in benches.items():
+            before = baseline.get('sizes', {}).get(size, {}).get(name)
+            if not before or 'median_seconds' not in before:
+                continue
+            change = result['median_seconds'] / before['median_seconds'] - 1
+            lines.append(f"{size:>8} MB {name:<10} {before['median_seconds']:>10.4f}s "
+                         f"-> {result['median_seconds']:>10.4f}s {change:>+8.1%}")
+    return lines
+
+
+def _configure_app(directory: str, max_upload: int):
+    # before the app (and its settings) are imported
+    os.environ.update({
+        'LLM_BACKEND': 'stub',
+        'GEMINI_API_KEY': os.environ.get('GEMINI_API_KEY', 'benchmark'),
+        'UPLOAD_DIR': os.path.join(directory, 'uploads'),
+        'PARSE_CACHE_MAX_BYTES': '0',
+        'RESPONSE_CACHE_MAX_BYTES': '0',
+        'LOG_STORE_DIR': os.path.join(directory, 'logs'),
+        'LOG_SPILL_DIR': os.path.join(directory, 'spill'),
+        'FLEET_INDEX_PATH': os.path.join(directory, 'fleet.sqlite'),
+        'JOB_STORE_PATH': os.path.join(directory, 'jobs.sqlite'),
+        'MAX_UPLOAD_SIZE': str(max_upload),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=float, nargs='+', default=[1, 10, 100],
+                        help='log sizes in MB (up to 1000)')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', help='keep generated logs here and reuse them')
+    parser.add_argument('--skip-api', action='store_true', help='only benchmark the parser')
+    parser.add_argument('--output', default='-', help='JSON results file (- for stdout)')
+    parser.add_argument('--compare', help='earlier results file to compare against')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        data_dir = args.data_dir or directory
+        os.makedirs(data_dir, exist_ok=True)
+        logs = {}
+        for size in args.sizes:
+            path = os.path.join(data_dir, f'synthetic-{size:g}mb-seed{args.seed}.bin')
+            if not os.path.exists(path):
+                print(f"generating {path}", file=sys.stderr)
+                generate_log(path, size, args.seed)
+            logs[f'{size:g}'] = path
+
+        results = {'environment': environment(), 'sizes': {}}
+        for size, path in logs.items():
+            print(f"parsing {size} MB", file=sys.stderr)
+            benches = results['sizes'][size] = {
+                'parse': bench_parse(path, 'parse', args.repeat),
+                'summary': bench_parse(path, 'summarize', args.repeat),
+                'parse_no_anomalies': bench_parse(path, 'parse', args.repeat, anomalies=False),
+                'summary_no_anomalies': bench_parse(path, 'summarize', args.repeat, anomalies=False),
+            }
+            benches['anomaly_overhead'] = anomaly_overhead(benches)
+
+        if not args.skip_api:
+            _configure_app(directory, int(max(args.sizes) * 1e6) + 1024 * 1024)
+            from fastapi.testclient import TestClient
+            from app.main import app
+            with TestClient(app) as client:
+                for size, path in logs.items():
+                    print(f"uploading and chatting about {size} MB", file=sys.stderr)
+                    results['sizes'][size].update(bench_api(client, path, args.repeat))
+
+    text = json.dumps(results, indent=2)
+    if args.output == '-':
+        print(text)
+    else:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    if args.compare:
+        with open(args.compare) as f:
+            print('\n'.join(compare(results, json.load(f))), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
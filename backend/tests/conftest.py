@@ -1,7 +1,23 @@
+import os
+import sys
+import tempfile
+
+# Keep the parsed-log cache of the test session out of the working tree
+os.environ.setdefault("PARSE_CACHE_DIR", tempfile.mkdtemp(prefix="parse_cache_"))
+os.environ.setdefault("LOG_SPILL_DIR", tempfile.mkdtemp(prefix="log_spill_"))
+os.environ.setdefault("LOG_STORE_DIR", tempfile.mkdtemp(prefix="log_store_"))
+os.environ.setdefault("JOB_STORE_PATH", os.path.join(tempfile.mkdtemp(prefix="jobs_"), "jobs.sqlite"))
+os.environ.setdefault("FLEET_INDEX_PATH", os.path.join(tempfile.mkdtemp(prefix="fleet_"), "fleet.sqlite"))
+# Answer chat requests locally instead of calling Gemini
+os.environ.setdefault("LLM_BACKEND", "stub")
+
 import pytest
 from fastapi.testclient import TestClient
 from app.main import app
-import os
+
+# The DataFlash log builder is shared with the benchmarks
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+from dataflash_builder import build_flight_log  # noqa: E402
 import shutil
 
 @pytest.fixture
@@ -26,4 +42,9 @@ def sample_bin_file():
     test_file = os.path.join(test_dir, "test.bin")
     with open(test_file, "wb") as f:
         f.write(b"\x00" * 100)
-    return test_file 
\ No newline at end of file
+    return test_file 
+
+@pytest.fixture
+def flight_log(tmp_path):
+    """Create a synthetic DataFlash log with GPS, battery and event records."""
+    return build_flight_log(str(tmp_path / "flight.bin"))
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+from app.services.anomalies import AnomalyEngine, detector_params
+from app.services.log_parser import LogParser
+from dataflash_builder import build_anomalous_log
+
+
+def test_detectors_find_each_anomaly(tmp_path):
+    """Test that every detector reports its anomaly, as one compact interval."""
+    summary = LogParser(build_anomalous_log(str(tmp_path / 'anomalies.bin'))).parse()
+    found = {item['detector']: item for item in summary['anomalies']}
+    assert sorted(found) == sorted([
+        'vibration', 'clipping', 'accel_saturation', 'battery_sag',
+        'ekf_variance', 'altitude_jump', 'rc_failsafe', 'rc_gap',
+    ])
+    assert len(summary['anomalies']) == len(found)
+
+    vibration = found['vibration']
+    assert (vibration['source'], vibration['instance']) == ('VIBE', 0)
+    assert vibration['start'] == 1000000 + 105 * 100000  # once the rolling mean crosses 30
+    assert vibration['peak'] == pytest.approx(45.0)
+    assert found['clipping']['samples'] == 2
+    assert found['accel_saturation']['peak'] == pytest.approx(156.0)
+    assert found['battery_sag']['samples'] == 10
+    assert found['battery_sag']['peak'] == pytest.approx(1.6, abs=1e-3)
+    assert found['ekf_variance']['samples'] == 5
+    # the jump up and back down; the GPS dropout to 0 m is not a jump
+    assert found['altitude_jump']['samples'] == 2
+    assert found['rc_failsafe']['peak'] == 900
+    gap = found['rc_gap']
+    assert (gap['start'], gap['end']) == (1000000 + 539 * 100000 + 50, 1000000 + 560 * 100000 + 50)
+    assert [item['start'] for item in summary['anomalies']] == sorted(
+        item['start'] for item in summary['anomalies'])
+
+
+def test_summary_only_parse_finds_the_same_anomalies(tmp_path, monkeypatch):
+    """Test that detectors fed in small chunks match the pass over the whole log."""
+    from app.services import log_parser
+    path = build_anomalous_log(str(tmp_path / 'anomalies.bin'))
+    expected = LogParser(path).parse()
+    monkeypatch.setattr(log_parser, "SUMMARY_CHUNK_SIZE", 997)
+    assert LogParser(path, anomalies=AnomalyEngine({'accel_saturation': {'summary': True}})).summarize() == expected
+
+    # the full-rate IMU detector stays out of summary-only parses by default
+    summary = LogParser(path).summarize()
+    assert summary['anomalies'] == [item for item in expected['anomalies']
+                                    if item['detector'] != 'accel_saturation']
+    assert len(summary['anomalies']) == len(expected['anomalies']) - 1
+
+
+def test_detector_configuration(tmp_path):
+    """Test overriding, disabling and validating detector parameters."""
+    path = build_anomalous_log(str(tmp_path / 'anomalies.bin'))
+    engine = AnomalyEngine({'vibration': {'threshold': 50.0}, 'rc_gap': {'enabled': False},
+                            'battery_sag': {'min_samples': 20}})
+    assert 'rc_gap' not in engine.params
+    assert engine.fingerprint != AnomalyEngine().fingerprint
+    detectors = {item['detector'] for item in LogParser(path, anomalies=engine).parse()['anomalies']}
+    assert not detectors & {'vibration', 'rc_gap', 'battery_sag'}
+    assert 'rc_failsafe' in detectors
+
+    with pytest.raises(ValueError):
+        detector_params({'wobble': {}})
+    with pytest.raises(ValueError):
+        detector_params({'vibration': {'treshold': 10}})
+
+
+def test_rolling_windows_span_chunks():
+    """Test that a window straddling chunks sees the samples of the previous chunk."""
+    values = np.array([0, 0, 0, 40, 40, 40, 0, 0], dtype=np.float32)
+    times = np.arange(len(values), dtype=np.uint64) * 1000000
+    columns = {'TimeUS': times, 'IMU': np.zeros(len(values), dtype=np.uint8),
+               'VibeX': values, 'VibeY': values, 'VibeZ': values}
+    engine = AnomalyEngine({'vibration': {'window': 3, 'threshold': 20.0, 'merge_gap': 0}})
+    whole = engine.detect({'VIBE': columns})
+    stream = engine.stream()
+    for start in range(0, len(values), 3):
+        stream.extend('VIBE', {field: column[start:start + 3] for field, column in columns.items()})
+    assert stream.intervals() == whole
+    assert [(item['start'], item['end'], item['samples']) for item in whole] == [
+        (4000000, 6000000, 3)
+    ]
+
+
+def test_anomaly_tool(tmp_path):
+    """Test the chatbot tool over the anomaly intervals of the summary."""
+    from app.services.flight_tools import FlightTools
+    from app.services.parsed_log import ParsedLog
+    parser = LogParser(build_anomalous_log(str(tmp_path / 'anomalies.bin')))
+    tools = FlightTools(ParsedLog(parser.parse(), parser.data))
+    assert tools.call('get_anomalies')['total'] == 8
+    sag = tools.call('get_anomalies', {'detector': 'battery_sag'})
+    assert sag['total'] == 1
+    assert sag['items'][0]['start'] == 31.0  # seconds since boot
+    assert tools.call('get_anomalies', {'start': 0, 'end': 10})['total'] == 0
+    assert 'error' in tools.call('get_anomalies', {'detector': 'wobble'})
@@ -83,4 +83,433 @@ def test_clear_chat(client, sample_bin_file):
         params={"conversation_id": conversation_id}
     )
     assert response.status_code == 200
-    assert response.json()["message"] == "Chat history cleared successfully" 
\ No newline at end of file
+    assert response.json()["message"] == "Chat history cleared successfully" 
+def test_upload_when_ingestion_queue_full(client, sample_bin_file, monkeypatch, tmp_path):
+    """Test that uploads are shed with 503 when the parse queue is full."""
+    from app.api import routes
+    from app.services.ingestion import IngestionPool
+    from app.services.parse_cache import ParseCache
+    monkeypatch.setattr(routes, "ingestion_pool", IngestionPool(max_workers=0, max_pending=0))
+    monkeypatch.setattr(routes, "parse_cache", ParseCache(str(tmp_path), 0))
+    with open(sample_bin_file, "rb") as f:
+        response = client.post(
+            "/api/upload",
+            files={"file": ("test.bin", f, "application/octet-stream")}
+        )
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "5"
+
+def test_upload_too_large(client, sample_bin_file, monkeypatch):
+    """Test that the size limit is enforced while streaming."""
+    from app.api import routes
+    monkeypatch.setattr(routes.settings, "MAX_UPLOAD_SIZE", 50)
+    monkeypatch.setattr(routes.settings, "UPLOAD_CHUNK_SIZE", 16)
+    with open(sample_bin_file, "rb") as f:
+        response = client.post(
+            "/api/upload",
+            files={"file": ("test.bin", f, "application/octet-stream")}
+        )
+    assert response.status_code == 413
+
+def test_upload_stream_incremental(client, flight_log, monkeypatch):
+    """Test parsing a raw-body upload while it is received."""
+    from app.api import routes
+    from app.services.log_parser import LogParser
+    monkeypatch.setattr(routes.settings, "INCREMENTAL_PARSE", True)
+    with open(flight_log, "rb") as f:
+        content = f.read()
+    chunks = (content[i:i + 1000] for i in range(0, len(content), 1000))
+    response = client.post("/api/upload/stream", params={"filename": "flight.bin"}, content=chunks)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["summary"] == LogParser(flight_log).parse()
+    assert not os.path.exists(os.path.join(routes.settings.UPLOAD_DIR, f"{data['log_id']}.bin"))
+
+def test_reupload_is_served_from_cache(client, flight_log, monkeypatch, tmp_path):
+    """Test that uploading the same log twice skips the second parse."""
+    from app.api import routes
+    from app.services.parse_cache import ParseCache
+    monkeypatch.setattr(routes, "parse_cache", ParseCache(str(tmp_path / "cache"), 10 ** 9))
+    def upload():
+        with open(flight_log, "rb") as f:
+            return client.post(
+                "/api/upload",
+                files={"file": ("flight.bin", f, "application/octet-stream")}
+            ).json()
+    first = upload()
+    second = upload()
+    stats = client.get("/api/stats").json()["parse_cache"]
+    assert first["cached"] is False
+    assert second["cached"] is True
+    assert second["log_id"] != first["log_id"]
+    assert second["summary"] == first["summary"]
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+def test_incremental_reupload_is_served_from_cache(client, flight_log, monkeypatch, tmp_path):
+    """Test that an incremental re-upload returns the cached parse and drops its own."""
+    from app.api import routes
+    from app.services.log_parser import LogParser
+    from app.services.parse_cache import ParseCache
+    monkeypatch.setattr(routes.settings, "INCREMENTAL_PARSE", True)
+    monkeypatch.setattr(routes, "parse_cache", ParseCache(str(tmp_path / "cache"), 10 ** 9))
+    finished, discarded = [], []
+    finish, discard = LogParser.finish, LogParser.discard
+    monkeypatch.setattr(LogParser, "finish", lambda self: finished.append(self) or finish(self))
+    monkeypatch.setattr(LogParser, "discard", lambda self: discarded.append(self) or discard(self))
+    with open(flight_log, "rb") as f:
+        content = f.read()
+    first = client.post("/api/upload/stream", params={"filename": "flight.bin"}, content=content).json()
+    second = client.post("/api/upload/stream", params={"filename": "flight.bin"}, content=content).json()
+    assert (first["cached"], second["cached"]) == (False, True)
+    assert second["summary"] == first["summary"]
+    assert len(finished) == len(discarded) == 1
+    assert discarded[0].data == {}
+
+def test_chat_stream(client, sample_bin_file, monkeypatch):
+    """Test streaming a chat answer over Server-Sent Events."""
+    from app.api import routes
+    from app.services.response_cache import ResponseCache
+    # Earlier tests may have cached an answer for this log and question
+    monkeypatch.setattr(routes.chatbot, "responses", ResponseCache(0, 60))
+    with open(sample_bin_file, "rb") as f:
+        upload_response = client.post(
+            "/api/upload",
+            files={"file": ("test.bin", f, "application/octet-stream")}
+        )
+    log_id = upload_response.json()["log_id"]
+    
+    response = client.post(
+        f"/api/chat/{log_id}/stream",
+        json={"message": "What was the max altitude?"}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = []
+    for block in response.text.strip().split("\n\n"):
+        event, data = block.split("\n")
+        events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    assert events[0][0] == "start"
+    assert events[-1][0] == "done"
+    tokens = [data["text"] for event, data in events if event == "token"]
+    assert len(tokens) > 1
+    answer = "".join(tokens)
+    assert answer.startswith("Stub answer to: What was the max altitude? [get_max_altitude:")
+    
+    history = routes.chatbot.conversations.get(events[0][1]["conversation_id"])
+    assert history[-1] == {"role": "assistant", "content": answer}
+
+def test_gps_issue_samples_are_paginated(client, flight_log):
+    """Test paging through the GPS samples behind the summary intervals."""
+    with open(flight_log, "rb") as f:
+        upload = client.post(
+            "/api/upload",
+            files={"file": ("flight.bin", f, "application/octet-stream")}
+        ).json()
+    assert len(upload["summary"]["gps_issues"]) == 1
+    assert upload["summary"]["gps_issues"][0]["samples"] == 20
+    
+    page = client.get(
+        f"/api/logs/{upload['log_id']}/gps_issues",
+        params={"offset": 15, "limit": 10}
+    ).json()
+    assert page["total"] == 20
+    assert len(page["items"]) == 5
+    assert page["items"][-1]["time"] == upload["summary"]["gps_issues"][0]["end"]
+    assert client.get(f"/api/logs/{upload['log_id']}/gps_issues", params={"limit": 0}).status_code == 400
+
+def test_summary_only_upload(client, sample_bin_file, monkeypatch, tmp_path):
+    """Test that the summary endpoint matches the full upload without storing the log."""
+    from app.api import routes
+    from app.services.ingestion import IngestionPool
+    from app.services.parse_cache import ParseCache
+    monkeypatch.setattr(routes, "ingestion_pool", IngestionPool(max_workers=0, max_pending=2))
+    monkeypatch.setattr(routes, "parse_cache", ParseCache(str(tmp_path), 0))
+    stored = len(routes.flight_data_store)
+    with open(sample_bin_file, "rb") as f:
+        summary = client.post(
+            "/api/summary",
+            files={"file": ("test.bin", f, "application/octet-stream")}
+        ).json()
+    with open(sample_bin_file, "rb") as f:
+        upload = client.post(
+            "/api/upload",
+            files={"file": ("test.bin", f, "application/octet-stream")}
+        ).json()
+    assert summary["summary"] == upload["summary"]
+    assert len(routes.flight_data_store) == stored + 1
+
+def test_summary_anomalies_do_not_depend_on_the_cache(client, monkeypatch, tmp_path):
+    """Test that /summary reports the same anomalies whether or not the log is cached."""
+    from app.api import routes
+    from app.services.ingestion import IngestionPool
+    from app.services.parse_cache import ParseCache
+    from dataflash_builder import build_anomalous_log
+    monkeypatch.setattr(routes, "ingestion_pool", IngestionPool(max_workers=0, max_pending=2))
+    monkeypatch.setattr(routes, "parse_cache", ParseCache(str(tmp_path / "cache"), 10 ** 9))
+    log = build_anomalous_log(str(tmp_path / "anomalies.bin"))
+
+    def post(url):
+        with open(log, "rb") as f:
+            return client.post(url, files={"file": ("anomalies.bin", f, "application/octet-stream")}).json()
+
+    miss = post("/api/summary")
+    upload = post("/api/upload")  # a full parse, now in the parse cache
+    hit = post("/api/summary")
+    assert (miss["cached"], hit["cached"]) == (False, True)
+    assert hit["summary"] == miss["summary"]
+    # the full parse also ran the IMU detector that summary-only parses skip
+    detectors = {item["detector"] for item in upload["summary"]["anomalies"]}
+    assert "accel_saturation" in detectors
+    assert {item["detector"] for item in hit["summary"]["anomalies"]} == detectors - {"accel_saturation"}
+
+def test_series_query(client, flight_log):
+    """Test slicing one field by time range as JSON and as raw binary."""
+    import numpy as np
+    with open(flight_log, "rb") as f:
+        log_id = client.post(
+            "/api/upload",
+            files={"file": ("flight.bin", f, "application/octet-stream")}
+        ).json()["log_id"]
+    url = f"/api/logs/{log_id}/series/GPS/Alt"
+    full = client.get(url).json()
+    window = client.get(url, params={"start": 10, "end": 20}).json()
+    assert window["count"] == sum(10 <= t <= 20 for t in full["time"])
+    assert window["time"][0] >= 10 and window["time"][-1] <= 20
+    
+    response = client.get(url, params={"start": 10, "end": 20, "format": "binary"})
+    assert response.headers["content-type"] == "application/octet-stream"
+    count = int(response.headers["X-Series-Count"])
+    time_dtype = np.dtype(response.headers["X-Series-Time-Dtype"])
+    times = np.frombuffer(response.content, dtype=time_dtype, count=count)
+    values = np.frombuffer(
+        response.content,
+        dtype=np.dtype(response.headers["X-Series-Value-Dtype"]),
+        offset=count * time_dtype.itemsize
+    )
+    assert count == window["count"]
+    np.testing.assert_allclose(times / 1e6, window["time"])
+    np.testing.assert_allclose(values, window["values"])
+    
+    assert client.get(f"/api/logs/{log_id}/series/GPS/Nope").status_code == 404
+    assert client.get(url, params={"start": 20, "end": 10}).status_code == 400
+    assert client.get(f"/api/logs/{log_id}/series/MSG/Message").status_code == 400
+
+def test_series_query_with_point_budget(client, flight_log):
+    """Test that a points budget decimates the series and reports the full count."""
+    with open(flight_log, "rb") as f:
+        log_id = client.post(
+            "/api/upload",
+            files={"file": ("flight.bin", f, "application/octet-stream")}
+        ).json()["log_id"]
+    url = f"/api/logs/{log_id}/series/IMU/AccZ"
+    full = client.get(url).json()
+    for method in ("lttb", "minmax"):
+        reduced = client.get(url, params={"points": 50, "method": method}).json()
+        assert reduced["total"] == full["count"] > 50
+        assert 0 < reduced["count"] <= 50
+        assert max(reduced["values"]) == max(full["values"])
+    assert client.get(url, params={"points": 2}).status_code == 400
+    assert client.get(url, params={"points": 50, "method": "mean"}).status_code == 400
+
+def test_preset_graphs(client, flight_log):
+    """Test evaluating a preset graph, including lowpass expressions, over an uploaded log."""
+    assert any(graph["name"] == "Speed/Ground Speed" for graph in client.get("/api/graphs").json()["graphs"])
+    with open(flight_log, "rb") as f:
+        log_id = client.post(
+            "/api/upload",
+            files={"file": ("flight.bin", f, "application/octet-stream")}
+        ).json()["log_id"]
+    available = client.get(f"/api/logs/{log_id}/graphs").json()["graphs"]
+    assert "Aliasing/AccZ" in available
+    graph = client.get(f"/api/logs/{log_id}/graphs/Aliasing/AccZ", params={"points": 20}).json()
+    assert graph["expression"].startswith("lowpass(IMU[0].AccZ")
+    assert 0 < len(graph["series"][0]["values"]) <= 20
+    assert graph["series"][0]["total"] > 20
+    assert client.get(f"/api/logs/{log_id}/graphs/No such graph").status_code == 404
+    assert client.get(f"/api/logs/{log_id}/graphs/Attitude/Roll and Pitch").status_code == 422
+
+def test_background_upload_and_batch(client, flight_log, monkeypatch, tmp_path):
+    """Test that background uploads return 202 at once and report progress until done."""
+    import time
+    from app.api import routes
+    from app.services.parse_cache import ParseCache
+    monkeypatch.setattr(routes, "parse_cache", ParseCache(str(tmp_path), 0))
+    
+    def wait(job_id):
+        for _ in range(500):
+            status = client.get(f"/api/jobs/{job_id}").json()
+            if status["status"] not in ("queued", "running"):
+                return status
+            time.sleep(0.01)
+        return status
+    
+    with open(flight_log, "rb") as f:
+        response = client.post(
+            "/api/upload",
+            params={"background": "true"},
+            files={"file": ("flight.bin", f, "application/octet-stream")}
+        )
+    assert response.status_code == 202
+    status = wait(response.json()["job_id"])
+    assert status["status"] == "done"
+    assert status["bytes_decoded"] == status["bytes_total"] > 0
+    assert status["messages"] > 0
+    log_id = status["result"]["log_id"]
+    assert client.get(f"/api/logs/{log_id}/series/GPS/Alt").status_code == 200
+    
+    with open(flight_log, "rb") as f:
+        content = f.read()
+    response = client.post(
+        "/api/upload/batch",
+        files=[("files", ("a.bin", content, "application/octet-stream")),
+               ("files", ("b.bin", content, "application/octet-stream"))]
+    )
+    assert response.status_code == 202
+    jobs = response.json()["jobs"]
+    assert [job["filename"] for job in jobs] == ["a.bin", "b.bin"]
+    for job in jobs:
+        status = wait(job["job_id"])
+        assert status["status"] == "done" and status["priority"] == "bulk"
+        assert status["result"]["summary"] == wait(jobs[0]["job_id"])["result"]["summary"]
+    assert client.get("/api/jobs/unknown").status_code == 404
+    assert client.post(
+        "/api/upload", params={"background": "true", "priority": "urgent"},
+        files={"file": ("flight.bin", content, "application/octet-stream")}
+    ).status_code == 400
+
+def test_metrics_endpoint(client, flight_log, monkeypatch, tmp_path):
+    """Test that uploads and chats show up as Prometheus metrics."""
+    from app.api import routes
+    from app.services.parse_cache import ParseCache
+    monkeypatch.setattr(routes, "parse_cache", ParseCache(str(tmp_path), 0))
+    
+    with open(flight_log, "rb") as f:
+        log_id = client.post(
+            "/api/upload",
+            files={"file": ("flight.bin", f, "application/octet-stream")}
+        ).json()["log_id"]
+    client.post(f"/api/chat/{log_id}", json={"message": "What was the max altitude?"})
+    
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    samples = {}
+    for line in response.text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    assert samples["uav_upload_bytes_total"] >= os.path.getsize(flight_log)
+    assert samples['uav_parse_stage_seconds_count{stage="decode"}'] >= 1
+    assert samples['uav_parse_stage_seconds_count{stage="summary"}'] >= 1
+    assert samples["uav_parse_messages_total"] > 0
+    assert samples['uav_parse_seconds_bucket{mode="full",le="+Inf"}'] >= 1
+    assert samples['uav_llm_tokens_total{kind="prompt"}'] > 0
+    assert samples['uav_chat_seconds_count{mode="complete",cached="false"}'] >= 1
+    assert any(name.startswith('uav_http_request_seconds_count{method="POST",route="/api/upload"')
+               for name in samples)
+    assert "uav_log_store_size_bytes" in samples and "uav_jobs_completed_total" in samples
+
+def test_request_profiling(client, monkeypatch, tmp_path):
+    """Test that an opt-in profile of one request is written to disk."""
+    import pstats
+    from app import main
+    from app.core.config import settings
+    
+    assert "X-Profile-File" not in client.get("/", headers={"X-Profile": "cpu"}).headers
+    monkeypatch.setattr(settings, "PROFILE_REQUESTS", True)
+    monkeypatch.setattr(main.profiler, "directory", str(tmp_path))
+    response = client.get("/api/stats", headers={"X-Profile": "cpu"})
+    assert response.status_code == 200
+    assert pstats.Stats(response.headers["X-Profile-File"]).total_calls > 0
+    response = client.get("/api/stats", headers={"X-Profile": "memory"})
+    with open(response.headers["X-Profile-File"]) as f:
+        assert f.readline().startswith("traced:")
+    assert client.get("/", headers={"X-Profile": "disk"}).status_code == 400
+
+def test_request_profiling_skips_concurrent_requests(client, monkeypatch, tmp_path):
+    """Test that a request is not profiled while another one is in flight."""
+    from app import main
+    from app.core.config import settings
+    
+    monkeypatch.setattr(settings, "PROFILE_REQUESTS", True)
+    monkeypatch.setattr(main.profiler, "directory", str(tmp_path))
+    with main.profiler.in_flight():
+        response = client.get("/api/stats", headers={"X-Profile": "cpu"})
+    assert response.status_code == 200
+    assert "X-Profile-File" not in response.headers
+    assert not os.listdir(tmp_path)
+    assert "X-Profile-File" in client.get("/api/stats", headers={"X-Profile": "cpu"}).headers
+
+def test_log_export(client, flight_log, monkeypatch):
+    """Test downloading a parsed log as Arrow and Parquet tables."""
+    import io
+    import sys
+    import zipfile
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.ipc
+    import pyarrow.parquet
+    
+    with open(flight_log, "rb") as f:
+        log_id = client.post(
+            "/api/upload",
+            files={"file": ("flight.bin", f, "application/octet-stream")}
+        ).json()["log_id"]
+    
+    response = client.get(f"/api/logs/{log_id}/export", params={"format": "arrow", "types": "GPS,BAT"})
+    assert response.status_code == 200
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    assert sorted(archive.namelist()) == ["BAT.arrow", "GPS.arrow", "summary.json"]
+    gps = pa.ipc.open_file(pa.BufferReader(archive.read("GPS.arrow"))).read_all()
+    assert gps.schema.field("TimeUS").type == pa.uint64()
+    assert gps.schema.field("Status").type == pa.uint8()
+    assert gps.num_rows == 300
+    assert json.loads(archive.read("summary.json"))["max_altitude"] == pytest.approx(634.0)
+    
+    response = client.get(f"/api/logs/{log_id}/export/MSG")
+    assert response.headers["content-type"] == "application/vnd.apache.parquet"
+    table = pa.parquet.read_table(pa.BufferReader(response.content))
+    assert table.to_pydict()["Message"] == ["ArduCopter V4.5.0 (test)"]
+    
+    assert client.get(f"/api/logs/{log_id}/export/XYZ").status_code == 404
+    assert client.get(f"/api/logs/{log_id}/export", params={"format": "csv"}).status_code == 400
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+    assert client.get(f"/api/logs/{log_id}/export").status_code == 501
+
+def test_fleet_queries(client, flight_log):
+    """Test searching and aggregating the summaries of uploaded logs."""
+    with open(flight_log, "rb") as f:
+        log_id = client.post(
+            "/api/upload",
+            files={"file": ("fleet.bin", f, "application/octet-stream")}
+        ).json()["log_id"]
+    
+    response = client.get("/api/fleet/flights", params={"vehicle": "ArduCopter", "has_gps_issues": "true"})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total"] >= 1
+    flight = next(item for item in data["items"] if item["log_id"] == log_id)
+    assert flight["filename"] == "fleet.bin"
+    assert flight["firmware"] == "V4.5.0"
+    
+    assert client.get("/api/fleet/flights", params={"until": "2000-01-01"}).json()["total"] == 0
+    assert client.get("/api/fleet/flights", params={"since": "yesterday"}).status_code == 400
+    assert client.get("/api/fleet/flights", params={"order_by": "log_id"}).status_code == 400
+    assert client.get("/api/fleet/stats").json()["flights"] >= 1
+    assert client.get("/api/stats").json()["fleet"]["flights"] >= 1
+
+def test_graph_points_are_capped(client, flight_log):
+    """Test that graph decimation is limited to what a plot can show."""
+    from app.core.config import settings
+    with open(flight_log, "rb") as f:
+        log_id = client.post(
+            "/api/upload",
+            files={"file": ("flight.bin", f, "application/octet-stream")}
+        ).json()["log_id"]
+    
+    response = client.get(
+        f"/api/logs/{log_id}/graphs/Aliasing/AccZ",
+        params={"points": settings.GRAPH_MAX_POINTS + 1}
+    )
+    assert response.status_code == 400
+    assert str(settings.GRAPH_MAX_POINTS) in response.json()["detail"]
@@ -0,0 +1,47 @@
+from app.services.context import ConversationContext, estimate_tokens
+
+
+def _history(pairs: int):
+    history = []
+    for i in range(pairs):
+        history.append({"role": "user", "content": f"Question {i}? " + "detail " * 20})
+        history.append({"role": "assistant", "content": f"Answer {i}. " + "more " * 40})
+    return history
+
+
+def test_short_conversation_is_sent_verbatim():
+    """Test that a conversation within budget is passed through unchanged."""
+    context = ConversationContext(4000, 500, 1024 * 1024, 60)
+    history = _history(2)
+    turns = context.build("c", history, "PREFIX", "Next?")
+    assert [turn["role"] for turn in turns] == ["user", "model", "user", "model", "user"]
+    assert turns[0]["text"].startswith("PREFIX\nQuestion 0?")
+    assert turns[-1]["text"] == "Next?"
+    assert context.stats()["compacted_messages"] == 0
+
+
+def test_long_conversation_stays_within_budget():
+    """Test that older turns are compacted and the prompt size stays bounded."""
+    context = ConversationContext(400, 100, 1024 * 1024, 60)
+    sizes = []
+    for pairs in (5, 20, 80):
+        turns = context.build("c", _history(pairs), "PREFIX", "Next?")
+        sizes.append(sum(estimate_tokens(turn["text"]) for turn in turns))
+        assert turns[0]["role"] == "user" and turns[-1]["text"] == "Next?"
+        assert "Earlier in this conversation:" in turns[0]["text"]
+    assert max(sizes) <= 400 + estimate_tokens("PREFIX Next?") + 20
+    # Each build only compacts the messages that left the verbatim window
+    assert context.stats()["compacted_messages"] < 160
+
+
+def test_summary_keeps_the_latest_compacted_turns():
+    """Test that the summary drops its oldest lines first."""
+    context = ConversationContext(300, 60, 1024 * 1024, 60)
+    turns = context.build("c", _history(30), "PREFIX", "Next?")
+    summary, first_kept = turns[0]["text"].rsplit("\n", 1)
+    assert "Question 0?" not in summary
+    kept = int(first_kept.split()[1].rstrip("?"))
+    assert summary.endswith(f"Assistant answered: Answer {kept - 1}.")
+
+    context.forget("c")
+    assert context.stats()["cached_summaries"] == 0
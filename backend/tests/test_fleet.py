@@ -0,0 +1,87 @@
+import asyncio
+import pytest
+from app.services.chatbot import Chatbot
+from app.services.fleet import FleetIndex, flight_metadata
+from app.services.flight_tools import FlightTools
+from app.services.llm import LLMClient, StubBackend
+from app.services.log_parser import LogParser
+from app.services.parsed_log import ParsedLog
+
+
+def _parsed(path: str) -> ParsedLog:
+    parser = LogParser(path)
+    summary = parser.parse()
+    return ParsedLog(summary, parser.data)
+
+
+def test_fleet_index_queries(flight_log, tmp_path):
+    """Test indexing flights and filtering, ordering and aggregating them."""
+    parsed = _parsed(flight_log)
+    metadata = flight_metadata(parsed.data)
+    assert metadata['vehicle'] == 'ArduCopter'
+    assert metadata['firmware'] == 'V4.5.0'
+    assert metadata['flight_date'] is not None
+
+    index = FleetIndex(str(tmp_path / 'fleet.sqlite'))
+    index.add('log-1', 'hash-1', parsed.summary, parsed.data, 'first.bin')
+    # a second, healthier flight without GPS (so dated by its upload)
+    healthy = dict(parsed.summary, gps_issues=[], critical_errors=[], mode_changes=[], min_battery=15.5)
+    index.add('log-2', 'hash-2', healthy, {'BAT': parsed.data['BAT']}, 'second.bin')
+    # re-uploading a known log only points it at the new id
+    index.add('log-3', 'hash-1', parsed.summary, parsed.data)
+
+    everything = index.query()
+    assert everything['total'] == 2
+    first = next(item for item in everything['items'] if item['content_hash'] == 'hash-1')
+    assert first['log_id'] == 'log-3'
+    assert first['filename'] == 'first.bin'
+    assert first['date_source'] == 'gps'
+    assert first['gps_issue_count'] == 1
+    assert first['max_altitude'] == pytest.approx(parsed.summary['max_altitude'])
+    assert len(first['modes']) == 3
+
+    assert [item['log_id'] for item in index.query(has_gps_issues=True)['items']] == ['log-3']
+    assert [item['log_id'] for item in index.query(has_gps_issues=False)['items']] == ['log-2']
+    assert [item['log_id'] for item in index.query(has_critical_errors=True)['items']] == ['log-3']
+    assert index.query(min_battery_below=15.5)['total'] == 1
+    assert index.query(vehicle='ArduCopter')['total'] == 1
+    assert index.query(mode=first['modes'][0])['total'] == 1
+    assert index.query(since=metadata['flight_date'] + 1)['total'] == 1
+    ordered = index.query(order_by='min_battery', descending=False)['items']
+    assert [item['log_id'] for item in ordered] == ['log-3', 'log-2']
+    # flights without an altitude sort last either way
+    assert index.query(order_by='max_altitude', descending=False)['items'][-1]['log_id'] == 'log-2'
+
+    totals = index.aggregate()
+    assert totals['flights'] == 2
+    assert totals['flights_with_gps_issues'] == 1
+    assert totals['lowest_battery_v'] == pytest.approx(parsed.summary['min_battery'])
+    assert index.stats() == {'flights': 2}
+
+    with pytest.raises(ValueError):
+        index.query(order_by='filename; DROP TABLE flights')
+    with pytest.raises(ValueError):
+        index.query(colour='red')
+
+
+def test_query_fleet_tool(flight_log, tmp_path):
+    """Test the fleet tool and that answers using it are not cached per log."""
+    parsed = _parsed(flight_log)
+    parsed.content_hash = 'hash-1'
+    index = FleetIndex(str(tmp_path / 'fleet.sqlite'))
+    index.add('log-1', 'hash-1', parsed.summary, parsed.data, 'flight.bin')
+
+    tools = FlightTools(parsed, index)
+    result = tools.call('query_fleet', {'has_gps_issues': True, 'days': 100000})
+    assert result['fleet']['flights'] == result['total'] == 1
+    assert result['items'][0]['log_id'] == 'log-1'
+    assert tools.call('query_fleet', {'min_battery_below': 0})['total'] == 0
+    assert 'error' in tools.call('query_fleet', {'colour': 'red'})
+    assert 'error' in FlightTools(parsed).call('query_fleet')
+
+    client = LLMClient(StubBackend())
+    chatbot = Chatbot(client, fleet=index)
+    answer = asyncio.run(chatbot.process_message("How is the fleet doing?", "c1", parsed))
+    assert '[query_fleet:' in answer
+    asyncio.run(chatbot.process_message("How is the fleet doing?", "c2", parsed))
+    assert chatbot.responses.stats()['hits'] == 0
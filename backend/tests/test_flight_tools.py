@@ -0,0 +1,134 @@
+import asyncio
+import json
+import numpy as np
+from app.services.chatbot import Chatbot
+from app.services.flight_tools import MAX_ITEMS, FlightTools
+from app.services.llm import LLMClient, StubBackend
+from app.services.log_parser import LogParser
+from app.services.parsed_log import ParsedLog
+from app.services.series import SeriesIndex, series_index
+
+
+def _parsed(path: str) -> ParsedLog:
+    parser = LogParser(path)
+    summary = parser.parse()
+    return ParsedLog(summary, parser.data)
+
+
+def test_series_index_window():
+    """Test time-range slicing, including logs that are out of time order."""
+    index = SeriesIndex({
+        'BAT': {
+            'TimeUS': np.array([300, 100, 200, 400]),
+            'Volt': np.array([3.0, 1.0, 2.0, 4.0]),
+        }
+    })
+    times, values = index.window('BAT', 'Volt', 150, 300)
+    assert times.tolist() == [200, 300]
+    assert values.tolist() == [2.0, 3.0]
+    assert index.bounds('BAT', end=50) == (0, 0)
+
+
+def test_flight_tools(flight_log):
+    """Test the chatbot tools against a parsed log."""
+    tools = FlightTools(_parsed(flight_log))
+    assert tools.call('get_max_altitude') == {'max_altitude_m': tools.summary['max_altitude']}
+
+    issues = tools.call('get_gps_issues')
+    assert issues['total'] == 1
+    assert issues['items'][0]['start'] == 25.0  # seconds since boot
+    assert issues['items'][0]['samples'] == 20
+    assert tools.call('get_gps_issues', {'start': 26, 'end': 27})['total'] == 1
+    assert tools.call('get_gps_issues', {'start': 0, 'end': 10})['total'] == 0
+    assert tools.call('get_mode_changes', {'limit': 2})['total'] == 3
+
+    series = tools.call('get_series', {'msg_type': 'GPS', 'field': 'NSats', 'start': 25, 'end': 28.8})
+    assert series['count'] == 20
+    assert series['min'] == series['max'] == 4
+    assert len(tools.call('get_series', {'msg_type': 'IMU', 'field': 'AccZ', 'points': 1000})['samples']) <= MAX_ITEMS
+
+    assert 'error' in tools.call('get_series', {'msg_type': 'GPS', 'field': 'Nope'})
+    assert 'error' in tools.call('delete_everything')
+
+
+def test_chatbot_answers_through_tools(flight_log):
+    """Test that the prompt carries counts only and details come from tools."""
+    parsed = _parsed(flight_log)
+    backend = StubBackend()
+    prompts = []
+    complete = backend.complete
+
+    async def recording_complete(turns, tools=None):
+        prompts.append(turns[0]['text'])
+        return await complete(turns, tools)
+
+    backend.complete = recording_complete
+    chatbot = Chatbot(LLMClient(backend))
+    answer = asyncio.run(chatbot.process_message("Any GPS problems?", "c1", parsed))
+
+    assert answer.startswith("Stub answer to: Any GPS problems? [get_gps_issues:")
+    assert '"gps_issues_count": 1' in prompts[0]
+    assert json.dumps(parsed.summary['gps_issues'][0]) not in prompts[0]
+    assert chatbot.conversations.get("c1")[-1]['content'] == answer
+
+
+def test_chatbot_caches_standalone_answers(flight_log):
+    """Test that repeated questions about a log skip the LLM."""
+    parsed = _parsed(flight_log)
+    parsed.content_hash = "abc"
+    client = LLMClient(StubBackend())
+    chatbot = Chatbot(client)
+
+    first = asyncio.run(chatbot.process_message("What was the max altitude?", "c1", parsed))
+    requests = client.stats()['requests']
+    second = asyncio.run(chatbot.process_message("what was the MAX altitude", "c2", parsed))
+    assert second == first
+    assert client.stats()['requests'] == requests
+
+    # A follow-up in an ongoing conversation bypasses the cache
+    asyncio.run(chatbot.process_message("What was the max altitude?", "c1", parsed))
+    assert client.stats()['requests'] > requests
+
+    stats = chatbot.responses.stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+    assert stats['hit_rate'] == 0.5
+
+def test_series_index_bounds_with_fractional_keys():
+    """Test that float bounds on integer timestamps select the same samples as a mask."""
+    times = np.arange(0, 100_000, 250, dtype=np.uint64)
+    index = SeriesIndex({'IMU': {'TimeUS': times}})
+    for start, end in [(-5.0, 1000.5), (249.5, 250.0), (1e30, 2e30), (-1e30, -1.0), (500.0, 499.0)]:
+        lo, hi = index.bounds('IMU', start, end)
+        expected = np.flatnonzero((times >= start) & (times <= end))
+        assert hi - lo == len(expected)
+        if len(expected):
+            assert (lo, hi) == (expected[0], expected[-1] + 1)
+
+def test_downsampling_keeps_extremes():
+    """Test that LTTB and min-max decimation keep a spike and honour the point budget."""
+    from app.services.downsample import lttb, minmax
+    times = np.arange(100_000, dtype=np.uint64) * 1000
+    values = np.sin(np.arange(100_000) / 5000).astype(np.float32)
+    values[54321] = 40.0
+    index = SeriesIndex({'IMU': {'TimeUS': times, 'AccZ': values}})
+    assert len(index.pyramid('IMU', 'AccZ')) > 1
+    for method in ('lttb', 'minmax'):
+        sample_times, samples = index.downsample('IMU', 'AccZ', points=500, method=method)
+        assert len(samples) <= 500
+        assert samples.max() == 40.0
+        assert np.all(np.diff(sample_times.astype(np.int64)) > 0)
+    zoomed, _ = index.downsample('IMU', 'AccZ', 10e6, 20e6, points=100, method='minmax')
+    assert zoomed[0] >= 10e6 and zoomed[-1] <= 20e6
+    assert list(minmax(np.array([1, 5, 2, 8, 3, 0, 4]), 4)) == [0, 3, 5, 6]
+    picks = lttb(np.arange(10.0), np.array([0, 0, 9, 0, 0, 0, 0, -9, 0, 0.0]), 4)
+    assert list(picks) == [0, 2, 7, 9]
+
+
+def test_tools_share_the_series_index_of_a_log(flight_log):
+    """Test that the chat tools reuse the log's series index instead of building their own."""
+    parsed = _parsed(flight_log)
+    tools = FlightTools(parsed)
+    assert tools.series is series_index(parsed)
+    assert FlightTools(parsed).series is tools.series
+    assert series_index(_parsed(flight_log)) is not tools.series
@@ -0,0 +1,67 @@
+import pytest
+import asyncio
+import numpy as np
+from app.services.ingestion import IngestionPool, IngestionQueueFull
+from app.services.jobs import Job, JobStore
+from app.services.log_parser import LogParser
+from app.services.parsed_log import ParsedLog
+from dataflash_builder import build_flight_log
+
+def test_parsed_log_round_trip():
+    """Test packing and unpacking a parsed log."""
+    data = {
+        'GPS': {
+            'TimeUS': np.array([1, 2, 3], dtype=np.uint64),
+            'Alt': np.array([10.5, 11.0, 12.25])
+        },
+        'MSG': {'Message': np.array(['armed', 'disarmed'])},
+        'ISBD': {'data': np.arange(64, dtype=np.int16).reshape(2, 32)}
+    }
+    packed = ParsedLog({'max_altitude': 12.25}, data, content_hash='abc').to_bytes()
+    restored = ParsedLog.from_buffer(packed)
+    assert restored.summary == {'max_altitude': 12.25}
+    assert restored.content_hash == 'abc'
+    for msg_type, columns in data.items():
+        for field, values in columns.items():
+            assert restored.data[msg_type][field].dtype == values.dtype
+            np.testing.assert_array_equal(restored.data[msg_type][field], values)
+
+def test_parsed_log_rejects_garbage():
+    """Test that unpacking arbitrary bytes fails cleanly."""
+    with pytest.raises(ValueError):
+        ParsedLog.from_buffer(b"\x00" * 100)
+
+def test_pool_parses_in_worker(tmp_path):
+    """Test that a worker process returns the same result as a local parse."""
+    log = build_flight_log(str(tmp_path / "flight.bin"))
+    pool = IngestionPool(max_workers=1, max_pending=2)
+    try:
+        parsed = asyncio.run(pool.parse(log))
+    finally:
+        pool.shutdown()
+    parser = LogParser(log)
+    assert parsed.summary == parser.parse()
+    np.testing.assert_array_equal(parsed.data['GPS']['Alt'], parser.data['GPS']['Alt'])
+    assert pool.pending == 0
+
+def test_pool_rejects_when_full(tmp_path):
+    """Test backpressure when the pending limit is reached."""
+    pool = IngestionPool(max_workers=0, max_pending=0)
+    with pytest.raises(IngestionQueueFull):
+        asyncio.run(pool.parse(str(tmp_path / "flight.bin")))
+
+def test_pool_parses_jobs_with_progress(tmp_path):
+    """Test that a job parse reports progress to the job store and waits for a slot."""
+    log = build_flight_log(str(tmp_path / "flight.bin"))
+    store = JobStore(str(tmp_path / "jobs.sqlite"))
+    job = Job(log, "flight.bin", "bulk", 1, "hash", "log")
+    store.save(job)
+    pool = IngestionPool(max_workers=0, max_pending=1)
+    try:
+        parsed, messages = pool.parse_job(log, job.id, store.path, 4096)
+    finally:
+        pool.shutdown()
+    assert parsed.summary == LogParser(log).parse()
+    assert messages > 0
+    assert 0 < store.get(job.id).bytes_decoded
+    assert pool.pending == 0
@@ -0,0 +1,90 @@
+import threading
+import time
+from app.services.jobs import Job, JobQueue, JobStore
+
+
+def _job(name: str, priority: str) -> Job:
+    return Job(f"/tmp/{name}.bin", name, priority, 100, name, name)
+
+
+def _wait(job: Job, timeout: float = 5.0):
+    deadline = time.time() + timeout
+    while job.status in ('queued', 'running') and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def test_interactive_jobs_run_before_bulk():
+    """Test that queued interactive jobs overtake bulk jobs submitted earlier."""
+    order, release = [], threading.Event()
+
+    def process(job):
+        if job.filename == 'first':
+            release.wait(5)
+        order.append(job.filename)
+        return {'log_id': job.log_id}
+
+    jobs = JobQueue(workers=1, max_queued=10, process=process, history=100, ttl_seconds=60)
+    try:
+        first = jobs.submit(_job('first', 'interactive'))
+        while first.status == 'queued':
+            time.sleep(0.01)
+        queued = [jobs.submit(_job(name, priority)) for name, priority in
+                  [('bulk-1', 'bulk'), ('bulk-2', 'bulk'), ('upload', 'interactive')]]
+        release.set()
+        for job in queued:
+            _wait(job)
+    finally:
+        jobs.shutdown()
+    assert order == ['first', 'upload', 'bulk-1', 'bulk-2']
+    assert jobs.get(first.id).to_dict()['result'] == {'log_id': 'first'}
+    assert jobs.stats()['completed'] == 4
+
+
+def test_job_failure_and_progress_report():
+    """Test that errors are reported on the job and progress yields a rate and ETA."""
+    def process(job):
+        raise ValueError("not a log")
+
+    jobs = JobQueue(workers=1, max_queued=10, process=process, history=100, ttl_seconds=60)
+    try:
+        failed = jobs.submit(_job('broken', 'bulk'))
+        _wait(failed)
+    finally:
+        jobs.shutdown()
+    report = failed.to_dict()
+    assert report['status'] == 'failed'
+    assert report['error'] == "not a log"
+
+    running = _job('running', 'interactive')
+    running.status, running.started = 'running', time.time() - 2.0
+    running.progress(25, 1000)
+    report = running.to_dict()
+    assert report['progress'] == 0.25
+    assert 400 < report['message_rate'] <= 500
+    assert 5.5 < report['eta_seconds'] < 6.5
+
+
+def test_job_state_is_shared_through_the_store(tmp_path):
+    """Test that a job queued by one worker process can be polled from another."""
+    path = str(tmp_path / 'jobs.sqlite')
+    jobs = JobQueue(workers=1, max_queued=10, process=lambda job: {'log_id': job.log_id},
+                    history=1, ttl_seconds=60, path=path)
+    try:
+        done = [jobs.submit(_job(name, 'bulk')) for name in ('old', 'new')]
+        for job in done:
+            _wait(job)
+    finally:
+        jobs.shutdown()
+
+    other = JobStore(path)
+    assert other.get(done[0].id) is None  # pruned beyond the history
+    report = other.get(done[1].id).to_dict()
+    assert report['status'] == 'done'
+    assert report['result'] == {'log_id': 'new'}
+    assert report['progress'] == 1.0
+    assert other.get('missing') is None
+
+    queued = _job('queued', 'interactive')
+    other.save(queued)
+    other.progress(queued.id, 40, 7)
+    assert JobStore(path).get(queued.id).to_dict()['bytes_decoded'] == 40
@@ -0,0 +1,93 @@
+import asyncio
+import pytest
+from app.services.llm import LLMBackend, LLMClient, LLMError, LLMReply, StubBackend, user_turn
+
+
+class FlakyBackend(LLMBackend):
+    """Fails a fixed number of times before answering."""
+
+    def __init__(self, failures: int, retryable: bool = True):
+        self.failures = failures
+        self.retryable = retryable
+        self.calls = 0
+
+    async def complete(self, turns, tools=None) -> LLMReply:
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise RuntimeError("backend unavailable")
+        return LLMReply("ok")
+
+    def is_retryable(self, error: Exception) -> bool:
+        return self.retryable
+
+
+class CountingBackend(LLMBackend):
+    """Records the highest number of concurrent calls."""
+
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+
+    async def complete(self, turns, tools=None) -> LLMReply:
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        return LLMReply(turns[-1]["text"])
+
+
+def test_retries_transient_failures():
+    """Test that retryable errors are retried with backoff."""
+    backend = FlakyBackend(failures=2)
+    client = LLMClient(backend, max_retries=2, backoff=0.001)
+    assert asyncio.run(client.generate("hi")) == "ok"
+    assert backend.calls == 3
+    assert client.stats()['retries'] == 2
+
+
+def test_gives_up_after_max_retries():
+    """Test that an LLMError is raised once the retries are spent."""
+    client = LLMClient(FlakyBackend(failures=5), max_retries=1, backoff=0.001)
+    with pytest.raises(LLMError):
+        asyncio.run(client.generate("hi"))
+    assert client.stats()['failures'] == 1
+
+
+def test_does_not_retry_permanent_errors():
+    """Test that non-retryable errors fail on the first attempt."""
+    backend = FlakyBackend(failures=1, retryable=False)
+    client = LLMClient(backend, max_retries=3, backoff=0.001)
+    with pytest.raises(LLMError):
+        asyncio.run(client.generate("hi"))
+    assert backend.calls == 1
+
+
+def test_times_out_slow_calls():
+    """Test that each attempt is bounded by the timeout."""
+    client = LLMClient(StubBackend(latency=1.0), timeout=0.01, max_retries=0)
+    with pytest.raises(LLMError, match="timed out"):
+        asyncio.run(client.generate("hi"))
+
+
+def test_limits_concurrency():
+    """Test that no more than max_concurrency calls run at once."""
+    backend = CountingBackend()
+    client = LLMClient(backend, max_concurrency=3)
+
+    async def run_all():
+        return await asyncio.gather(*(client.generate(str(i)) for i in range(20)))
+
+    assert asyncio.run(run_all()) == [str(i) for i in range(20)]
+    assert backend.peak == 3
+
+
+def test_stream_retries_before_first_chunk():
+    """Test that a stream failing before its first chunk is retried."""
+    backend = FlakyBackend(failures=1)
+    client = LLMClient(backend, max_retries=1, backoff=0.001)
+
+    async def collect():
+        return [chunk async for chunk in client.stream([user_turn("hi")])]
+
+    assert asyncio.run(collect()) == ["ok"]
+    assert client.stats()['retries'] == 1
@@ -1,6 +1,12 @@
 import pytest
 from app.services.log_parser import LogParser
+from app.services.column_store import ColumnStore
+from app.services.dataflash import DataFlashDecoder
+from app.services import parallel_decode
+from dataflash_builder import DataFlashWriter, build_flight_log
+import numpy as np
 import os
+import struct
 
 def test_log_parser_initialization():
     """Test LogParser initialization."""
@@ -21,10 +27,7 @@ def test_calculate_flight_time():
     """Test flight time calculation."""
     parser = LogParser("test.bin")
     parser.data = {
-        'MODE': [
-            {'time_usec': 1000000},
-            {'time_usec': 2000000}
-        ]
+        'MODE': {'time_usec': np.array([1000000, 2000000])}
     }
     flight_time = parser._calculate_flight_time()
     assert flight_time == 1.0  # (2000000 - 1000000) / 1e6
@@ -33,11 +36,7 @@ def test_get_max_altitude():
     """Test maximum altitude calculation."""
     parser = LogParser("test.bin")
     parser.data = {
-        'GPS': [
-            {'Alt': 100},
-            {'Alt': 200},
-            {'Alt': 150}
-        ]
+        'GPS': {'Alt': np.array([100.0, 200.0, 150.0])}
     }
     max_alt = parser._get_max_altitude()
     assert max_alt == 200
@@ -46,11 +45,7 @@ def test_get_min_battery():
     """Test minimum battery voltage calculation."""
     parser = LogParser("test.bin")
     parser.data = {
-        'BAT': [
-            {'Volt': 12.0},
-            {'Volt': 11.5},
-            {'Volt': 11.8}
-        ]
+        'BAT': {'Volt': np.array([12.0, 11.5, 11.8])}
     }
     min_volt = parser._get_min_battery()
     assert min_volt == 11.5
@@ -59,26 +54,251 @@ def test_detect_gps_issues():
     """Test GPS issues detection."""
     parser = LogParser("test.bin")
     parser.data = {
-        'GPS': [
-            {'Status': 3, 'time_usec': 1000000, 'NSats': 8},
-            {'Status': 2, 'time_usec': 2000000, 'NSats': 5},
-            {'Status': 3, 'time_usec': 3000000, 'NSats': 7}
-        ]
+        'GPS': {
+            'Status': np.array([3, 2, 3], dtype=np.uint8),
+            'TimeUS': np.array([1000000, 2000000, 3000000], dtype=np.uint64),
+            'NSats': np.array([8, 5, 7], dtype=np.uint8)
+        }
     }
     issues = parser._detect_gps_issues()
-    assert len(issues) == 1
-    assert issues[0]['status'] == 2
-    assert issues[0]['satellites'] == 5
+    assert issues == [{
+        'start': 2000000, 'end': 2000000, 'samples': 1,
+        'worst_status': 2, 'min_satellites': 5
+    }]
+
+def test_gps_issues_are_run_length_encoded():
+    """Test that consecutive GPS samples without a fix form one interval."""
+    parser = LogParser("test.bin")
+    parser.data = {
+        'GPS': {
+            'Status': np.array([3, 2, 1, 2, 3, 3, 0, 3], dtype=np.uint8),
+            'TimeUS': np.arange(8, dtype=np.uint64) * 100,
+            'NSats': np.array([9, 6, 4, 5, 9, 9, 0, 9], dtype=np.uint8)
+        }
+    }
+    issues = parser._detect_gps_issues()
+    assert [(i['start'], i['end'], i['samples']) for i in issues] == [(100, 300, 3), (600, 600, 1)]
+    assert [(i['worst_status'], i['min_satellites']) for i in issues] == [(1, 4), (0, 0)]
 
 def test_get_critical_errors():
     """Test critical errors detection."""
     parser = LogParser("test.bin")
-    parser.events = [
-        {'type': 'ERR', 'data': {'Severity': 2}},
-        {'type': 'ERR', 'data': {'Severity': 1}},
-        {'type': 'MODE', 'data': {}}
-    ]
+    parser.data = {
+        'ERR': {
+            'TimeUS': np.array([100, 200, 300, 400], dtype=np.uint64),
+            'Subsys': np.array([11, 11, 11, 12], dtype=np.uint8),
+            'ECode': np.array([2, 2, 0, 1], dtype=np.uint8)
+        }
+    }
     errors = parser._get_critical_errors()
-    assert len(errors) == 1
-    assert errors[0]['type'] == 'ERR'
-    assert errors[0]['data']['Severity'] == 2 
\ No newline at end of file
+    assert errors == [
+        {'Subsys': 11, 'ECode': 2, 'start': 100, 'end': 200, 'count': 2},
+        {'Subsys': 12, 'ECode': 1, 'start': 400, 'end': 400, 'count': 1},
+    ]
+
+def test_critical_errors_of_a_real_log(flight_log):
+    """Test that the ERR records of a log (Subsys,ECode) are reported by every parse mode."""
+    summary = LogParser(flight_log).parse()
+    assert [(e['Subsys'], e['ECode'], e['count']) for e in summary['critical_errors']] == [(11, 2, 1)]
+    assert LogParser(flight_log).summarize()['critical_errors'] == summary['critical_errors']
+
+def test_get_mode_changes():
+    """Test that each mode change carries the interval the mode was active."""
+    parser = LogParser("test.bin")
+    parser.data = {
+        'MODE': {
+            'TimeUS': np.array([100, 500], dtype=np.uint64),
+            'ModeNum': np.array([0, 5], dtype=np.uint8)
+        },
+        'BAT': {'TimeUS': np.array([900], dtype=np.uint64)}
+    }
+    modes = parser._get_mode_changes()
+    assert modes == [
+        {'ModeNum': 0, 'start': 100, 'end': 500},
+        {'ModeNum': 5, 'start': 500, 'end': 900},
+    ]
+
+def test_column_store_chunks_and_conversions():
+    """Test that the column store converts DataFlash values per chunk."""
+    store = ColumnStore(chunk_size=2)
+    store.declare('GPS', ['TimeUS', 'Status', 'Alt', 'Name'], 'QBeN')
+    for i in range(5):
+        store.append('GPS', [i * 1000, 3, 12345 + i, b'GPS\0junk'])
+    data = store.finalize()
+    gps = data['GPS']
+    assert gps['TimeUS'].dtype == np.uint64
+    assert gps['Status'].dtype == np.uint8
+    assert gps['TimeUS'].tolist() == [0, 1000, 2000, 3000, 4000]
+    assert gps['Alt'][0] == pytest.approx(123.45)
+    assert gps['Name'].tolist() == ['GPS'] * 5
+
+def test_get_dataframe_wraps_columns():
+    """Test that get_dataframe does not copy the column arrays."""
+    parser = LogParser("test.bin")
+    volts = np.array([12.0, 11.5, 11.8])
+    parser.data = {'BAT': {'Volt': volts}}
+    df = parser.get_dataframe('BAT')
+    assert list(df['Volt']) == [12.0, 11.5, 11.8]
+    assert np.shares_memory(df['Volt'].to_numpy(), volts)
+    assert parser.get_dataframe('GPS') is None
+
+def test_native_decoder_matches_pymavlink(tmp_path):
+    """Test that the native decoder reproduces the pymavlink summary."""
+    log = build_flight_log(str(tmp_path / "flight.bin"))
+    reference = LogParser(log, decoder='pymavlink')
+    native = LogParser(log, decoder='native')
+    assert native.parse() == reference.parse()
+    assert native.mlog is None
+    assert set(native.data) == set(reference.data)
+    for msg_type, columns in reference.data.items():
+        assert list(native.data[msg_type]) == list(columns)
+        for field, values in columns.items():
+            assert native.data[msg_type][field].dtype == values.dtype
+            np.testing.assert_array_equal(native.data[msg_type][field], values)
+
+def test_native_decoder_skips_corrupt_bytes(tmp_path):
+    """Test that garbage between records does not break the scan."""
+    writer = DataFlashWriter()
+    for i in range(50):
+        writer.write('BAT', TimeUS=i * 1000, Volt=12.0 - i * 0.01)
+        if i == 20:
+            # a bogus header followed by junk, as seen in truncated blocks
+            writer.buffer += bytes([0xA3, 0x95, 131, 0xA3, 0x95]) + b'\xff' * 7
+    path = writer.save(str(tmp_path / "corrupt.bin"))
+    data = DataFlashDecoder(path).decode()
+    assert len(data['BAT']['TimeUS']) == 50
+    assert data['BAT']['TimeUS'][-1] == 49000
+
+def test_auto_mode_falls_back_on_any_decoder_failure(tmp_path, monkeypatch, capsys):
+    """Test that auto mode falls back to pymavlink on decoder errors other than DataFlashError."""
+    from app.services import log_parser
+    from dataflash_builder import FORMATS
+    log = build_flight_log(str(tmp_path / "flight.bin"))
+    with open(log, 'rb') as f:
+        content = f.read()
+    reference = LogParser(log, decoder='pymavlink').parse()
+
+    # a log cut off inside its last FMT record still parses
+    truncated = DataFlashWriter(dict(FORMATS, ERR2=(150, 'QB', 'TimeUS,Subsys')))
+    truncated.buffer = bytearray(content)
+    truncated.declare('ERR2')
+    path = tmp_path / "truncated.bin"
+    path.write_bytes(bytes(truncated.buffer[:-30]))
+    assert LogParser(str(path)).parse() == reference
+
+    # a corrupt FMT redefining ERR with an array field breaks the native decoder
+    corrupt = DataFlashWriter(dict(FORMATS, ERR2=(150, 'Qa', 'TimeUS,ECode')))
+    corrupt.buffer = bytearray()
+    corrupt.write('ERR2', TimeUS=99)
+    path = tmp_path / "corrupt.bin"
+    path.write_bytes(content + bytes(corrupt.buffer).replace(b'ERR2', b'ERR\x00'))
+    with pytest.raises(ValueError):
+        DataFlashDecoder(str(path)).decode()
+    with pytest.raises(Exception):
+        LogParser(str(path)).parse()  # the log is beyond pymavlink too
+    assert "falling back to pymavlink" in capsys.readouterr().out
+
+    class BrokenDecoder(DataFlashDecoder):
+        def decode(self, types=None):
+            raise IndexError("index 512 is out of bounds")
+
+    monkeypatch.setattr(log_parser, "DataFlashDecoder", BrokenDecoder)
+    parser = LogParser(log)
+    assert parser.parse() == reference
+    assert parser.mlog is not None
+    with pytest.raises(Exception):
+        LogParser(log, decoder='native').parse()
+
+    # an incremental decode failing mid-upload re-parses the saved file
+    class BrokenStream(log_parser.IncrementalDecoder):
+        def feed(self, chunk):
+            raise struct.error("unpack requires a buffer of 89 bytes")
+
+    monkeypatch.setattr(log_parser, "IncrementalDecoder", BrokenStream)
+    parser = LogParser(log)
+    parser.feed(content[:1000])
+    parser.feed(content[1000:])
+    assert parser.finish() == reference
+
+def test_native_decoder_type_filter(tmp_path):
+    """Test decoding only selected message types."""
+    log = build_flight_log(str(tmp_path / "flight.bin"))
+    data = DataFlashDecoder(log).decode(types=['GPS', 'BAT'])
+    assert set(data) == {'GPS', 'BAT'}
+
+def test_parallel_decode_matches_sequential(tmp_path, monkeypatch):
+    """Test that decoding a log in ranges across processes gives the same columns."""
+    monkeypatch.setattr(parallel_decode, "PARALLEL_MIN_BYTES", 0)
+    log = build_flight_log(str(tmp_path / "flight.bin"), seconds=600)
+    reference = LogParser(log)
+    parallel = LogParser(log, workers=3)
+    try:
+        assert parallel.parse() == reference.parse()
+    finally:
+        parallel_decode.shutdown()
+    assert list(parallel.data) == list(reference.data)
+    for msg_type, columns in reference.data.items():
+        for field, values in columns.items():
+            np.testing.assert_array_equal(parallel.data[msg_type][field], values)
+
+def test_record_boundaries_fall_on_record_starts(tmp_path):
+    """Test that split points land on records even in the middle of one."""
+    log = build_flight_log(str(tmp_path / "flight.bin"))
+    decoder = DataFlashDecoder(log)
+    decoder.decode()
+    buf = np.fromfile(log, dtype=np.uint8)
+    bounds = parallel_decode.record_boundaries(buf, decoder.formats, 7)
+    assert bounds[0] == 0 and bounds[-1] == len(buf)
+    assert len(bounds) == 8
+    for start in bounds[1:-1]:
+        assert buf[start] == 0xA3 and buf[start + 1] == 0x95
+        assert buf[start + 2] in decoder.formats
+
+def test_incremental_parse_matches_file_parse(flight_log):
+    """Test that feeding a log in odd-sized chunks gives the same result."""
+    with open(flight_log, "rb") as f:
+        content = f.read()
+    parser = LogParser(flight_log)
+    for start in range(0, len(content), 777):
+        parser.feed(content[start:start + 777])
+    reference = LogParser(flight_log)
+    assert parser.finish() == reference.parse()
+    for msg_type, columns in reference.data.items():
+        for field, values in columns.items():
+            np.testing.assert_array_equal(parser.data[msg_type][field], values)
+
+def test_summarize_matches_full_parse(tmp_path, monkeypatch):
+    """Test that the summary-only parse matches the full parse across chunk boundaries."""
+    from app.services import log_parser
+    path = build_flight_log(str(tmp_path / "long.bin"), seconds=120)
+    expected = LogParser(path).parse()
+    # small chunks so GPS issue and error intervals straddle chunk boundaries
+    monkeypatch.setattr(log_parser, "SUMMARY_CHUNK_SIZE", 997)
+    parser = LogParser(path)
+    assert parser.summarize() == expected
+    assert parser.data == {}
+
+def test_summarize_merges_intervals_across_chunks():
+    """Test that the aggregator merges intervals split between chunks."""
+    from app.services.summary import SummaryAggregator
+    aggregator = SummaryAggregator()
+    for times, status in (([1, 2, 3], [3, 1, 2]), ([4, 5], [0, 3]), ([6], [2])):
+        aggregator.extend('GPS', {
+            'TimeUS': np.array(times, dtype=np.uint64),
+            'Status': np.array(status, dtype=np.uint8),
+            'NSats': np.array([6] * len(times), dtype=np.uint8),
+            'Alt': np.array([10.0] * len(times)),
+        })
+    for ecode in ([2, 2], [2, 0, 1]):
+        n = len(ecode)
+        aggregator.extend('ERR', {
+            'TimeUS': np.arange(n, dtype=np.uint64),
+            'Subsys': np.array([11] * (n - 1) + [12 if n == 3 else 11], dtype=np.uint8),
+            'ECode': np.array(ecode, dtype=np.uint8),
+        })
+    summary = aggregator.summary(['GPS', 'ERR'], 6)
+    assert [(i['start'], i['end'], i['samples'], i['worst_status']) for i in summary['gps_issues']] == [
+        (2, 4, 3, 0), (6, 6, 1, 2)
+    ]
+    assert [(e['Subsys'], e['count']) for e in summary['critical_errors']] == [(11, 3), (12, 1)]
+    assert summary['max_altitude'] == 10.0
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from app.services.mavgraph import Expression, ExpressionError, Graph, GraphEngine, load_graphs, lowpass
+from app.services.series import SeriesIndex
+
+
+def _lowpass_loop(values, factor):
+    result, state = [], values[0]
+    for value in values:
+        state = factor * state + (1 - factor) * value
+        result.append(state)
+    return np.array(result)
+
+
+def test_lowpass_matches_mavextra_loop():
+    """Test that the blocked vectorized lowpass equals the sample-by-sample filter."""
+    rng = np.random.default_rng(0)
+    for factor in (0.0, 0.3, 0.9, 0.999):
+        for count in (1, 2, 100, 5000):
+            values = rng.normal(5, 100, count)
+            np.testing.assert_allclose(lowpass(values, factor), _lowpass_loop(values, factor), atol=1e-8)
+
+
+def test_expression_aligns_messages_and_instances():
+    """Test multi-message arithmetic, instances and conditions on a shared timeline."""
+    data = {
+        'IMU': {
+            'TimeUS': np.array([10, 20, 30, 40], dtype=np.uint64),
+            'I': np.array([0, 1, 0, 1], dtype=np.uint8),
+            'AccX': np.array([1.0, 2.0, 3.0, 4.0]),
+        },
+        'BARO': {'TimeUS': np.array([15, 35], dtype=np.uint64), 'Alt': np.array([100.0, 200.0])},
+    }
+    index = SeriesIndex(data)
+    times, values = Expression('IMU[0].AccX+BARO.Alt').evaluate(index)
+    # evaluated at every IMU[0] and BARO message once both have a value
+    assert times.tolist() == [15, 30, 35]
+    assert values.tolist() == [101.0, 103.0, 203.0]
+    times, values = Expression('sqrt(IMU[1].AccX**2){BARO.Alt>150}:2').evaluate(index)
+    assert times.tolist() == [35, 40]
+    assert values.tolist() == [2.0, 4.0]
+    assert Expression('IMU.AccX:2').axis == 2
+
+
+def test_graph_engine_picks_first_drawable_expression():
+    """Test that unsupported or unavailable alternatives are skipped and results cached."""
+    with pytest.raises(ExpressionError):
+        Expression('gravity(RAW_IMU)')
+    data = {'GPS': {'TimeUS': np.arange(5, dtype=np.uint64), 'Spd': np.arange(5.0)}}
+    graphs = {'Speed': Graph('Speed', '', ['VFR_HUD.groundspeed', 'gravity(RAW_IMU)', 'GPS.Spd*2'])}
+    engine = GraphEngine(SeriesIndex(data), graphs)
+    assert engine.available() == ['Speed']
+    expression, series = engine.evaluate('Speed')
+    assert expression == 'GPS.Spd*2'
+    assert series[0]['values'].tolist() == [0.0, 2.0, 4.0, 6.0, 8.0]
+    assert engine.evaluate('Speed')[1] is series
+    assert 'Speed/Ground Speed' in load_graphs()
@@ -0,0 +1,52 @@
+import os
+import numpy as np
+from app.services.parse_cache import ParseCache
+from app.services.parsed_log import ParsedLog
+
+def _parsed(size: int) -> ParsedLog:
+    return ParsedLog({'max_altitude': 1.0}, {'GPS': {'Alt': np.zeros(size)}})
+
+def test_cache_hit_and_miss(tmp_path):
+    """Test storing and loading a parse result by hash."""
+    cache = ParseCache(str(tmp_path), 10 * 1024 * 1024)
+    assert cache.get("abc") is None
+    cache.put("abc", _parsed(100))
+    parsed = cache.get("abc")
+    assert parsed.summary == {'max_altitude': 1.0}
+    assert len(parsed.data['GPS']['Alt']) == 100
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    """Test that the size cap evicts the oldest unused entry."""
+    cache = ParseCache(str(tmp_path), 20000)
+    cache.put("a", _parsed(1000))
+    cache.put("b", _parsed(1000))
+    cache.get("a")
+    cache.put("c", _parsed(1000))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.stats()['evictions'] == 1
+    assert cache.stats()['size_bytes'] <= 20000
+
+def test_cache_index_survives_restart(tmp_path):
+    """Test that entries on disk are found by a new cache instance."""
+    ParseCache(str(tmp_path), 10 * 1024 * 1024).put("abc", _parsed(10))
+    cache = ParseCache(str(tmp_path), 10 * 1024 * 1024)
+    assert cache.get("abc") is not None
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
+
+def test_cache_is_shared_by_worker_processes(tmp_path):
+    """Test that instances over one directory see each other's packs and share the budget."""
+    first = ParseCache(str(tmp_path), 20000)
+    second = ParseCache(str(tmp_path), 20000)
+    first.put("a", _parsed(1000))
+    assert "a" in second
+    assert second.get("a") is not None
+    second.put("b", _parsed(1000))
+    first.put("c", _parsed(1000))
+    # the budget covers the packs of both: one of the older ones goes
+    kept = sorted(name.split('.')[0] for name in os.listdir(tmp_path))
+    assert len(kept) == 2 and "c" in kept
+    assert first.stats()['evictions'] == 1
+    assert (second.get("a") is None) != (second.get("b") is None)
@@ -0,0 +1,42 @@
+import json
+import os
+import subprocess
+import sys
+
+# Seconds app.main may add to the import time of FastAPI itself
+APP_IMPORT_BUDGET = 0.5
+HEAVY_MODULES = ("pandas", "pymavlink.mavutil", "google.generativeai")
+
+STARTUP_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import fastapi.testclient
+framework = time.perf_counter()
+from app.main import app
+imported = time.perf_counter()
+response = fastapi.testclient.TestClient(app).get("/ready")
+print(json.dumps({
+    "app_seconds": imported - framework,
+    "ready_status": response.status_code,
+    "ready": response.json(),
+    "loaded": [name for name in sys.argv[1:] if name in sys.modules],
+}))
+"""
+
+def test_cold_start_is_lazy():
+    """Test that the app imports within budget, without a Gemini key or heavy modules."""
+    env = dict(os.environ, LLM_BACKEND="gemini", GEMINI_API_KEY="")
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    # the best of a few runs, so a busy machine does not fail the budget
+    runs = [
+        json.loads(subprocess.run(
+            [sys.executable, "-c", STARTUP_SCRIPT, *HEAVY_MODULES],
+            cwd=backend, env=env, capture_output=True, text=True, check=True
+        ).stdout.splitlines()[-1])
+        for _ in range(3)
+    ]
+    assert min(run["app_seconds"] for run in runs) < APP_IMPORT_BUDGET
+    for run in runs:
+        assert run["loaded"] == []
+        assert run["ready_status"] == 200 and run["ready"]["status"] == "ok"
+        assert not any(run["ready"]["loaded"].values())
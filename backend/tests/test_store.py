@@ -0,0 +1,153 @@
+import os
+import numpy as np
+from app.services import store as store_module
+from app.services.parse_cache import ParseCache
+from app.services.parsed_log import ParsedLog
+from app.services.store import BoundedStore, LogStore, SharedLogStore
+
+
+def _parsed(n: int = 1000) -> ParsedLog:
+    return ParsedLog(
+        {'flight_time': 1.0},
+        {'BAT': {'Volt': np.arange(n, dtype=np.float64)}}
+    )
+
+
+def test_bounded_store_evicts_least_recently_used():
+    """Test that the byte budget evicts the oldest unused entry."""
+    store = BoundedStore(max_bytes=25, ttl_seconds=60, sizeof=len)
+    store['a'] = 'x' * 10
+    store['b'] = 'x' * 10
+    assert store.get('a') is not None  # 'b' is now the oldest
+    store['c'] = 'x' * 10
+
+    assert 'b' not in store
+    assert 'a' in store and 'c' in store
+    assert store.stats()['evictions'] == 1
+    assert store.stats()['size_bytes'] == 20
+
+
+def test_bounded_store_expires_idle_entries(monkeypatch):
+    """Test that entries idle longer than the TTL expire."""
+    now = [1000.0]
+    monkeypatch.setattr(store_module.time, 'monotonic', lambda: now[0])
+    store = BoundedStore(max_bytes=1000, ttl_seconds=10, sizeof=len)
+    store['a'] = 'value'
+    now[0] += 5
+    assert store.get('a') == 'value'
+    now[0] += 11
+
+    assert store.get('a') is None
+    assert store.stats()['expirations'] == 1
+    assert store.stats()['size_bytes'] == 0
+
+
+def test_log_store_spills_and_reloads(tmp_path):
+    """Test that evicted logs are written to disk and mapped back on access."""
+    size = store_module.parsed_log_size(_parsed())
+    store = LogStore(max_bytes=size + 100, ttl_seconds=60, spill_dir=str(tmp_path))
+    store['first'] = _parsed()
+    store['second'] = _parsed()
+
+    assert store.stats()['spilled'] == 1
+    assert os.path.exists(tmp_path / 'first.pack')
+
+    reloaded = store.get('first')
+    assert reloaded.summary == {'flight_time': 1.0}
+    np.testing.assert_array_equal(reloaded.data['BAT']['Volt'], np.arange(1000))
+    stats = store.stats()
+    assert stats['reloads'] == 1
+    assert stats['entries'] == 1  # 'second' was spilled in turn
+
+
+def test_log_store_pop_removes_spill_file(tmp_path):
+    """Test that removing a spilled log deletes its file."""
+    store = LogStore(max_bytes=1, ttl_seconds=60, spill_dir=str(tmp_path))
+    store['log'] = _parsed()
+    assert os.path.exists(tmp_path / 'log.pack')
+
+    assert store.pop('log') is not None
+    assert not os.path.exists(tmp_path / 'log.pack')
+    assert store.get('log') is None
+
+
+def test_shared_log_store_serves_logs_across_processes(tmp_path):
+    """Test that a log stored by one process is readable by another."""
+    writer = SharedLogStore(1024 * 1024, 60, str(tmp_path))
+    parsed = _parsed()
+    parsed.content_hash = 'abc'
+    writer['log'] = parsed
+
+    # A second store over the same directory stands in for another worker
+    reader = SharedLogStore(1024 * 1024, 60, str(tmp_path))
+    loaded = reader.get('log')
+    assert loaded.summary == {'flight_time': 1.0}
+    assert loaded.data['BAT']['Volt'].base is not None  # mapped, not copied
+    np.testing.assert_array_equal(loaded.data['BAT']['Volt'], np.arange(1000))
+    assert reader.stats()['reloads'] == 1
+
+
+def test_shared_log_store_dedupes_and_purges_packs(tmp_path):
+    """Test that identical logs share a pack removed with its last id."""
+    store = SharedLogStore(1024 * 1024, 60, str(tmp_path))
+    for key in ('one', 'two'):
+        parsed = _parsed()
+        parsed.content_hash = 'same'
+        store[key] = parsed
+    assert len(store) == 2
+    assert os.path.exists(tmp_path / 'same.pack')
+
+    store.pop('one')
+    assert os.path.exists(tmp_path / 'same.pack')
+    store.pop('two')
+    assert not os.path.exists(tmp_path / 'same.pack')
+    assert store.get('two') is None
+
+
+def test_shared_log_store_links_parse_cache_packs(tmp_path):
+    """Test that a log already in the parse cache is hard-linked, not written again."""
+    cache = ParseCache(str(tmp_path / 'cache'), 10 ** 9)
+    store = SharedLogStore(1024 * 1024, 60, str(tmp_path / 'logs'), cache)
+    parsed = _parsed()
+    parsed.content_hash = 'abc'
+    cache.put('abc', parsed)
+    store['log'] = parsed
+    assert os.path.samefile(cache.path('abc'), tmp_path / 'logs' / 'abc.pack')
+    assert store.stats()['linked_packs'] == 1
+
+    # without a cache entry the pack is written
+    other = _parsed()
+    other.content_hash = 'def'
+    store['other'] = other
+    assert store.stats()['linked_packs'] == 1
+    reader = SharedLogStore(1024 * 1024, 60, str(tmp_path / 'logs'))
+    np.testing.assert_array_equal(reader.get('log').data['BAT']['Volt'], np.arange(1000))
+    np.testing.assert_array_equal(reader.get('other').data['BAT']['Volt'], np.arange(1000))
+
+
+def test_shared_log_store_put_survives_a_concurrent_purge(tmp_path):
+    """Test that a pack purged by another worker just before it is referenced is written again."""
+    writer = SharedLogStore(1024 * 1024, 60, str(tmp_path))
+    other = SharedLogStore(1024 * 1024, 60, str(tmp_path))
+    parsed = _parsed()
+    parsed.content_hash = 'same'
+    other['old'] = parsed
+
+    class PurgeFirst:
+        """Lock that lets the other worker drop the last id of the pack on first use."""
+        def __init__(self, lock):
+            self.lock, self.fired = lock, False
+
+        def __enter__(self):
+            if not self.fired:
+                self.fired = True
+                other.pop('old')
+            return self.lock.__enter__()
+
+        def __exit__(self, *exc):
+            return self.lock.__exit__(*exc)
+
+    writer._lock = PurgeFirst(writer._lock)
+    writer['new'] = parsed
+    reader = SharedLogStore(1024 * 1024, 60, str(tmp_path))
+    np.testing.assert_array_equal(reader.get('new').data['BAT']['Volt'], np.arange(1000))
@@ -1,7 +1,6 @@
 'use client';
 
 import { useState, useEffect, useRef } from 'react';
-import axios, { AxiosError } from 'axios';
 
 interface Message {
   id: string;
@@ -10,9 +9,34 @@ interface Message {
   timestamp: Date;
 }
 
-interface ChatResponse {
-  conversation_id: string;
-  response: string;
+interface StreamEvent {
+  event: string;
+  data: { conversation_id?: string; text?: string; detail?: string };
+}
+
+class ChatStreamError extends Error {
+  status?: number;
+
+  constructor(message: string, status?: number) {
+    super(message);
+    this.status = status;
+  }
+}
+
+// Split a Server-Sent Events buffer into complete events and the unparsed rest
+function parseEvents(buffer: string): [StreamEvent[], string] {
+  const blocks = buffer.split('\n\n');
+  const rest = blocks.pop() ?? '';
+  const events = blocks.filter(block => block.trim()).map(block => {
+    let event = 'message';
+    let data = '';
+    for (const line of block.split('\n')) {
+      if (line.startsWith('event: ')) event = line.slice(7);
+      else if (line.startsWith('data: ')) data += line.slice(6);
+    }
+    return { event, data: data ? JSON.parse(data) : {} };
+  });
+  return [events, rest];
 }
 
 interface ChatWindowProps {
@@ -57,39 +81,57 @@ export default function ChatWindow({ logId, fileName }: ChatWindowProps) {
     setInputMessage('');
     setIsLoading(true);
 
-    try {
-      const response = await axios.post<ChatResponse>(
-        `/api/chat/${logId}`,
-        {
-          message: userMessage.content,
-        },
-        {
-          params: conversationId ? { conversation_id: conversationId } : {},
+    const assistantId = (Date.now() + 1).toString();
+    const appendToken = (text: string) => {
+      setMessages(prev => {
+        const last = prev[prev.length - 1];
+        if (last?.id === assistantId) {
+          return [...prev.slice(0, -1), { ...last, content: last.content + text }];
         }
-      );
+        return [...prev, { id: assistantId, type: 'assistant', content: text, timestamp: new Date() }];
+      });
+    };
 
-      const assistantMessage: Message = {
-        id: (Date.now() + 1).toString(),
-        type: 'assistant',
-        content: response.data.response,
-        timestamp: new Date(),
-      };
+    try {
+      // Stream the answer over Server-Sent Events so it renders as it is generated
+      const params = conversationId ? `?conversation_id=${encodeURIComponent(conversationId)}` : '';
+      const response = await fetch(`/api/chat/${logId}/stream${params}`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json', Accept: 'text/event-stream' },
+        body: JSON.stringify({ message: userMessage.content }),
+      });
+      if (!response.ok || !response.body) {
+        throw new ChatStreamError(`Chat request failed with status ${response.status}`, response.status);
+      }
 
-      setMessages(prev => [...prev, assistantMessage]);
-      
-      if (response.data.conversation_id) {
-        setConversationId(response.data.conversation_id);
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      for (;;) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        const [events, rest] = parseEvents(buffer + decoder.decode(value, { stream: true }));
+        buffer = rest;
+        for (const { event, data } of events) {
+          if (event === 'start' && data.conversation_id) {
+            setConversationId(data.conversation_id);
+          } else if (event === 'token' && data.text) {
+            appendToken(data.text);
+          } else if (event === 'error') {
+            throw new ChatStreamError(data.detail ?? 'Generation failed', 500);
+          }
+        }
       }
     } catch (error) {
       console.error('Chat error:', error);
-      const axiosError = error as AxiosError;
+      const status = error instanceof ChatStreamError ? error.status : undefined;
       
       let errorMessage = 'Sorry, there was an error processing your request.';
-      if (axiosError.response?.status === 404) {
+      if (status === 404) {
         errorMessage = 'Log file not found. Please upload a file first.';
-      } else if (axiosError.response?.status === 500) {
+      } else if (status === 500) {
         errorMessage = 'Server error. Please try again.';
-      } else if (axiosError.code === 'ECONNREFUSED') {
+      } else if (error instanceof TypeError) {
         errorMessage = 'Cannot connect to backend server. Make sure the backend server is running on http://localhost:8000.';
       }
 
@@ -180,7 +222,7 @@ export default function ChatWindow({ logId, fileName }: ChatWindowProps) {
           ))
         )}
 
-        {isLoading && (
+        {isLoading && messages[messages.length - 1]?.type !== 'assistant' && (
           <div className="flex justify-start">
             <div className="bg-white border border-gray-200 rounded-lg p-3 max-w-[80%]">
               <div className="flex items-center space-x-2">
@@ -14,6 +14,38 @@ interface UploadData {
   };
 }
 
+interface JobStatus {
+  job_id: string;
+  status: 'queued' | 'running' | 'done' | 'failed';
+  progress: number;
+  eta_seconds: number | null;
+  result?: UploadData;
+  error?: string;
+}
+
+interface QueuedUpload {
+  job_id: string;
+  status_url: string;
+}
+
+const POLL_INTERVAL_MS = 500;
+
+class JobFailedError extends Error {}
+
+async function waitForJob(statusUrl: string, onProgress: (job: JobStatus) => void): Promise<UploadData> {
+  for (;;) {
+    const { data: job } = await axios.get<JobStatus>(statusUrl);
+    onProgress(job);
+    if (job.status === 'done' && job.result) {
+      return job.result;
+    }
+    if (job.status === 'failed') {
+      throw new JobFailedError(job.error || 'Processing failed');
+    }
+    await new Promise((resolve) => setTimeout(resolve, POLL_INTERVAL_MS));
+  }
+}
+
 interface FileUploadProps {
   onUploadSuccess: (data: UploadData) => void;
   onFileSelected: (file: File) => void;
@@ -23,6 +55,8 @@ export default function FileUpload({ onUploadSuccess, onFileSelected }: FileUplo
   const [uploading, setUploading] = useState(false);
   const [error, setError] = useState<string | null>(null);
   const [uploadProgress, setUploadProgress] = useState(0);
+  const [processing, setProcessing] = useState(false);
+  const [eta, setEta] = useState<number | null>(null);
 
   const onDrop = useCallback(async (acceptedFiles: File[]) => {
     const file = acceptedFiles[0];
@@ -43,7 +77,8 @@ export default function FileUpload({ onUploadSuccess, onFileSelected }: FileUplo
     formData.append('file', file);
 
     try {
-      const response = await axios.post<UploadData>('/api/upload', formData, {
+      // Parse in the background so large logs do not hold the request open
+      const response = await axios.post<QueuedUpload>('/api/upload?background=true', formData, {
         headers: {
           'Content-Type': 'multipart/form-data',
         },
@@ -55,13 +90,23 @@ export default function FileUpload({ onUploadSuccess, onFileSelected }: FileUplo
         },
       });
 
-      onUploadSuccess(response.data);
+      setProcessing(true);
+      setUploadProgress(0);
+      const result = await waitForJob(response.data.status_url, (job) => {
+        setUploadProgress(Math.round(job.progress * 100));
+        setEta(job.eta_seconds);
+      });
+      onUploadSuccess(result);
     } catch (error) {
       console.error('Upload error:', error);
       const axiosError = error as AxiosError;
       
-      if (axiosError.response?.status === 400) {
+      if (error instanceof JobFailedError) {
+        setError(`Could not process the log: ${error.message}`);
+      } else if (axiosError.response?.status === 400) {
         setError('Invalid file format. Please upload a valid .bin file.');
+      } else if (axiosError.response?.status === 503) {
+        setError('The server is busy processing other logs. Please try again shortly.');
       } else if (axiosError.response?.status === 500) {
         setError('Server error while processing the file. Please try again.');
       } else if (axiosError.code === 'ECONNREFUSED') {
@@ -72,6 +117,8 @@ export default function FileUpload({ onUploadSuccess, onFileSelected }: FileUplo
     } finally {
       setUploading(false);
       setUploadProgress(0);
+      setProcessing(false);
+      setEta(null);
     }
   }, [onUploadSuccess, onFileSelected]);
 
@@ -118,14 +165,19 @@ export default function FileUpload({ onUploadSuccess, onFileSelected }: FileUplo
           
           {uploading ? (
             <div className="space-y-2">
-              <p className="text-blue-600 font-medium">Uploading and processing...</p>
+              <p className="text-blue-600 font-medium">
+                {processing ? 'Processing log...' : 'Uploading...'}
+              </p>
               <div className="w-full bg-gray-200 rounded-full h-2">
                 <div 
                   className="bg-blue-600 h-2 rounded-full transition-all duration-300"
                   style={{ width: `${uploadProgress}%` }}
                 ></div>
               </div>
-              <p className="text-sm text-gray-500">{uploadProgress}%</p>
+              <p className="text-sm text-gray-500">
+                {uploadProgress}%
+                {processing && eta !== null && ` (about ${Math.ceil(eta)}s left)`}
+              </p>
             </div>
           ) : isDragActive ? (
             <p className="text-blue-600 font-medium">Drop the .bin file here</p>